@@ -0,0 +1,128 @@
+"""
+Benchmark del análisis de jugadores en streaming
+Contra el servidor local que imita OpenAI mide el tiempo hasta el primer
+fragmento frente al de la respuesta completa, los repintados que ahorra
+volcar los fragmentos una vez por fotograma (con el ritmo de palabras dado
+y con un modelo rápido) y cuánto tarda en pararse (y cuántas palabras se
+siguen generando) un análisis cancelado
+
+Uso:
+    python benchmarks/bench_analysis_stream.py [--runs 5] [--latency 0.6] [--token-delay 0.03]
+                                               [--fast-token-delay 0.002]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+import threading
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.config.settings import DEFAULT_CONFIG
+from src.core.player_analysis import AnalysisCancelled, CancelToken, PlayerAnalyzer
+from src.utils.stub_servers import OpenAIStubServer, fake_player_stats
+
+FRAME_MS = 16
+
+def _ms(values):
+    return f"{statistics.mean(values) * 1000:7.1f} ms (máx {max(values) * 1000:.1f})"
+
+def _stream(analyzer, players):
+    """Analiza en streaming; devuelve primeros fragmentos, tiempos totales, fragmentos y fotogramas"""
+    first, total, chunks, frames = [], [], 0, 0
+    for nick, stats in players:
+        arrivals = []
+        result = analyzer.analyze(nick, "XPK", stats, lambda _chunk: arrivals.append(time.perf_counter()))
+        first.append(result.first_chunk)
+        total.append(result.elapsed)
+        chunks += len(arrivals)
+        frames += len({int(t * 1000 // FRAME_MS) for t in arrivals})
+    return first, total, chunks, frames
+
+def run_benchmark(runs: int = 5, latency: float = 0.6, token_delay: float = 0.03, words: int = 120,
+                  fast_token_delay: float = 0.002):
+    """Compara respuesta completa, streaming y cancelación"""
+    with OpenAIStubServer(api_key="clave", latency=latency, words=words, token_delay=token_delay) as stub:
+        config = dict(DEFAULT_CONFIG, openai_api_key="clave", openai_base_url=stub.url + "/v1")
+        analyzer = PlayerAnalyzer.from_config(config, None)
+        players = [(f"jugador{i}", fake_player_stats(f"jugador{i}", "XPK")) for i in range(4 * runs)]
+
+        # Sin streaming el texto aparece entero al final
+        stub.token_delay = 0.0
+        stub.latency = latency + token_delay * (words - 1)
+        complete = [analyzer.analyze(nick, "XPK", stats).elapsed for nick, stats in players[:runs]]
+        stub.token_delay = token_delay
+        stub.latency = latency
+
+        # Streaming: primer fragmento y fotogramas con texto nuevo
+        first, total, chunks, frames = _stream(analyzer, players[runs:2 * runs])
+
+        print(f"{runs} análisis de {words} palabras (latencia {latency * 1000:.0f} ms, "
+              f"{token_delay * 1000:.0f} ms/palabra):")
+        print(f"  Sin streaming, texto visible a   {_ms(complete)}")
+        print(f"  Streaming, primer fragmento a    {_ms(first)}")
+        print(f"  Streaming, texto completo a      {_ms(total)}")
+        print(f"  Repintados: {chunks} con uno por fragmento, {frames} con uno por fotograma "
+              f"({FRAME_MS} ms)")
+
+        # Con un modelo rápido llegan varias palabras por fotograma y agruparlas sí ahorra repintados
+        stub.token_delay = fast_token_delay
+        _first, fast_total, fast_chunks, fast_frames = _stream(analyzer, players[3 * runs:])
+        stub.token_delay = token_delay
+        print(f"  Modelo rápido ({fast_token_delay * 1000:.0f} ms/palabra), texto completo a {_ms(fast_total)}")
+        print(f"  Repintados: {fast_chunks} con uno por fragmento, {fast_frames} con uno por fotograma "
+              f"({FRAME_MS} ms)")
+
+        # Cancelación en un momento al azar de la generación
+        picker = random.Random(1)
+        stop_latency, wasted, saved = [], [], 0
+        for nick, stats in players[2 * runs:3 * runs]:
+            token = CancelToken()
+            received = []
+            lock = threading.Lock()
+
+            def on_chunk(chunk):
+                with lock:
+                    received.append(chunk)
+
+            before = stub.completion_words
+            future = analyzer.submit(nick, "XPK", stats, on_chunk, token)
+            time.sleep(latency + picker.uniform(0.1, 0.8) * token_delay * words)
+            with lock:
+                token.cancel()
+                seen = len(received)
+            try:
+                future.result()
+            except AnalysisCancelled:
+                pass
+            stop_latency.append(time.perf_counter() - token.cancelled_at)
+            # El servidor apunta las palabras al detectar el corte
+            deadline = time.perf_counter() + 2
+            while stub.completion_words == before and time.perf_counter() < deadline:
+                time.sleep(0.005)
+            generated = stub.completion_words - before
+            wasted.append(generated - seen)
+            saved += words - generated
+
+        print(f"  Cancelación: el análisis se para en {_ms(stop_latency)}")
+        print(f"  Palabras generadas tras cancelar: media {statistics.mean(wasted):.1f}, "
+              f"máx {max(wasted)}; ahorradas {saved} de {words * runs} "
+              f"({stub.cancelled} cortes vistos por el servidor)")
+        analyzer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del análisis en streaming")
+    parser.add_argument("--runs", type=int, default=5, help="Análisis por modo")
+    parser.add_argument("--latency", type=float, default=0.6, help="Segundos hasta la primera palabra")
+    parser.add_argument("--token-delay", type=float, default=0.03, help="Segundos entre palabras")
+    parser.add_argument("--words", type=int, default=120, help="Palabras por análisis")
+    parser.add_argument("--fast-token-delay", type=float, default=0.002,
+                        help="Segundos entre palabras del modelo rápido")
+    args = parser.parse_args()
+    run_benchmark(args.runs, args.latency, args.token_delay, args.words, args.fast_token_delay)
+
+if __name__ == "__main__":
+    main()
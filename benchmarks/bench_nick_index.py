@@ -0,0 +1,83 @@
+"""
+Micro-benchmark del índice de nicks conocidos
+Llena una sala con nicks sintéticos y mide la búsqueda aproximada de
+lecturas con errores de OCR (sustituciones, omisiones e inserciones) y las
+sugerencias del autocompletado para textos a medio escribir
+
+Uso:
+    python benchmarks/bench_nick_index.py [--nicks 200000] [--queries 2000]
+"""
+
+import os
+import sys
+import time
+import random
+import string
+import argparse
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.core.nick_index import NickIndex
+
+ALPHABET = string.ascii_letters + string.digits + "_"
+
+def random_nick(rng: random.Random) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(4, 14)))
+
+def corrupt(nick: str, rng: random.Random, edits: int) -> str:
+    """Aplica edits errores aleatorios de OCR a un nick"""
+    chars = list(nick)
+    for _ in range(edits):
+        position = rng.randrange(len(chars))
+        operation = rng.choice(("sustituir", "borrar", "insertar"))
+        if operation == "sustituir":
+            chars[position] = rng.choice(ALPHABET)
+        elif operation == "borrar" and len(chars) > 3:
+            del chars[position]
+        else:
+            chars.insert(position, rng.choice(ALPHABET))
+    return "".join(chars)
+
+def run_benchmark(nick_count: int = 200000, query_count: int = 2000, seed: int = 7):
+    """Construye el índice y mide búsquedas y aciertos de resolve()"""
+    rng = random.Random(seed)
+    nicks = list({random_nick(rng) for _ in range(nick_count)})
+
+    index = NickIndex()
+    start = time.perf_counter()
+    index.load_async([((nick, "PS") for nick in nicks)]).join()
+    build = time.perf_counter() - start
+    print(f"Nicks: {len(index)}  construcción: {build:.2f} s")
+
+    for edits in (0, 1, 2):
+        targets = rng.sample(nicks, query_count)
+        queries = [corrupt(nick, rng, edits) for nick in targets]
+
+        start = time.perf_counter()
+        resolved = [index.resolve(query, "PS") for query in queries]
+        elapsed = time.perf_counter() - start
+
+        correct = sum(1 for target, result in zip(targets, resolved) if result == target)
+        ambiguous = sum(1 for result in resolved if result is None)
+        print(f"{edits} errores: {elapsed / query_count * 1000:7.3f} ms/consulta  "
+              f"correctos {correct / query_count:6.1%}  sin resolver {ambiguous / query_count:6.1%}")
+
+    # Autocompletado: prefijos de 1 a 6 caracteres de nicks conocidos
+    for length in range(1, 7):
+        texts = [nick[:length] for nick in rng.sample(nicks, query_count)]
+        start = time.perf_counter()
+        worst = 0.0
+        for text in texts:
+            began = time.perf_counter()
+            index.suggest(text, "PS")
+            worst = max(worst, time.perf_counter() - began)
+        elapsed = time.perf_counter() - start
+        print(f"sugerir {length} car.: {elapsed / query_count * 1000:7.3f} ms/consulta  "
+              f"peor {worst * 1000:7.3f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del índice de nicks")
+    parser.add_argument("--nicks", type=int, default=200000, help="Nicks en el índice")
+    parser.add_argument("--queries", type=int, default=2000, help="Consultas por nivel de error")
+    arguments = parser.parse_args()
+    run_benchmark(arguments.nicks, arguments.queries)
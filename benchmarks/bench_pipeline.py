@@ -0,0 +1,188 @@
+"""
+Benchmark del pipeline de captura sobre una sesión grabada
+Permite medir la detección de mesas, la captura, el preprocesado, el OCR y
+la consulta de estadísticas sin Windows usando el backend de reproducción.
+Sin grabación se genera una sesión sintética de muestra con nicks dibujados
+en la región de OCR de cada mesa.
+
+Uso:
+    python benchmarks/bench_pipeline.py [grabación] [--speed 0] [--iterations 200] [--ocr] [--lookup]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+from PIL import Image, ImageDraw
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.utils.capture_backends import ReplayCaptureBackend, open_replay_source, set_capture_backend
+from src.utils.windows import find_poker_tables, capture_window_array
+from src.utils.image_utils import enhance_for_ocr_array
+from src.utils.frame_pool import frame_pool
+from src.utils.session_recorder import SessionRecorder
+from src.config.settings import DEFAULT_CONFIG
+
+SAMPLE_TITLES = [
+    "Halley II - No Limit Hold'em $0.05/$0.10 USD - Logged In as pokerbot",
+    "Calypso III - $0.25/$0.50 USD - No Limit Hold'em - Logged In as pokerbot",
+    "Aludra IV 6-Max - Pot Limit Omaha $0.10/$0.25 USD",
+]
+
+def _percentile(values, pct):
+    """Percentil simple sobre una lista de valores"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+def _report(name, samples):
+    """Imprime un resumen de tiempos en milisegundos"""
+    if not samples:
+        print(f"{name:<14} sin muestras")
+        return
+    ms = [s * 1000 for s in samples]
+    print(f"{name:<14} n={len(ms):<6} media={statistics.mean(ms):8.3f}ms "
+          f"p50={_percentile(ms, 50):8.3f}ms p99={_percentile(ms, 99):8.3f}ms")
+
+def make_sample_recording(path, tables=3, sweeps=20, size=(800, 600)):
+    """
+    Graba una sesión sintética con varias mesas
+
+    Cada mesa muestra un nick en la región de ocr_coords que cambia cada
+    cinco barridos, para que el OCR y la consulta tengan trabajo real.
+    """
+    coords = DEFAULT_CONFIG["ocr_coords"]
+    windows = [(1000 + i, SAMPLE_TITLES[i % len(SAMPLE_TITLES)]) for i in range(tables)]
+    recorder = SessionRecorder(path)
+    for sweep in range(sweeps):
+        recorder.record_windows(windows)
+        for hwnd, _title in windows:
+            image = Image.new('RGB', size, color=(20, 80, 20))
+            draw = ImageDraw.Draw(image)
+            draw.rectangle((coords["x"], coords["y"], coords["x"] + coords["w"], coords["y"] + coords["h"]),
+                           fill=(10, 10, 10))
+            draw.text((coords["x"] + 4, coords["y"] + 5), f"Jugador{hwnd % 100}{sweep // 5}",
+                      fill=(240, 240, 240))
+            recorder.record_frame(hwnd, image)
+    recorder.close()
+    return path
+
+def run_benchmark(path, speed=0.0, iterations=200, ocr=False, lookup=False, latency=0.05):
+    """
+    Recorre la grabación ejecutando detección, captura, preprocesado y,
+    opcionalmente, OCR y consulta de estadísticas
+
+    Args:
+        path: Ruta de la grabación
+        speed: Velocidad de reproducción (0 = paso a paso, lo más rápido posible)
+        iterations: Número máximo de barridos
+        ocr: Reconocer el nick de cada mesa con recognize_frame
+        lookup: Consultar las estadísticas de los nicks contra el servidor local
+        latency: Retardo por petición del servidor local en segundos
+    """
+    recognize_frame = None
+    if ocr:
+        # El motor OCR se importa solo si se pide: carga Qt y PaddleOCR
+        from src.core.ocr_engine import recognize_frame, PADDLE_AVAILABLE, TESSERACT_AVAILABLE
+        if not (PADDLE_AVAILABLE or TESSERACT_AVAILABLE):
+            print("Sin PaddleOCR ni Tesseract: el OCR solo medirá el preprocesado")
+
+    stub = service = None
+    if lookup:
+        from src.core.stats_service import StatsService
+        from src.utils.stub_servers import StatsStubServer
+        stub = StatsStubServer(latency=latency).start()
+        data_dir = Path(tempfile.mkdtemp())
+        service = StatsService.from_config({"api_url": stub.url}, data_dir / "stats_cache.db",
+                                           data_dir / "population.json")
+
+    backend = ReplayCaptureBackend(open_replay_source(path), speed=speed, loop=True)
+    set_capture_backend(backend)
+
+    coords = DEFAULT_CONFIG["ocr_coords"]
+    rect = (coords["x"], coords["y"], coords["w"], coords["h"])
+    sala = DEFAULT_CONFIG["sala_default"]
+
+    enumerate_times, capture_times, enhance_times = [], [], []
+    ocr_times, lookup_times = [], []
+    start = time.perf_counter()
+
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        tables = find_poker_tables()
+        enumerate_times.append(time.perf_counter() - t0)
+
+        keys = []
+        for hwnd, _title in tables:
+            t0 = time.perf_counter()
+            frame = capture_window_array(hwnd, rect)
+            capture_times.append(time.perf_counter() - t0)
+            if frame is None:
+                continue
+
+            t0 = time.perf_counter()
+            enhance_for_ocr_array(frame.array).release()
+            enhance_times.append(time.perf_counter() - t0)
+
+            nick = ""
+            if recognize_frame is not None:
+                t0 = time.perf_counter()
+                nick, _confidence = recognize_frame(frame.array)
+                ocr_times.append(time.perf_counter() - t0)
+            frame.release()
+
+            # Sin OCR (o sin lectura) se consulta un nick fijo por mesa
+            keys.append((nick or f"mesa{hwnd}", sala))
+
+        if service is not None and keys:
+            t0 = time.perf_counter()
+            service.lookup_many(keys)
+            lookup_times.append(time.perf_counter() - t0)
+
+        if speed <= 0:
+            backend.advance()
+
+    total = time.perf_counter() - start
+    print(f"Barridos: {iterations} en {total:.2f}s ({iterations / total:.1f} barridos/s)")
+    _report("enumeración", enumerate_times)
+    _report("captura", capture_times)
+    _report("preprocesado", enhance_times)
+    if ocr:
+        _report("ocr", ocr_times)
+    if lookup:
+        _report("consulta", lookup_times)
+        cache = service.metrics()["cache"]
+        print(f"Consultas: {stub.requests} peticiones al servidor, "
+              f"{cache.get('hits', 0)} aciertos en caché")
+        service.close()
+        stub.stop()
+    print(f"Pool de fotogramas: {frame_pool.stats()}")
+
+    set_capture_backend(None)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de captura")
+    parser.add_argument("path", nargs="?",
+                        help="Ruta de la grabación a reproducir (sin ella se genera una de muestra)")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Velocidad de reproducción (0 = paso a paso)")
+    parser.add_argument("--iterations", type=int, default=200, help="Número de barridos")
+    parser.add_argument("--ocr", action="store_true", help="Añadir el OCR de cada mesa")
+    parser.add_argument("--lookup", action="store_true",
+                        help="Añadir la consulta de estadísticas contra el servidor local")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Retardo por petición del servidor local en segundos")
+    args = parser.parse_args()
+
+    path = args.path
+    if path is None:
+        path = make_sample_recording(os.path.join(tempfile.mkdtemp(), "muestra.pbrec"))
+        print(f"Grabación de muestra: {path}")
+
+    run_benchmark(path, args.speed, args.iterations, args.ocr, args.lookup, args.latency)
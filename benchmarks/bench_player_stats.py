@@ -0,0 +1,76 @@
+"""
+Micro-benchmark de la memoria y el coste de las estadísticas en caché
+Compara N jugadores guardados como dicts (lo que devuelve la API), como
+PlayerStats (lo que guarda la caché en memoria) y como una StatsTable de
+NumPy, y el tiempo de filtrar, ordenar y calcular percentiles sobre todos
+
+Uso:
+    python benchmarks/bench_player_stats.py [--players 100000]
+"""
+
+import os
+import sys
+import gc
+import time
+import json
+import argparse
+import tracemalloc
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.core.player_stats import PlayerStats, StatsTable
+from src.utils.stub_servers import fake_player_stats
+
+def _measure(build):
+    """Bytes que ocupa lo que devuelve build y segundos que tarda (sin trazar memoria)"""
+    gc.collect()
+    started = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+def run_benchmark(players: int = 100000):
+    """Construye las tres representaciones y compara memoria y operaciones"""
+    # Los dicts se reconstruyen desde JSON como los recibe el cliente
+    payloads = [json.dumps(fake_player_stats(f"jugador{i}", "XPK")) for i in range(players)]
+    keys = [(f"jugador{i}", "XPK") for i in range(players)]
+
+    dicts, dict_bytes, dict_time = _measure(lambda: [json.loads(p) for p in payloads])
+    compact, compact_bytes, compact_time = _measure(lambda: [PlayerStats.from_dict(d) for d in dicts])
+    table, table_bytes, table_time = _measure(lambda: StatsTable.from_items(zip(keys, compact)))
+
+    print(f"{players} jugadores:")
+    print(f"  dict         {dict_bytes / 2**20:8.1f} MB  ({dict_bytes / players:6.0f} B/jugador)")
+    print(f"  PlayerStats  {compact_bytes / 2**20:8.1f} MB  ({compact_bytes / players:6.0f} B/jugador)"
+          f"  x{dict_bytes / compact_bytes:.1f}, conversión {compact_time / players * 1e6:.1f} µs/jugador")
+    print(f"  StatsTable   {table_bytes / 2**20:8.1f} MB  ({table_bytes / players:6.0f} B/jugador)"
+          f"  x{dict_bytes / table_bytes:.1f} (claves aparte), {table_time:.2f} s")
+
+    started = time.perf_counter()
+    loose = [k for k, d in zip(keys, dicts) if d["vpip"] > 40 and d["pfr"] < 10]
+    ranked = sorted(zip(keys, dicts), key=lambda item: item[1]["three_bet"], reverse=True)[:10]
+    median = sorted(d["vpip"] for d in dicts)[players // 2]
+    python_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    vectorized = table.select((table.column("vpip") > 40) & (table.column("pfr") < 10))
+    table.top("three_bet", 10)
+    table.percentiles("vpip", (50,))
+    numpy_ms = (time.perf_counter() - started) * 1000
+
+    print(f"Filtrar + top 10 + mediana: dicts {python_ms:.1f} ms, tabla {numpy_ms:.1f} ms "
+          f"({len(loose)} == {len(vectorized)} filtrados, mediana {median}, top {ranked[0][1]['three_bet']})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la representación de estadísticas")
+    parser.add_argument("--players", type=int, default=100000, help="Jugadores en caché")
+    args = parser.parse_args()
+    run_benchmark(args.players)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Micro-benchmark del tamaño y el coste de las respuestas de estadísticas
+Compara un barrido de 40 jugadores por el endpoint de lote pidiendo todos
+los campos o solo los de stats_seleccionadas, con y sin gzip, y en JSON
+único o en NDJSON por partes, contra el servidor local de prueba
+
+Uso:
+    python benchmarks/bench_stats_payload.py [--rounds 50] [--players 40]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.config.settings import DEFAULT_CONFIG
+from src.core.stats_client import StatsClient, projected_fields
+from src.utils.stub_servers import StatsStubServer, fake_player_stats, project_stats
+
+def _sweep(fields, compress: bool, stream: bool, keys, rounds: int):
+    """Bytes por barrido y ms por barrido de una combinación"""
+    with StatsStubServer(compress=compress, stream=stream) as stub:
+        client = StatsClient(stub.url, fields=fields)
+        client.lookup_bulk(keys)  # calentar la conexión
+        sent_before = stub.bytes_sent
+        started = time.perf_counter()
+        for _ in range(rounds):
+            client.lookup_bulk(keys)
+        elapsed = time.perf_counter() - started
+        client.close()
+        return (stub.bytes_sent - sent_before) / rounds, elapsed / rounds * 1000
+
+def _parse_time(fields, keys, rounds: int) -> float:
+    """ms por barrido solo en decodificar el JSON de la respuesta"""
+    body = json.dumps({"resultados": [
+        {"nick": nick, "sala": sala, "stats": project_stats(fake_player_stats(nick, sala), fields)}
+        for nick, sala in keys
+    ]})
+    started = time.perf_counter()
+    for _ in range(rounds):
+        json.loads(body)
+    return (time.perf_counter() - started) / rounds * 1000
+
+def run_benchmark(rounds: int = 50, players: int = 40):
+    """Ejecuta todas las combinaciones y muestra bytes y tiempos"""
+    keys = [(f"jugador{i}", "XPK") for i in range(players)]
+    projected = projected_fields(DEFAULT_CONFIG)
+    print(f"Jugadores: {players}  rondas: {rounds}  campos proyectados: {len(projected)}")
+
+    for label, fields in (("todos", None), ("seleccionados", projected)):
+        print(f"\nCampos {label}: decodificar JSON {_parse_time(fields, keys, rounds * 10):.3f} ms/barrido")
+        for compress in (False, True):
+            for stream in (False, True):
+                size, ms = _sweep(fields, compress, stream, keys, rounds)
+                print(f"  {'gzip' if compress else 'sin comprimir':<14} {'NDJSON' if stream else 'JSON':<7}"
+                      f"{size:9.0f} bytes/barrido  {ms:7.2f} ms/barrido")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de las respuestas de estadísticas")
+    parser.add_argument("--rounds", type=int, default=50, help="Barridos por combinación")
+    parser.add_argument("--players", type=int, default=40, help="Jugadores por barrido")
+    arguments = parser.parse_args()
+    run_benchmark(arguments.rounds, arguments.players)
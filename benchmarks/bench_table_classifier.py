@@ -0,0 +1,100 @@
+"""
+Micro-benchmark del clasificador de títulos de mesas de poker
+Compara la implementación anterior (11 búsquedas re.search por título) con el
+clasificador compilado, en frío y con la caché de títulos caliente
+
+Uso:
+    python benchmarks/bench_table_classifier.py [--rounds 200]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.utils.table_classifier import classify_title
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "window_titles.txt")
+
+def legacy_is_poker_table(title: str) -> bool:
+    """Implementación original de is_poker_table, como referencia"""
+    exclude_programs = [
+        'Google Chrome', 'Firefox', 'Edge',
+        'Visual Studio', 'Code', 'Notepad',
+        'Word', 'Excel', 'PowerPoint',
+        'Explorer', 'File Explorer'
+    ]
+    for program in exclude_programs:
+        if program in title:
+            return False
+
+    patterns = [
+        r'\b\d+\s*/\s*\d+\b', r'\bNL\d+\b', r'\bPLO\d+\b', r'\bPK[0-9]+\b',
+        r'\bTable\s+\d+\b', r'\bPoker.*Table\b', r'\bHold\'?em\b', r'\bOmaha\b',
+        r'\bbb\b', r'\d+\.\d+/\d+\.\d+', r'[xX]-Poker\(',
+    ]
+    poker_clients = [
+        'PokerStars', 'GGPoker', 'PokerKing', 'Winamax', 'Pokerstars', 'PPPoker',
+        'PartyPoker', '888Poker', 'XPoker', 'WPN', 'TigerGaming',
+        'America\'s Cardroom', '6max'
+    ]
+
+    score = 0
+    for pattern in patterns:
+        if re.search(pattern, title, re.IGNORECASE):
+            score += 2
+    for client in poker_clients:
+        if client.lower() in title.lower():
+            score += 1
+    return score >= 2
+
+def load_corpus(path: str = CORPUS_PATH):
+    """Carga los títulos del corpus, ignorando comentarios y líneas vacías"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip() and not line.startswith("#")]
+
+def _time(func, titles, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for title in titles:
+            func(title)
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(titles)) * 1e6
+
+def run_benchmark(rounds: int = 200):
+    """Ejecuta el benchmark y verifica que ambas implementaciones coinciden"""
+    titles = load_corpus()
+
+    mismatches = [t for t in titles if legacy_is_poker_table(t) != classify_title(t).is_table]
+    for title in mismatches:
+        print(f"DIFERENCIA: {title!r}")
+
+    legacy = _time(legacy_is_poker_table, titles, rounds)
+
+    def cold(title):
+        classify_title.cache_clear()
+        return classify_title(title)
+
+    compiled_cold = _time(cold, titles, rounds)
+    classify_title.cache_clear()
+    compiled_warm = _time(classify_title, titles, rounds)
+
+    print(f"Títulos: {len(titles)}  rondas: {rounds}  diferencias: {len(mismatches)}")
+    print(f"original            {legacy:8.2f} µs/título")
+    print(f"compilado (frío)    {compiled_cold:8.2f} µs/título")
+    print(f"compilado (caché)   {compiled_warm:8.2f} µs/título")
+
+    print("\nMesas detectadas:")
+    for title in titles:
+        info = classify_title(title)
+        if info.is_table:
+            print(f"  {title[:50]:<50} cliente={info.client} stakes={info.stakes} "
+                  f"juego={info.game} mesa={info.table_id}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del clasificador de títulos")
+    parser.add_argument("--rounds", type=int, default=200, help="Repeticiones del corpus")
+    run_benchmark(parser.parse_args().rounds)
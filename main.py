@@ -13,6 +13,9 @@ from src.utils.logger import setup_logger, log_message
 from src.config.settings import load_config, save_config
 from src.ui.login_window import LoginWindow
 from src.ui.styles.theme import apply_theme
+from src.utils.capture_backends import stop_session_recording
+from src.core.stats_service import close_stats_service
+from src.core.player_analysis import close_player_analyzer
 
 def load_fonts():
     """Carga las fuentes personalizadas de la aplicación"""
@@ -129,7 +132,13 @@ def main():
         login_window.show()
         
         # Iniciar loop de eventos
-        sys.exit(app.exec())
+        exit_code = app.exec()
+        
+        # Cerrar la grabación de sesión, si la hay, para escribir su índice
+        stop_session_recording()
+        close_stats_service()
+        close_player_analyzer()
+        sys.exit(exit_code)
         
     except Exception as e:
         log_message(f"Error crítico en la aplicación: {e}", level='critical')
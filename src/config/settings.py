@@ -21,22 +21,64 @@ load_dotenv()
 CONFIG_PATH = Path("config/config.json")
 CREDENTIALS_PATH = Path("config/credentials.json")
 HISTORY_PATH = Path("config/historial.json")
+STATS_CACHE_PATH = Path("config/stats_cache.db")
+POPULATION_PATH = Path("config/population.json")
+ANALYSIS_CACHE_PATH = Path("config/analysis_cache.db")
 
 # Configuración por defecto
 DEFAULT_CONFIG = {
     "api_url": "https://pokerprotrack.com/api",
     "token": "",  # será reemplazado desde .env si está disponible
+    "api_connect_timeout": 3.0,        # segundos para establecer la conexión con la API
+    "api_read_timeout": 10.0,          # segundos de espera de cada respuesta
+    "api_pool_size": 16,               # conexiones persistentes y búsquedas simultáneas
+    "api_batch_window_ms": 10,         # espera máxima para agrupar búsquedas en un lote
+    "api_batch_max": 50,               # claves máximas por lote
+    "population_sketch_k": 200,        # tamaño de los resúmenes de percentiles por sala
+    "api_rate_limit": 20,              # peticiones por segundo a la API como máximo
+    "api_rate_burst": 40,              # ráfaga máxima por encima del límite
+    "api_max_retries": 2,              # reintentos de un fallo transitorio
+    "api_retry_ratio": 0.2,            # reintentos permitidos por petición original
+    "api_breaker_failures": 5,         # fallos seguidos que abren el cortacircuitos
+    "api_breaker_open_s": 10,          # segundos sin llamar a la API tras abrirse
+    "api_hedge_enabled": False,        # duplicar las peticiones lentas
+    "api_hedge_delay_ms": 0,           # espera antes de duplicar; 0 = p95 del endpoint
+    "stats_cache_max_entries": 5000,   # jugadores en la caché en memoria
+    "stats_cache_ttl_min": 600,        # vida mínima (s) de una entrada (jugadores con pocas manos)
+    "stats_cache_ttl_max": 259200,     # vida máxima (s) de una entrada (regulares con mucha muestra)
+    "stats_cache_ttl_per_hand": 20,    # segundos de vida por mano de la muestra
+    "stats_cache_stale_ttl": 604800,   # segundos extra en que se sirve caducada mientras se refresca
+    "stats_refresh_budget": 120,       # refrescos de caché por minuto como máximo
+    "negative_cache_ttl": 600,         # segundos que se recuerda un jugador no encontrado
+    "negative_cache_capacity": 20000,  # jugadores no encontrados por filtro de Bloom
+    "stats_push_enabled": True,        # recibir por suscripción los cambios de los jugadores sentados
+    "stats_push_wait": 25,             # segundos que el servidor retiene cada sondeo de cambios
+    "autocomplete_debounce_ms": 60,    # pausa al escribir antes de pedir sugerencias
+    "autocomplete_max_results": 10,    # sugerencias mostradas como máximo
     "openai_api_key": "",  # será reemplazado desde .env si está disponible
+    "openai_base_url": "https://api.openai.com/v1",
+    "openai_model": "gpt-3.5-turbo",
+    "openai_timeout": 60,              # segundos de espera de la respuesta del modelo
+    "analysis_cache_max_entries": 2000,  # análisis guardados como máximo
+    "analysis_cache_tolerance": 2.0,   # puntos que puede moverse un porcentaje sin repetir el análisis
+    "analysis_cache_sample_tolerance": 0.25,  # variación relativa de manos tolerada
     "ocr_coords": {"x": 95, "y": 110, "w": 95, "h": 22},
     "sala_default": "XPK",
     "hotkey": "alt+q",
     "modo_automatico": False,
     "auto_check_interval": 30,
+    "auto_min_interval": 5,            # intervalo mínimo por mesa en modo automático
+    "auto_max_workers": 0,             # procesos de OCR del modo automático; 0 = según las CPUs
+    "table_scan_interval_ms": 1000,    # cadencia de enumeración de ventanas
+    "seat_coords": [],                 # regiones de asientos; vacío = usar ocr_coords
+    "change_check_interval_ms": 250,   # frecuencia de la detección de cambios en asientos
+    "change_threshold": 8.0,           # diferencia media (0-255) para considerar un asiento cambiado
     "mostrar_stats": True,
     "mostrar_analisis": True,
     "tema": "dark",
     "idioma_ocr": "multilingual",
     "mostrar_dialogo_copia": False,
+    "guardar_capturas_debug": False,  # guardar cada captura OCR como PNG en capturas/
     
     # Nuevas configuraciones para tema y UI
     "ui_animations": True,
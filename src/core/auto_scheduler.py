@@ -0,0 +1,318 @@
+"""
+Planificador del modo automático
+Envía la lectura de asientos de todas las mesas registradas al pipeline de
+análisis de mesas, con un intervalo por mesa que se adapta a la rotación de
+jugadores observada y prioridad para la mesa activa
+"""
+
+import os
+import sys
+import time
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from PySide6.QtCore import QThread, Signal
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.utils.capture_backends import get_capture_backend
+from src.core.table_pipeline import StatsLookup, TableWork, build_table_pipeline
+from src.core.player_classifier import PlayerProfile
+
+# Factores de adaptación del intervalo
+INTERVAL_SHRINK = 0.5
+INTERVAL_GROWTH = 1.5
+
+def default_worker_count(config: dict) -> int:
+    """Procesos de OCR según la configuración o el número de CPUs"""
+    configured = int(config.get("auto_max_workers", 0) or 0)
+    if configured > 0:
+        return configured
+    # El OCR ya usa varios hilos internamente: la mitad de las CPUs, entre 1 y 8
+    return max(1, min(8, (os.cpu_count() or 2) // 2))
+
+class TableState:
+    """Estado de planificación de una mesa"""
+
+    __slots__ = (
+        "hwnd", "title", "interval", "due", "running", "foreground", "urgent", "full_read",
+        "pending_seats", "nicks", "stats", "profiles", "runs", "changes",
+        "last_lag", "last_duration", "last_run"
+    )
+
+    def __init__(self, hwnd: int, title: str, interval: float, due: float):
+        self.hwnd = hwnd
+        self.title = title
+        self.interval = interval
+        self.due = due
+        self.running = False
+        self.foreground = False             # era la mesa activa al enviarla
+        self.urgent = False                 # lectura adelantada por un cambio
+        self.full_read = False              # el cambio afecta a todos los asientos
+        self.pending_seats: set = set()     # asientos cambiados pendientes de leer
+        self.nicks: Dict[int, str] = {}
+        self.stats: Dict[int, dict] = {}
+        self.profiles: Dict[int, PlayerProfile] = {}
+        self.runs = 0
+        self.changes = 0
+        self.last_lag = 0.0
+        self.last_duration = 0.0
+        self.last_run = 0.0
+
+    def apply(self, work: TableWork) -> Tuple[bool, bool]:
+        """
+        Incorpora lo leído en un trabajo, asiento a asiento
+
+        Un asiento con otro nick pierde las estadísticas y el perfil del
+        jugador anterior; si la búsqueda del nuevo falla se queda sin ellas.
+
+        Returns:
+            Tupla (ha cambiado algún nick, ha cambiado algo que mostrar)
+        """
+        changed = updated = False
+        for seat, nick in work.nicks.items():
+            if self.nicks.get(seat) != nick:
+                changed = True
+                self.stats.pop(seat, None)
+                self.profiles.pop(seat, None)
+            self.nicks[seat] = nick
+        for seat, stats in work.stats.items():
+            if self.stats.get(seat) != stats:
+                updated = True
+                self.stats[seat] = stats
+        for seat, profile in work.profiles.items():
+            self.profiles[seat] = profile
+        return changed, changed or updated
+
+    def snapshot(self) -> TableWork:
+        """Copia de lo conocido de la mesa para la interfaz"""
+        work = TableWork(self.hwnd)
+        work.nicks = dict(self.nicks)
+        work.stats = dict(self.stats)
+        work.profiles = dict(self.profiles)
+        return work
+
+    def metrics(self) -> dict:
+        """Métricas publicables de la mesa"""
+        return {
+            "title": self.title,
+            "interval_s": round(self.interval, 2),
+            "lag_ms": round(self.last_lag * 1000, 1),
+            "duration_ms": round(self.last_duration * 1000, 1),
+            "runs": self.runs,
+            "changes": self.changes,
+        }
+
+class AutoModeScheduler(QThread):
+    """
+    Planificador de lecturas periódicas de las mesas
+
+    Cada mesa tiene su propio intervalo, acotado entre auto_min_interval y
+    auto_check_interval: se reduce a la mitad cuando cambian los nicks de la
+    mesa y crece un 50% cuando no cambian. La mesa en primer plano se lee
+    con el intervalo mínimo y pasa delante. Cada lectura es un TableWork que
+    recorre el pipeline de mesas (captura -> OCR -> consulta); el
+    planificador se entera de que ha terminado por su sink o, si el
+    pipeline lo descarta, por on_discard. Nunca hay más de un trabajo en
+    curso por mesa ni más de dos por proceso de OCR.
+
+    Args:
+        config: Configuración de la aplicación
+        lookup: Búsqueda en bloque de estadísticas para la etapa de consulta
+    """
+
+    tableAnalyzed = Signal(int, object) # hwnd, TableWork con nicks, estadísticas y perfiles
+    tableMetrics = Signal(int, dict)    # hwnd, métricas
+
+    def __init__(self, config: dict, lookup: Optional[StatsLookup] = None, parent=None):
+        super().__init__(parent)
+        self.min_interval = float(config.get("auto_min_interval", 5))
+        self.max_interval = max(self.min_interval, float(config.get("auto_check_interval", 30)))
+        self.workers = default_worker_count(config)
+        self.pipeline = build_table_pipeline(
+            config, self._on_work_done, lookup, ocr_processes=self.workers,
+            on_discard=self._on_work_discarded
+        )
+
+        self._tables: Dict[int, TableState] = {}
+        self._in_flight: Dict[int, TableState] = {}
+        self._condition = threading.Condition()
+        # Uno en OCR y otro esperando en su cola por proceso
+        self._free_slots = self.workers * 2
+        self._stopping = False
+
+    def add_table(self, hwnd: int, title: str = "") -> None:
+        """Registra una mesa; su primera lectura se planifica de inmediato"""
+        with self._condition:
+            if hwnd in self._tables:
+                self._tables[hwnd].title = title
+                return
+            self._tables[hwnd] = TableState(hwnd, title, self.min_interval, time.monotonic())
+            self._condition.notify()
+
+    def remove_table(self, hwnd: int) -> None:
+        """Deja de planificar una mesa"""
+        with self._condition:
+            self._tables.pop(hwnd, None)
+
+    def set_tables(self, tables: Iterable) -> None:
+        """Sincroniza las mesas planificadas con una lista de (hwnd, title)"""
+        tables = dict(tables)
+        with self._condition:
+            for hwnd in list(self._tables):
+                if hwnd not in tables:
+                    del self._tables[hwnd]
+        for hwnd, title in tables.items():
+            self.add_table(hwnd, title)
+
+    def notify_change(self, hwnd: int, seats: Optional[List[int]] = None) -> None:
+        """
+        Adelanta la lectura de una mesa porque han cambiado sus asientos
+
+        Args:
+            hwnd: Handle de la mesa
+            seats: Asientos que han cambiado, o None para leerlos todos
+        """
+        with self._condition:
+            state = self._tables.get(hwnd)
+            if state is None:
+                return
+            if seats is None:
+                state.full_read = True
+            else:
+                state.pending_seats.update(seats)
+            state.urgent = True
+            state.due = min(state.due, time.monotonic())
+            self._condition.notify()
+
+    def set_max_interval(self, interval: float) -> None:
+        """Actualiza el intervalo máximo (auto_check_interval)"""
+        with self._condition:
+            self.max_interval = max(self.min_interval, float(interval))
+            for state in self._tables.values():
+                state.interval = min(state.interval, self.max_interval)
+
+    def metrics(self) -> Dict[int, dict]:
+        """Instantánea de las métricas de todas las mesas"""
+        with self._condition:
+            return {hwnd: state.metrics() for hwnd, state in self._tables.items()}
+
+    def pipeline_metrics(self) -> Dict[str, dict]:
+        """Métricas de cada etapa del pipeline de mesas"""
+        return self.pipeline.metrics()
+
+    def stop(self) -> None:
+        """Detiene el planificador y espera a que termine"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self.wait()
+
+    def run(self):
+        """Bucle de planificación"""
+        self.pipeline.start()
+        log_message(f"Modo automático: planificador iniciado con {self.workers} procesos de OCR")
+
+        try:
+            while True:
+                # Consultar la ventana activa fuera del bloqueo
+                try:
+                    foreground = get_capture_backend().get_foreground_window()
+                except Exception:
+                    foreground = None
+
+                works = []
+                with self._condition:
+                    if self._stopping:
+                        break
+
+                    now = time.monotonic()
+                    # Una mesa quitada y vuelta a añadir no se lee hasta que
+                    # termine el trabajo que quedó en curso con su estado anterior
+                    ready = [s for s in self._tables.values() if s.hwnd not in self._in_flight]
+                    due = [s for s in ready if s.due <= now]
+
+                    if due and self._free_slots > 0:
+                        due.sort(key=lambda s: (s.hwnd != foreground, s.due))
+                        works = [self._dispatch(state, now, state.hwnd == foreground)
+                                 for state in due[:self._free_slots]]
+                    else:
+                        # Esperar al siguiente vencimiento, a que termine un trabajo
+                        # o como mucho un segundo para refrescar la ventana activa
+                        pending = [s.due for s in ready]
+                        timeout = 1.0
+                        if pending and self._free_slots > 0:
+                            timeout = min(timeout, max(0.0, min(pending) - now))
+                        self._condition.wait(timeout)
+
+                # Fuera del bloqueo: el pipeline puede avisar de un descarte al encolar
+                for work in works:
+                    self.pipeline.submit(work)
+        finally:
+            self.pipeline.stop()
+            log_message(f"Modo automático: planificador detenido, etapas {self.pipeline.metrics()}")
+
+    def _dispatch(self, state: TableState, now: float, foreground: bool) -> TableWork:
+        """Prepara el trabajo de una mesa (con el bloqueo tomado)"""
+        state.running = True
+        state.foreground = foreground
+        state.last_lag = now - state.due
+        # Las lecturas periódicas leen todos los asientos; las adelantadas, solo los cambiados
+        partial = state.urgent and not state.full_read and state.runs > 0
+        seats = sorted(state.pending_seats) if partial else None
+        state.urgent = False
+        state.full_read = False
+        state.pending_seats = set()
+        self._free_slots -= 1
+        self._in_flight[state.hwnd] = state
+        return TableWork(state.hwnd, seats)
+
+    def _on_work_done(self, work: TableWork) -> None:
+        """Sink del pipeline: trabajo terminado"""
+        self._finish(work, work)
+
+    def _on_work_discarded(self, work: TableWork) -> None:
+        """El pipeline descartó el trabajo (captura fallida, obsoleto o error)"""
+        self._finish(work, None)
+
+    def _finish(self, work: TableWork, result: Optional[TableWork]) -> None:
+        """Cierra el trabajo de una mesa y planifica la siguiente lectura"""
+        finished = time.monotonic()
+        changed = updated = False
+
+        with self._condition:
+            # Cada trabajo despachado devuelve su hueco, pase lo que pase con su mesa
+            self._free_slots += 1
+            self._condition.notify()
+            state = self._in_flight.pop(work.hwnd, None)
+            if state is None:
+                return
+            state.running = False
+            state.runs += 1
+            state.last_run = finished
+            state.last_duration = finished - work.created
+
+            if result is not None:
+                changed, updated = state.apply(result)
+
+            # Adaptar el intervalo a la rotación observada
+            if changed:
+                state.changes += 1
+                state.interval = max(self.min_interval, state.interval * INTERVAL_SHRINK)
+            else:
+                state.interval = min(self.max_interval, state.interval * INTERVAL_GROWTH)
+
+            interval = self.min_interval if state.foreground else state.interval
+            # Si llegaron cambios mientras se leía la mesa, repetir enseguida
+            state.due = finished if state.urgent else finished + interval
+
+            snapshot = state.snapshot() if updated else None
+            metrics = state.metrics()
+            still_registered = self._tables.get(state.hwnd) is state
+            self._condition.notify()
+
+        if not still_registered:
+            return
+        if snapshot is not None:
+            self.tableAnalyzed.emit(state.hwnd, snapshot)
+        self.tableMetrics.emit(state.hwnd, metrics)
@@ -0,0 +1,185 @@
+"""
+Detector de cambios en los asientos de las mesas
+Compara miniaturas de baja resolución de cada asiento para lanzar el OCR
+completo solo cuando una región cambia realmente
+"""
+
+import os
+import sys
+import time
+import threading
+import numpy as np
+from typing import Dict, List, Tuple, Iterable
+from PySide6.QtCore import QThread, Signal
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.utils.windows import capture_window_array
+
+Rect = Tuple[int, int, int, int]
+
+def get_seat_rects(config: dict) -> List[Rect]:
+    """
+    Obtiene las regiones de los asientos desde la configuración
+
+    Usa seat_coords si está definido y, si no, la región única de ocr_coords
+    """
+    coords = config.get("seat_coords") or [config.get("ocr_coords", {"x": 0, "y": 0, "w": 0, "h": 0})]
+    return [(c["x"], c["y"], c["w"], c["h"]) for c in coords]
+
+def seats_capture_rect(seat_rects: List[Rect]) -> Rect:
+    """
+    Región mínima a capturar que contiene todos los asientos
+
+    Empieza siempre en (0, 0) para que las coordenadas de los asientos
+    sigan siendo válidas dentro del fotograma capturado.
+    """
+    right = max((x + w for x, _, w, _ in seat_rects), default=0)
+    bottom = max((y + h for _, y, _, h in seat_rects), default=0)
+    return 0, 0, right, bottom
+
+def block_signature(frame: np.ndarray, rect: Rect, block: int = 4, step: int = 2) -> np.ndarray:
+    """
+    Calcula una miniatura de medias por bloques de una región
+
+    Args:
+        frame: Fotograma BGRA (alto x ancho x 4) o gris (alto x ancho)
+        rect: Región (x, y, width, height) dentro del fotograma
+        block: Lado del bloque (en píxeles ya submuestreados)
+        step: Submuestreo previo de la región (1 = todos los píxeles)
+
+    Returns:
+        Array float32 de (filas x columnas) con la luminancia media de cada bloque
+    """
+    x, y, width, height = rect
+    region = frame[y:y + height:step, x:x + width:step]
+    if region.ndim == 3:
+        # Sumar los canales de color sin el alfa
+        region = region[..., :3]
+
+    rows, cols = region.shape[0] // block, region.shape[1] // block
+    if rows == 0 or cols == 0:
+        return np.zeros((1, 1), dtype=np.float32)
+
+    region = region[:rows * block, :cols * block]
+    if region.ndim == 3:
+        blocks = region.reshape(rows, block, cols, block, region.shape[2])
+        return blocks.mean(axis=(1, 3, 4), dtype=np.float32)
+    return region.reshape(rows, block, cols, block).mean(axis=(1, 3), dtype=np.float32)
+
+class SeatChangeDetector:
+    """
+    Mantiene la última miniatura de cada asiento y detecta cambios
+
+    Un asiento cambia cuando la diferencia media absoluta entre miniaturas
+    supera threshold (en niveles de gris 0-255) o cuando cambia una fracción
+    de bloques mayor que block_fraction.
+    """
+
+    def __init__(self, seat_rects: List[Rect], threshold: float = 8.0,
+                 block_fraction: float = 0.15, block: int = 4, step: int = 2):
+        self.seat_rects = list(seat_rects)
+        self.threshold = threshold
+        self.block_fraction = block_fraction
+        self.block = block
+        self.step = step
+        self._signatures: Dict[int, List[np.ndarray]] = {}
+
+    def capture_rect(self) -> Rect:
+        """Región mínima a capturar que contiene todos los asientos"""
+        return seats_capture_rect(self.seat_rects)
+
+    def update(self, hwnd: int, frame: np.ndarray) -> List[int]:
+        """
+        Compara el fotograma con el anterior de la misma mesa
+
+        Returns:
+            Índices de los asientos que han cambiado (todos en la primera llamada)
+        """
+        current = [block_signature(frame, rect, self.block, self.step) for rect in self.seat_rects]
+        previous = self._signatures.get(hwnd)
+        self._signatures[hwnd] = current
+
+        if previous is None:
+            return list(range(len(current)))
+
+        changed = []
+        for seat, (old, new) in enumerate(zip(previous, current)):
+            if old.shape != new.shape:
+                changed.append(seat)
+                continue
+            diff = np.abs(new - old)
+            if diff.mean() > self.threshold or (diff > self.threshold * 2).mean() > self.block_fraction:
+                changed.append(seat)
+        return changed
+
+    def forget(self, hwnd: int) -> None:
+        """Olvida el estado de una mesa (p. ej. al cerrarse)"""
+        self._signatures.pop(hwnd, None)
+
+class SeatChangeWatcher(QThread):
+    """
+    Hilo que vigila los asientos de varias mesas a alta frecuencia
+
+    Cada ciclo captura solo la región que contiene los asientos, calcula las
+    miniaturas y emite seatsChanged cuando alguna cambia. En modo automático
+    la señal va a AutoModeScheduler.notify_change, que manda los asientos
+    cambiados por el pipeline de mesas completo: captura, OCR y búsqueda de
+    estadísticas del nuevo ocupante.
+    """
+
+    seatsChanged = Signal(int, list)  # hwnd, índices de asientos
+
+    def __init__(self, config: dict, parent=None):
+        super().__init__(parent)
+        self.detector = SeatChangeDetector(
+            get_seat_rects(config),
+            threshold=float(config.get("change_threshold", 8.0))
+        )
+        self.interval = max(0.02, config.get("change_check_interval_ms", 250) / 1000.0)
+        self._tables: List[int] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.cycle_time = 0.0
+
+    def set_tables(self, hwnds: Iterable[int]) -> None:
+        """Establece las mesas a vigilar"""
+        hwnds = list(hwnds)
+        with self._lock:
+            for hwnd in set(self._tables) - set(hwnds):
+                self.detector.forget(hwnd)
+            self._tables = hwnds
+
+    def stop(self) -> None:
+        """Detiene el hilo y espera a que termine"""
+        self._stop_event.set()
+        self.wait()
+
+    def run(self):
+        """Bucle de vigilancia"""
+        capture_rect = self.detector.capture_rect()
+        log_message(f"Vigilancia de asientos iniciada (cada {self.interval * 1000:.0f} ms)")
+
+        while not self._stop_event.is_set():
+            started = time.perf_counter()
+
+            with self._lock:
+                tables = list(self._tables)
+
+            for hwnd in tables:
+                frame = capture_window_array(hwnd, capture_rect)
+                if frame is None:
+                    continue
+                try:
+                    changed = self.detector.update(hwnd, frame.array)
+                finally:
+                    frame.release()
+
+                if changed:
+                    self.seatsChanged.emit(hwnd, changed)
+
+            self.cycle_time = time.perf_counter() - started
+            self._stop_event.wait(max(0.0, self.interval - self.cycle_time))
+
+        log_message("Vigilancia de asientos detenida")
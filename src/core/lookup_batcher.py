@@ -0,0 +1,270 @@
+"""
+Agrupación de búsquedas de estadísticas en lotes
+Reúne las búsquedas que llegan en una ventana corta de tiempo y las envía a
+la API en una sola petición de lote, repartiendo después los resultados
+"""
+
+import os
+import sys
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.core.stats_client import StatsClient, LookupKey
+
+# Prioridades de búsqueda (menor = antes)
+PRIORITY_INTERACTIVE = 0    # búsqueda manual del usuario: se envía sin esperar
+PRIORITY_AUTO = 1           # modo automático: se agrupa durante la ventana
+
+class LookupBatcher:
+    """
+    Agrupa búsquedas de (nick, sala) en lotes
+
+    Las búsquedas de modo automático esperan como mucho window_ms o hasta
+    reunir max_batch claves. Las interactivas se envían en cuanto llegan,
+    en su propio lote, y además tienen reservado un hilo de envío: los lotes
+    automáticos en vuelo nunca pasan de max_inflight, de modo que una
+    búsqueda manual no queda detrás de ellos ni sin conexión libre.
+
+    Las claves repetidas dentro de un lote se envían una vez y todos los
+    que las pidieron reciben el mismo resultado.
+    """
+
+    def __init__(self, client: StatsClient, window_ms: float = 10.0, max_batch: int = 50,
+                 max_inflight: int = 2):
+        self.client = client
+        self.window = max(0.0, window_ms / 1000.0)
+        self.max_batch = max(1, max_batch)
+        self.max_inflight = max(1, max_inflight)
+
+        # Pendientes por prioridad: clave -> futures de quienes la pidieron
+        self._pending: Dict[int, Dict[LookupKey, List[Future]]] = {
+            PRIORITY_INTERACTIVE: {}, PRIORITY_AUTO: {}
+        }
+        self._oldest: Dict[int, float] = {}
+        self._inflight_auto = 0
+        self._condition = threading.Condition()
+        self._stopping = False
+
+        self.batches_sent = 0
+        self.keys_sent = 0
+        self.requests_merged = 0
+
+        # Un hilo más que los lotes automáticos permitidos, reservado a los interactivos
+        self._executor = ThreadPoolExecutor(max_workers=self.max_inflight + 1, thread_name_prefix="LookupBatch")
+        self._thread = threading.Thread(target=self._run, name="LookupBatcher", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, client: StatsClient, config: dict) -> "LookupBatcher":
+        """Crea un agrupador con los valores de la configuración"""
+        return cls(
+            client,
+            window_ms=float(config.get("api_batch_window_ms", 10)),
+            max_batch=int(config.get("api_batch_max", 50)),
+        )
+
+    def submit(self, nick: str, sala: str, priority: int = PRIORITY_AUTO) -> Future:
+        """
+        Encola una búsqueda
+
+        Returns:
+            Future que se resuelve con las estadísticas o None
+        """
+        future: Future = Future()
+        priority = PRIORITY_INTERACTIVE if priority <= PRIORITY_INTERACTIVE else PRIORITY_AUTO
+
+        with self._condition:
+            if self._stopping:
+                future.set_result(None)
+                return future
+
+            pending = self._pending[priority]
+            key = (nick, sala)
+            if key in pending:
+                self.requests_merged += 1
+            if not pending:
+                self._oldest[priority] = time.monotonic()
+            pending.setdefault(key, []).append(future)
+            self._condition.notify()
+
+        return future
+
+    def promote(self, nick: str, sala: str) -> bool:
+        """
+        Pasa a interactiva una búsqueda automática que aún no se ha enviado
+
+        Returns:
+            True si la búsqueda estaba pendiente y se adelantó
+        """
+        key = (nick, sala)
+        with self._condition:
+            futures = self._pending[PRIORITY_AUTO].pop(key, None)
+            if futures is None:
+                return False
+            if not self._pending[PRIORITY_AUTO]:
+                self._oldest.pop(PRIORITY_AUTO, None)
+            interactive = self._pending[PRIORITY_INTERACTIVE]
+            if not interactive:
+                self._oldest[PRIORITY_INTERACTIVE] = time.monotonic()
+            interactive.setdefault(key, []).extend(futures)
+            self._condition.notify()
+            return True
+
+    def lookup(self, nick: str, sala: str, priority: int = PRIORITY_AUTO) -> Optional[dict]:
+        """Búsqueda síncrona a través del agrupador"""
+        return self.submit(nick, sala, priority).result()
+
+    def lookup_many(self, keys: Iterable[LookupKey], priority: int = PRIORITY_AUTO) -> Dict[LookupKey, Optional[dict]]:
+        """Encola varias búsquedas y espera todos los resultados"""
+        futures = {key: self.submit(key[0], key[1], priority) for key in dict.fromkeys(keys)}
+        return {key: future.result() for key, future in futures.items()}
+
+    def stop(self) -> None:
+        """Envía lo pendiente y detiene el agrupador"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def metrics(self) -> Dict[str, float]:
+        """Contadores del agrupador"""
+        with self._condition:
+            return {
+                "batches": self.batches_sent,
+                "keys": self.keys_sent,
+                "avg_batch": round(self.keys_sent / self.batches_sent, 1) if self.batches_sent else 0.0,
+                "merged": self.requests_merged,
+                "pending": sum(len(p) for p in self._pending.values()),
+            }
+
+    def _take(self, priority: int) -> Dict[LookupKey, List[Future]]:
+        """Extrae hasta max_batch claves pendientes (con el bloqueo tomado)"""
+        pending = self._pending[priority]
+        keys = list(pending)[:self.max_batch]
+        batch = {key: pending.pop(key) for key in keys}
+        if pending:
+            self._oldest[priority] = time.monotonic()
+        else:
+            self._oldest.pop(priority, None)
+        self.batches_sent += 1
+        self.keys_sent += len(batch)
+        return batch
+
+    def _run(self) -> None:
+        """Bucle que decide cuándo se envía cada lote"""
+        while True:
+            with self._condition:
+                while True:
+                    if self._pending[PRIORITY_INTERACTIVE]:
+                        priority = PRIORITY_INTERACTIVE
+                        break
+
+                    auto = self._pending[PRIORITY_AUTO]
+                    if auto and self._inflight_auto < self.max_inflight:
+                        age = time.monotonic() - self._oldest[PRIORITY_AUTO]
+                        if self._stopping or len(auto) >= self.max_batch or age >= self.window:
+                            priority = PRIORITY_AUTO
+                            self._inflight_auto += 1
+                            break
+                        self._condition.wait(self.window - age)
+                        continue
+
+                    if self._stopping and not auto:
+                        return
+                    self._condition.wait()
+
+                batch = self._take(priority)
+
+            self._executor.submit(self._send, batch, priority)
+
+    def _send(self, batch: Dict[LookupKey, List[Future]], priority: int) -> None:
+        """
+        Envía un lote y reparte los resultados (o el error) entre quienes los esperan
+
+        Cada jugador se entrega en cuanto llega su línea de la respuesta,
+        sin esperar al resto del lote.
+        """
+        delivered = set()
+
+        def deliver(key: LookupKey, stats: Optional[dict]) -> None:
+            if key in batch and key not in delivered:
+                delivered.add(key)
+                for future in batch[key]:
+                    future.set_result(stats)
+
+        try:
+            results = self.client.lookup_bulk(list(batch), deliver)
+        except Exception as e:
+            log_message(f"Error al enviar lote de {len(batch)} búsquedas: {e}", level='error')
+            for key, futures in batch.items():
+                if key not in delivered:
+                    for future in futures:
+                        future.set_exception(e)
+            return
+        finally:
+            if priority == PRIORITY_AUTO:
+                with self._condition:
+                    self._inflight_auto -= 1
+                    self._condition.notify()
+
+        if results is None:
+            # Sin endpoint de lote: peticiones individuales concurrentes
+            for key, futures in batch.items():
+                self.client.submit(*key).add_done_callback(
+                    lambda done, futures=futures: _copy_outcome(done, futures)
+                )
+            return
+
+        for key in batch:
+            deliver(key, results.get(key))
+
+def _copy_outcome(done: Future, futures: List[Future]) -> None:
+    """Copia el resultado o la excepción de un Future a otros"""
+    error = done.exception()
+    for future in futures:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(done.result())
+
+def test_lookup_batcher():
+    """Función de prueba del agrupador contra el servidor local"""
+    from src.utils.stub_servers import StatsStubServer
+
+    with StatsStubServer(latency=0.05) as stub:
+        client = StatsClient(stub.url, pool_size=4, max_workers=8)
+        batcher = LookupBatcher(client, window_ms=20, max_batch=50)
+
+        # 40 nicks de varias mesas llegan casi a la vez
+        futures = [batcher.submit(f"jugador{i}", "XPK") for i in range(40)]
+        time.sleep(0.005)
+        started = time.perf_counter()
+        manual = batcher.lookup("manual", "XPK", PRIORITY_INTERACTIVE)
+        log_message(f"Búsqueda interactiva: {(time.perf_counter() - started) * 1000:.0f} ms, "
+                    f"{'encontrada' if manual else 'no encontrada'}")
+
+        found = sum(1 for f in futures if f.result())
+        log_message(f"Automáticas: {found}/40, lotes recibidos por el servidor: {stub.batch_sizes}")
+        log_message(f"Métricas: {batcher.metrics()}")
+
+        batcher.stop()
+        client.close()
+
+    # Servidor sin endpoint de lote: peticiones individuales concurrentes
+    with StatsStubServer(latency=0.05, bulk=False) as stub:
+        client = StatsClient(stub.url, pool_size=8, max_workers=16)
+        batcher = LookupBatcher(client, window_ms=20)
+        results = batcher.lookup_many([(f"jugador{i}", "XPK") for i in range(20)])
+        log_message(f"Sin lote: {sum(1 for r in results.values() if r)}/20 "
+                    f"con {stub.requests} peticiones en {stub.connections} conexiones")
+        batcher.stop()
+        client.close()
+
+if __name__ == "__main__":
+    test_lookup_batcher()
@@ -0,0 +1,120 @@
+"""
+Caché negativa de jugadores no encontrados
+Recuerda durante un tiempo corto las claves que la API confirmó que no
+existen, con filtros de Bloom rotativos para que repetir un fallo cueste
+unos hashes en lugar de una petición
+"""
+
+import os
+import sys
+import math
+import time
+import hashlib
+import threading
+from typing import Dict, Hashable
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+
+class BloomFilter:
+    """
+    Filtro de Bloom sobre un bytearray
+
+    Dimensionado para capacity elementos con una tasa de falsos positivos
+    error_rate. Las k posiciones salen de dos hashes de un único BLAKE2b
+    (doble hashing de Kirsch-Mitzenmacher).
+    """
+
+    def __init__(self, capacity: int = 10000, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: Hashable):
+        digest = hashlib.blake2b(repr(item).encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: Hashable) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: Hashable) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class NegativeCache:
+    """
+    Conjunto aproximado de claves no encontradas con caducidad
+
+    Mantiene dos filtros de Bloom: las claves nuevas van al actual y las
+    consultas miran ambos. Cada ttl/2 segundos el actual pasa a ser el
+    anterior y se empieza uno vacío, así que una clave se recuerda entre
+    ttl/2 y ttl segundos sin guardar instantes por clave. Un filtro de Bloom
+    no admite borrados: si un jugador aparece antes, se sigue considerando
+    ausente hasta que rote su filtro, y con probabilidad error_rate una
+    clave nunca añadida da un falso positivo. Por eso las búsquedas
+    manuales no consultan esta caché.
+    """
+
+    def __init__(self, ttl: float = 600, capacity: int = 20000, error_rate: float = 0.001):
+        self.ttl = max(1.0, ttl)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        self._rotated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.added = 0
+
+    def _rotate(self) -> None:
+        """Rota los filtros si ha pasado media vida o el actual está lleno (con el bloqueo tomado)"""
+        now = time.monotonic()
+        elapsed = now - self._rotated_at
+        if elapsed >= self.ttl:
+            # Ambos filtros caducaron
+            self._previous = BloomFilter(self.capacity, self.error_rate)
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = now
+        elif elapsed >= self.ttl / 2 or self._current.count >= self.capacity:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = now
+
+    def add(self, key: Hashable) -> None:
+        """Apunta una clave confirmada como inexistente"""
+        with self._lock:
+            self._rotate()
+            self._current.add(key)
+            self.added += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            self._rotate()
+            found = key in self._current or key in self._previous
+            if found:
+                self.hits += 1
+            return found
+
+    def clear(self) -> None:
+        with self._lock:
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._previous = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = time.monotonic()
+        log_message("Caché negativa vaciada")
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "added": self.added,
+                "entries": self._current.count + self._previous.count,
+                "bytes": len(self._current.bits) + len(self._previous.bits),
+            }
@@ -0,0 +1,351 @@
+"""
+Índice de nicks conocidos para corregir lecturas del OCR
+Guarda por sala todos los nicks vistos (caché, historial y búsquedas) y
+encuentra el más parecido a una lectura dudosa mediante un índice invertido
+de trigramas y la distancia de edición
+"""
+
+import os
+import sys
+import json
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.utils.nick_normalizer import canonical_nick, fold_confusables, lookup_key, normalize_sala
+
+# Confianza del OCR por debajo de la cual se intenta corregir el nick
+LOW_CONFIDENCE = 0.85
+
+# Marcador de inicio y fin para que los nicks cortos también tengan trigramas
+_PAD = "\x02"
+
+def trigrams(text: str) -> Set[str]:
+    """Trigramas de un texto con un carácter de relleno en cada extremo"""
+    padded = f"{_PAD}{text}{_PAD}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> int:
+    """
+    Distancia de Levenshtein limitada
+
+    Solo calcula la banda diagonal de anchura 2 * max_distance + 1 y
+    abandona en cuanto toda una fila supera el límite.
+
+    Returns:
+        La distancia, o max_distance + 1 si es mayor que max_distance
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) > len(b):
+        a, b = b, a
+
+    limit = max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [limit] * (len(b) + 1)
+        current[0] = i if i <= max_distance else limit
+        row_min = current[0]
+        for j in range(low, high + 1):
+            cost = 0 if char_a == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            current[j] = value if value < limit else limit
+            if current[j] < row_min:
+                row_min = current[j]
+        if row_min >= limit:
+            return limit
+        previous = current
+    return min(previous[len(b)], limit)
+
+def max_distance_for(text: str) -> int:
+    """
+    Ediciones toleradas según la longitud: 1 hasta 8 caracteres, 2 a partir de ahí
+
+    Con dos ediciones en un nick corto el filtro de trigramas apenas descarta
+    candidatos y las coincidencias dejan de ser fiables.
+    """
+    return 1 if len(text) <= 8 else 2
+
+class _RoomIndex:
+    """
+    Índice de una sala: nicks canónicos, su texto original y sus trigramas
+
+    Cada nick se guarda con su clave canónica (identidad) y con su clave de
+    comparación, en la que los caracteres confundibles están plegados; los
+    trigramas y las distancias se calculan sobre esta última.
+
+    Para los prefijos guarda las claves ordenadas (un trie aplanado en el
+    que los nicks con un mismo prefijo son un tramo contiguo). Las altas se
+    acumulan aparte y se funden al consultar, con una sola ordenación.
+    """
+
+    def __init__(self):
+        self.keys: List[str] = []                       # id -> nick canónico
+        self.display: List[str] = []                    # id -> nick original
+        self.match_keys: List[str] = []                 # id -> clave de comparación
+        self.ids: Dict[str, int] = {}                   # nick canónico -> id
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        self.sorted_keys: List[str] = []
+        self.unsorted: List[str] = []
+
+    def add(self, key: str, match_key: str, display: str) -> bool:
+        if key in self.ids:
+            return False
+        nick_id = len(self.keys)
+        self.keys.append(key)
+        self.match_keys.append(match_key)
+        self.display.append(display)
+        self.ids[key] = nick_id
+        self.unsorted.append(key)
+        for gram in trigrams(match_key):
+            self.postings[gram].append(nick_id)
+        return True
+
+    def compact(self) -> None:
+        """Funde las altas pendientes en la lista ordenada"""
+        if self.unsorted:
+            # Timsort funde en tiempo lineal las dos series ya ordenadas
+            self.unsorted.sort()
+            self.sorted_keys.extend(self.unsorted)
+            self.sorted_keys.sort()
+            self.unsorted = []
+
+    def with_prefix(self, prefix: str, limit: int) -> List[int]:
+        """Ids de hasta limit nicks que empiezan por prefix, en orden alfabético"""
+        self.compact()
+        start = bisect_left(self.sorted_keys, prefix)
+        found = []
+        for key in self.sorted_keys[start:start + limit]:
+            if not key.startswith(prefix):
+                break
+            found.append(self.ids[key])
+        return found
+
+    def containing(self, match_text: str, limit: int) -> List[int]:
+        """
+        Ids de hasta limit nicks cuya clave de comparación contiene match_text
+
+        Interseca las listas de los trigramas del texto (3 o más caracteres)
+        empezando por la más corta; sirve para los nicks CJK, que se suelen
+        recordar por un fragmento intermedio.
+        """
+        grams = {match_text[i:i + 3] for i in range(len(match_text) - 2)}
+        if not grams:
+            return []
+        lists = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        candidates = set(lists[0])
+        for posting in lists[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(posting)
+
+        found = [nick_id for nick_id in sorted(candidates) if match_text in self.match_keys[nick_id]]
+        return found[:limit]
+
+class NickIndex:
+    """
+    Nicks conocidos por sala con búsqueda aproximada
+
+    Las consultas generan candidatos por trigramas compartidos (una edición
+    destruye como mucho tres trigramas, así que se exige compartir al menos
+    len(trigramas) - 3 * d) y los verifican con una distancia de Levenshtein
+    acotada. Se compara sobre la clave canónica con los caracteres
+    confundibles de la sala plegados, así que "P0kerKing" encuentra a
+    "PokerKing"; dos jugadores distintos que solo se diferencian en esos
+    caracteres ("Nit01" y "Nitol") siguen siendo dos entradas.
+    """
+
+    def __init__(self):
+        self._rooms: Dict[str, _RoomIndex] = defaultdict(_RoomIndex)
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(room.keys) for room in self._rooms.values())
+
+    def add(self, nick: str, sala: str) -> bool:
+        """Añade un nick visto; devuelve True si era nuevo"""
+        nick = nick.strip()
+        if not nick:
+            return False
+        key = canonical_nick(nick, sala)
+        with self._lock:
+            return self._rooms[normalize_sala(sala)].add(key, fold_confusables(key, sala), nick)
+
+    def add_many(self, nicks: Iterable[Tuple[str, str]]) -> int:
+        """Añade varios (nick, sala); devuelve cuántos eran nuevos"""
+        return sum(1 for nick, sala in nicks if self.add(nick, sala))
+
+    def contains(self, nick: str, sala: str) -> bool:
+        with self._lock:
+            room = self._rooms.get(normalize_sala(sala))
+            return room is not None and canonical_nick(nick, sala) in room.ids
+
+    def search(self, nick: str, sala: str, max_distance: Optional[int] = None,
+               limit: int = 5) -> List[Tuple[str, int]]:
+        """
+        Nicks conocidos a distancia de edición <= max_distance
+
+        Returns:
+            Lista de (nick original, distancia) ordenada por distancia
+        """
+        key = canonical_nick(nick, sala)
+        match_key = fold_confusables(key, sala)
+        if max_distance is None:
+            max_distance = max_distance_for(key)
+
+        with self._lock:
+            room = self._rooms.get(normalize_sala(sala))
+            if room is None or not key:
+                return []
+
+            exact = room.ids.get(key)
+            if exact is not None and max_distance == 0:
+                return [(room.display[exact], 0)]
+
+            grams = trigrams(match_key)
+            needed = max(1, len(grams) - 3 * max_distance)
+            counts = Counter(chain.from_iterable(room.postings.get(gram, ()) for gram in grams))
+
+            matches = []
+            for nick_id, shared in counts.items():
+                if shared < needed:
+                    continue
+                distance = bounded_levenshtein(match_key, room.match_keys[nick_id], max_distance)
+                if distance <= max_distance:
+                    matches.append((distance, room.display[nick_id]))
+
+        matches.sort()
+        return [(display, distance) for distance, display in matches[:limit]]
+
+    def resolve(self, nick: str, sala: str) -> Optional[str]:
+        """
+        Corrige un nick leído si hay un único nick conocido claramente más cercano
+
+        Returns:
+            El nick conocido (texto original), o None si no hay candidato o
+            hay empate a la mejor distancia
+        """
+        matches = self.search(nick, sala, limit=2)
+        if not matches:
+            return None
+        if len(matches) > 1 and matches[1][1] == matches[0][1]:
+            return None
+        return matches[0][0]
+
+    def suggest(self, text: str, sala: str, limit: int = 10) -> List[str]:
+        """
+        Sugerencias para autocompletar un nick a medio escribir
+
+        Primero los nicks que empiezan por el texto, después los que lo
+        contienen y, si faltan, los que están a una errata.
+
+        Returns:
+            Hasta limit nicks conocidos (texto original)
+        """
+        key = canonical_nick(text, sala)
+        if not key:
+            return []
+
+        with self._lock:
+            room = self._rooms.get(normalize_sala(sala))
+            if room is None:
+                return []
+            ids = room.with_prefix(key, limit)
+            if len(ids) < limit:
+                seen = set(ids)
+                ids.extend(i for i in room.containing(fold_confusables(key, sala), limit)
+                           if i not in seen)
+            suggestions = [room.display[nick_id] for nick_id in ids[:limit]]
+
+        if len(suggestions) < limit and len(key) >= 4:
+            for display, _distance in self.search(text, sala, max_distance=1, limit=limit):
+                if display not in suggestions:
+                    suggestions.append(display)
+        return suggestions[:limit]
+
+    def load_async(self, sources: Iterable[Iterable[Tuple[str, str]]]) -> threading.Thread:
+        """Carga varias fuentes de (nick, sala) en un hilo en segundo plano"""
+        def load():
+            added = 0
+            for source in sources:
+                try:
+                    added += self.add_many(source)
+                except Exception as e:
+                    log_message(f"Error al cargar nicks conocidos: {e}", level='error')
+            # Ordenar ya los prefijos para que la primera sugerencia no espere
+            with self._lock:
+                for room in self._rooms.values():
+                    room.compact()
+            log_message(f"Índice de nicks: {added} nicks cargados ({len(self)} en total)")
+
+        thread = threading.Thread(target=load, name="NickIndexLoader", daemon=True)
+        thread.start()
+        return thread
+
+def read_history_nicks(path: Path, default_sala: str) -> List[Tuple[str, str]]:
+    """Nicks del historial de búsquedas (lista de dicts con nick/sala o de textos)"""
+    try:
+        if not Path(path).exists():
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            history = json.load(f)
+    except Exception as e:
+        log_message(f"Error al leer el historial de nicks: {e}", level='error')
+        return []
+
+    nicks = []
+    for entry in history if isinstance(history, list) else []:
+        if isinstance(entry, dict) and entry.get("nick"):
+            nicks.append((str(entry["nick"]), str(entry.get("sala") or default_sala)))
+        elif isinstance(entry, str):
+            nicks.append((entry, default_sala))
+    return nicks
+
+# Índice compartido por toda la aplicación
+nick_index = NickIndex()
+
+def resolve_ocr_nick(text: str, confidence: float, sala: str) -> str:
+    """
+    Corrige una lectura del OCR de baja confianza con el índice de nicks
+
+    Las lecturas seguras, las que ya son un nick conocido y las que no
+    tienen un único candidato cercano se devuelven sin cambios.
+    """
+    if not text or confidence >= LOW_CONFIDENCE or nick_index.contains(text, sala):
+        return text
+    resolved = nick_index.resolve(text, sala)
+    if resolved:
+        log_message(f"Nick corregido con el índice: '{text}' -> '{resolved}'")
+        return resolved
+    return text
+
+def test_nick_index():
+    """Prueba el índice de nicks con lecturas del OCR típicas"""
+    index = NickIndex()
+    index.add_many([("PokerKing88", "PS"), ("PokerKing89", "PS"), ("LuckyAce", "PS"),
+                    ("ロンドン大将", "XPK"), ("NitMaster", "XPK"),
+                    ("Nit01", "PS"), ("Nitol", "PS")])
+    log_message(f"Nicks indexados: {len(index)}")
+
+    for text, sala in [("P0kerKing88", "PS"), ("PokerKing8", "PS"), ("LuckyAse", "PS"),
+                       ("口ンドン大将", "XPK"), ("Nit Mastr", "XPK"), ("Nit0l", "PS"),
+                       ("Desconocido", "PS")]:
+        log_message(f"{text!r:<16} -> {index.search(text, sala)}  resuelto: {index.resolve(text, sala)!r}")
+
+    for text, sala in [("poker", "PS"), ("P0KERK", "PS"), ("ンドン", "XPK"), ("LuckyAc", "PS")]:
+        log_message(f"Sugerencias {text!r}: {index.suggest(text, sala)}")
+
+    # Las claves de las cachés no pliegan los caracteres confundibles
+    log_message(f"Claves de caché: {lookup_key('Nit01', 'PS')} / {lookup_key('Nitol', 'PS')}")
+
+if __name__ == "__main__":
+    test_nick_index()
@@ -0,0 +1,66 @@
+"""
+Autocompletado de nicks en segundo plano
+Resuelve las sugerencias de la búsqueda manual contra el índice de nicks
+conocidos en un hilo propio, para que escribir nunca espere a la consulta
+"""
+
+import os
+import sys
+import threading
+from typing import Optional, Tuple
+from PySide6.QtCore import QThread, Signal
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.core.nick_index import NickIndex, nick_index
+
+class NickSuggester(QThread):
+    """
+    Hilo de sugerencias de nicks
+
+    Solo importa el último texto pedido: si llegan varias peticiones
+    mientras se resuelve una, las intermedias se descartan. El antirrebote
+    de las pulsaciones lo hace quien llama (un QTimer en la interfaz).
+    """
+
+    suggestionsReady = Signal(str, str, list)  # texto, sala, nicks sugeridos
+
+    def __init__(self, index: NickIndex = nick_index, limit: int = 10, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.limit = limit
+        self._pending: Optional[Tuple[str, str]] = None
+        self._condition = threading.Condition()
+        self._stopping = False
+
+    def request(self, text: str, sala: str) -> None:
+        """Pide sugerencias para un texto, sustituyendo la petición pendiente"""
+        with self._condition:
+            self._pending = (text, sala)
+            self._condition.notify()
+
+    def stop(self) -> None:
+        """Detiene el hilo y espera a que termine"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self.wait()
+
+    def run(self):
+        """Bucle de sugerencias"""
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                text, sala = self._pending
+                self._pending = None
+
+            try:
+                suggestions = self.index.suggest(text, sala, self.limit)
+            except Exception as e:
+                log_message(f"Error al buscar sugerencias para '{text}': {e}", level='error')
+                suggestions = []
+            self.suggestionsReady.emit(text, sala, suggestions)
@@ -6,6 +6,7 @@ Utiliza PaddleOCR con fallback a Tesseract
 import os
 import sys
 import time
+import threading
 import numpy as np
 from typing import Optional, Tuple, List, Dict, Any
 from PySide6.QtCore import QObject, Signal, Slot, QDateTime, QThread
@@ -14,7 +15,10 @@ from PIL import Image
 # Añadir directorio raíz al path para importaciones
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from src.utils.logger import log_message
-from src.utils.image_utils import enhance_for_ocr, enhance_for_asian_chars, create_test_image
+from src.utils.image_utils import enhance_for_ocr_array, enhance_for_asian_chars, create_test_image
+from src.utils.frame_pool import FrameBuffer
+from src.utils.nick_normalizer import clean_display_nick
+from src.core.nick_index import resolve_ocr_nick
 
 # Importar OCR (manejo condicional)
 try:
@@ -31,93 +35,146 @@ except ImportError:
     TESSERACT_AVAILABLE = False
     log_message("Tesseract no disponible. Funcionalidad limitada.", level='warning')
 
+# Instancias de PaddleOCR libres por idioma (crear una es muy costoso y una
+# misma instancia no debe usarse desde dos hilos a la vez)
+_paddle_idle: Dict[str, List[Any]] = {}
+_paddle_lock = threading.Lock()
+
+def acquire_paddle_ocr(lang: str):
+    """Toma una instancia libre de PaddleOCR para un idioma, creándola si no hay"""
+    with _paddle_lock:
+        idle = _paddle_idle.get(lang)
+        if idle:
+            return idle.pop()
+    
+    return PaddleOCR(
+        use_angle_cls=True,
+        lang=lang,
+        det_db_thresh=0.3,
+        show_log=False,
+        rec_batch_num=1,
+        use_gpu=False
+    )
+
+def release_paddle_ocr(lang: str, ocr) -> None:
+    """Devuelve una instancia de PaddleOCR para reutilizarla"""
+    with _paddle_lock:
+        _paddle_idle.setdefault(lang, []).append(ocr)
+
+def recognize_frame(frame: np.ndarray, lang: str = 'ch', bgr: bool = True,
+                    save_debug: bool = False) -> Tuple[str, float]:
+    """
+    Reconoce texto en un fotograma de forma síncrona
+    
+    Args:
+        frame: Array alto x ancho x 3/4 canales (o gris alto x ancho)
+        lang: Idioma para OCR (ch, en, etc.)
+        bgr: True si los canales están en orden BGR(A), como en las capturas
+        save_debug: Guardar las imágenes intermedias en capturas/
+        
+    Returns:
+        Tupla (texto, confianza); texto vacío si no se detectó nada
+    """
+    timestamp = QDateTime.currentDateTime().toString("HHmmss")
+    
+    def to_pil(array):
+        # Solo se crea una imagen PIL cuando hace falta (debug o Tesseract)
+        if array.ndim == 3:
+            array = array[..., 2::-1] if bgr else array[..., :3]
+        return Image.fromarray(np.ascontiguousarray(array))
+    
+    # Mejorar imagen para OCR sobre buffers reutilizables
+    enhanced = enhance_for_ocr_array(frame, bgr=bgr)
+    try:
+        if save_debug:
+            to_pil(frame).save(f"capturas/capture_{timestamp}.png")
+            Image.fromarray(enhanced.array).save(f"capturas/enhanced_{timestamp}.png")
+        
+        # Intentar con PaddleOCR primero (recibe la vista NumPy directamente)
+        if PADDLE_AVAILABLE:
+            ocr = acquire_paddle_ocr(lang)
+            try:
+                results = ocr.ocr(enhanced.array, cls=True)
+            finally:
+                release_paddle_ocr(lang, ocr)
+            
+            if results and results[0]:
+                best_text = ""
+                best_confidence = 0.0
+                
+                for result in results:
+                    for line in result:
+                        text = line[1][0].strip()
+                        confidence = line[1][1]
+                        
+                        if text and confidence > best_confidence:
+                            best_text = text
+                            best_confidence = confidence
+                
+                if best_text:
+                    log_message(f"PaddleOCR detectó: '{best_text}' (confianza: {best_confidence:.2f})")
+                    return best_text, best_confidence
+        
+        # Si PaddleOCR falló o no está disponible, intentar con Tesseract
+        if TESSERACT_AVAILABLE:
+            # Mejorar específicamente para caracteres asiáticos
+            asian_enhanced = enhance_for_asian_chars(to_pil(frame))
+            if save_debug:
+                asian_enhanced.save(f"capturas/asian_enhanced_{timestamp}.png")
+            
+            # Configuración para Tesseract
+            custom_config = r'--oem 3 --psm 7 -l chi_sim+jpn+kor+eng'
+            
+            # Intentar primero con la mejora asiática
+            text = pytesseract.image_to_string(asian_enhanced, config=custom_config).strip()
+            
+            if not text:
+                # Si falla, intentar con la mejora normal
+                text = pytesseract.image_to_string(Image.fromarray(enhanced.array), config=custom_config).strip()
+            
+            if text:
+                log_message(f"Tesseract detectó: '{text}'")
+                return text, 0.7  # Confianza arbitraria
+        
+        return "", 0.0
+    
+    finally:
+        enhanced.release()
+
 class OCRWorker(QThread):
     """Thread worker para procesamiento OCR en segundo plano"""
     resultReady = Signal(str, float)  # texto, confianza
     failed = Signal(str)  # mensaje de error
     
-    def __init__(self, image_data, lang='ch', parent=None):
+    def __init__(self, image_data, lang='ch', save_debug=False, parent=None):
         super().__init__(parent)
         self.image_data = image_data
         self.lang = lang
+        self.save_debug = save_debug
+    
+    def release_buffers(self):
+        """Devuelve al pool el fotograma de la petición, si procede"""
+        if isinstance(self.image_data, FrameBuffer):
+            self.image_data.release()
     
     def run(self):
         """Ejecuta el procesamiento OCR en segundo plano"""
         try:
-            # Convertir a imagen PIL si es necesario
-            if isinstance(self.image_data, np.ndarray):
-                image = Image.fromarray(self.image_data)
+            # Obtener una vista NumPy sin copiar cuando es posible
+            if isinstance(self.image_data, FrameBuffer):
+                frame, bgr = self.image_data.array, True
+            elif isinstance(self.image_data, np.ndarray):
+                frame, bgr = self.image_data, False
             elif isinstance(self.image_data, Image.Image):
-                image = self.image_data
+                frame, bgr = np.asarray(self.image_data.convert('RGB')), False
             else:
                 self.failed.emit("Formato de imagen no soportado")
                 return
             
-            # Guardar para debug
-            timestamp = QDateTime.currentDateTime().toString("HHmmss")
-            debug_path = f"capturas/capture_{timestamp}.png"
-            image.save(debug_path)
-            
-            # Mejorar imagen para OCR
-            enhanced = enhance_for_ocr(image)
-            enhanced.save(f"capturas/enhanced_{timestamp}.png")
-            
-            # Intentar con PaddleOCR primero
-            if PADDLE_AVAILABLE:
-                # Convertir a numpy array para Paddle
-                img_array = np.array(enhanced)
-                
-                # Instanciar OCR con el idioma correcto
-                ocr = PaddleOCR(
-                    use_angle_cls=True,
-                    lang=self.lang,
-                    det_db_thresh=0.3,
-                    show_log=False,
-                    rec_batch_num=1,
-                    use_gpu=False
-                )
-                
-                # Ejecutar OCR
-                results = ocr.ocr(img_array, cls=True)
-                
-                if results and results[0]:
-                    best_text = ""
-                    best_confidence = 0.0
-                    
-                    for result in results:
-                        for line in result:
-                            text = line[1][0].strip()
-                            confidence = line[1][1]
-                            
-                            if text and confidence > best_confidence:
-                                best_text = text
-                                best_confidence = confidence
-                    
-                    if best_text:
-                        log_message(f"PaddleOCR detectó: '{best_text}' (confianza: {best_confidence:.2f})")
-                        self.resultReady.emit(best_text, best_confidence)
-                        return
-            
-            # Si PaddleOCR falló o no está disponible, intentar con Tesseract
-            if TESSERACT_AVAILABLE:
-                # Mejorar específicamente para caracteres asiáticos
-                asian_enhanced = enhance_for_asian_chars(image)
-                asian_enhanced.save(f"capturas/asian_enhanced_{timestamp}.png")
-                
-                # Configuración para Tesseract
-                custom_config = r'--oem 3 --psm 7 -l chi_sim+jpn+kor+eng'
-                
-                # Intentar primero con la mejora asiática
-                text = pytesseract.image_to_string(asian_enhanced, config=custom_config).strip()
-                
-                if not text:
-                    # Si falla, intentar con la mejora normal
-                    text = pytesseract.image_to_string(enhanced, config=custom_config).strip()
-                
-                if text:
-                    log_message(f"Tesseract detectó: '{text}'")
-                    self.resultReady.emit(text, 0.7)  # Confianza arbitraria
-                    return
+            text, confidence = recognize_frame(frame, self.lang, bgr, self.save_debug)
+            if text:
+                self.resultReady.emit(text, confidence)
+                return
             
             # Si llegamos aquí, no se pudo detectar texto
             self.failed.emit("No se pudo detectar texto en la imagen")
@@ -125,6 +182,9 @@ class OCRWorker(QThread):
         except Exception as e:
             log_message(f"Error en procesamiento OCR: {e}", level='error')
             self.failed.emit(f"Error en OCR: {str(e)}")
+        
+        finally:
+            self.release_buffers()
 
 class OCREngine(QObject):
     """Motor OCR con soporte asíncrono y múltiples motores de reconocimiento"""
@@ -168,10 +228,13 @@ class OCREngine(QObject):
         Procesa una imagen para reconocer texto de forma asíncrona
         
         Args:
-            image_data: Imagen a procesar (PIL.Image, numpy.ndarray, o ruta)
+            image_data: Imagen a procesar (PIL.Image, numpy.ndarray RGB o FrameBuffer
+                del pool, que se libera al terminar la petición)
             lang: Idioma para OCR (ch, en, etc.)
         """
         if not self.ocr_initialized:
+            if isinstance(image_data, FrameBuffer):
+                image_data.release()
             self.ocrFailed.emit("OCR no inicializado")
             return
         
@@ -182,9 +245,10 @@ class OCREngine(QObject):
         if self.worker and self.worker.isRunning():
             self.worker.terminate()
             self.worker.wait()
+            self.worker.release_buffers()
         
         # Crear nuevo worker
-        self.worker = OCRWorker(image_data, ocr_lang)
+        self.worker = OCRWorker(image_data, ocr_lang, self.config.get("guardar_capturas_debug", False))
         
         # Conectar señales
         self.worker.resultReady.connect(self.handle_ocr_result)
@@ -198,9 +262,12 @@ class OCREngine(QObject):
     @Slot(str, float)
     def handle_ocr_result(self, text, confidence):
         """Maneja el resultado del OCR asíncrono"""
-        # Truncar texto si es muy largo
-        if len(text) > 30:
-            text = text[:30]
+        # Quitar invisibles y espacios sobrantes y truncar si es muy largo;
+        # la clave canónica para cachés se calcula al buscar el nick
+        text = clean_display_nick(text)
+        
+        # Con baja confianza, ajustar al nick conocido más cercano si es inequívoco
+        text = resolve_ocr_nick(text, confidence, self.config.get("sala_default", "XPK"))
         
         # Emitir señal de resultado
         self.ocrCompleted.emit(text, confidence)
@@ -0,0 +1,405 @@
+"""
+Pipeline por etapas para el análisis de mesas
+Conecta captura, OCR, búsqueda de estadísticas y actualización de la interfaz
+mediante colas acotadas, con concurrencia propia por etapa, contrapresión que
+descarta o fusiona el trabajo obsoleto y métricas de cada etapa
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+
+# Políticas de la cola de entrada de una etapa cuando está llena
+POLICY_BLOCK = "block"              # el productor espera (contrapresión pura)
+POLICY_DROP_OLDEST = "drop_oldest"  # se descarta el elemento más antiguo
+POLICY_DROP_NEWEST = "drop_newest"  # se rechaza el elemento nuevo
+POLICY_MERGE = "merge"              # se fusiona con el pendiente de la misma clave
+
+POLICIES = (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_MERGE)
+
+# Ventana para el cálculo del rendimiento (segundos)
+THROUGHPUT_WINDOW = 10.0
+
+_CLOSED = object()
+
+class StageQueue:
+    """
+    Cola acotada con política de desbordamiento
+
+    Con la política merge, los elementos con la misma clave no se acumulan:
+    el nuevo sustituye (o se fusiona con) el pendiente y conserva su turno.
+    """
+
+    def __init__(self, maxsize: int = 8, policy: str = POLICY_BLOCK,
+                 key: Optional[Callable[[Any], Hashable]] = None,
+                 merge: Optional[Callable[[Any, Any], Any]] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Política de cola desconocida: {policy}")
+        if policy == POLICY_MERGE and key is None:
+            raise ValueError("La política merge necesita una función key")
+
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.key = key
+        self.merge = merge
+        # Recibe cada elemento que la cola descarta (no los fusionados)
+        self.on_drop: Optional[Callable[[Any], None]] = None
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self.dropped = 0
+        self.merged = 0
+        self.max_depth = 0
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._items)
+
+    def _next_key(self) -> int:
+        self._sequence += 1
+        return self._sequence
+
+    def put(self, item: Any, timeout: Optional[float] = None) -> bool:
+        """
+        Añade un elemento aplicando la política de la cola
+
+        Returns:
+            True si el elemento quedó en la cola (o fusionado), False si se descartó
+        """
+        with self._condition:
+            accepted, dropped = self._put(item, timeout)
+        # Fuera del bloqueo: on_drop puede tomar otros bloqueos
+        if dropped is not None and self.on_drop:
+            self.on_drop(dropped)
+        return accepted
+
+    def _put(self, item: Any, timeout: Optional[float]) -> Tuple[bool, Any]:
+        """put con el bloqueo tomado; devuelve (aceptado, elemento descartado o None)"""
+        if self._closed:
+            return False, item
+
+        if self.policy == POLICY_MERGE:
+            item_key = ("k", self.key(item))
+            if item_key in self._items:
+                old = self._items[item_key]
+                self._items[item_key] = self.merge(old, item) if self.merge else item
+                self.merged += 1
+                return True, None
+        else:
+            item_key = ("s", self._next_key())
+
+        dropped = None
+        if len(self._items) >= self.maxsize:
+            if self.policy == POLICY_BLOCK:
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while len(self._items) >= self.maxsize and not self._closed:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self.dropped += 1
+                        return False, item
+                    self._condition.wait(remaining)
+                if self._closed:
+                    return False, item
+            elif self.policy == POLICY_DROP_NEWEST:
+                self.dropped += 1
+                return False, item
+            else:
+                # drop_oldest y merge sin pendiente de la misma clave
+                _, dropped = self._items.popitem(last=False)
+                self.dropped += 1
+
+        self._items[item_key] = item
+        self.max_depth = max(self.max_depth, len(self._items))
+        self._condition.notify_all()
+        return True, dropped
+
+    def get(self) -> Any:
+        """Extrae el siguiente elemento; devuelve _CLOSED al cerrar la cola vacía"""
+        with self._condition:
+            while not self._items and not self._closed:
+                self._condition.wait()
+            if not self._items:
+                return _CLOSED
+            _, item = self._items.popitem(last=False)
+            self._condition.notify_all()
+            return item
+
+    def close(self, discard: bool = False) -> None:
+        """Cierra la cola; los consumidores terminan al vaciarla"""
+        discarded = []
+        with self._condition:
+            self._closed = True
+            if discard:
+                self.dropped += len(self._items)
+                discarded = list(self._items.values())
+                self._items.clear()
+            self._condition.notify_all()
+        if self.on_drop:
+            for item in discarded:
+                self.on_drop(item)
+
+class Stage:
+    """
+    Etapa del pipeline
+
+    Args:
+        name: Nombre de la etapa (para logs y métricas)
+        func: Función elemento -> resultado; devolver None descarta el elemento
+        workers: Número de hilos (o procesos) de la etapa
+        mode: "thread" para E/S o "process" para trabajo de CPU como el OCR.
+            En modo proceso func debe ser una función de módulo y los
+            elementos deben poder serializarse con pickle
+        queue_size: Capacidad de la cola de entrada
+        policy: Política de la cola de entrada cuando está llena
+        key: Clave de fusión (obligatoria con la política merge)
+        merge: Función (pendiente, nuevo) -> fusionado; por defecto gana el nuevo
+        max_age: Segundos tras los que un elemento se considera obsoleto y se
+            descarta sin procesar (requiere que tenga el atributo created)
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1,
+                 mode: str = "thread", queue_size: int = 8, policy: str = POLICY_BLOCK,
+                 key: Optional[Callable[[Any], Hashable]] = None,
+                 merge: Optional[Callable[[Any, Any], Any]] = None,
+                 max_age: Optional[float] = None):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Modo de etapa desconocido: {mode}")
+
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.mode = mode
+        self.max_age = max_age
+        self.queue = StageQueue(queue_size, policy, key, merge)
+        self.output: Optional[Callable[[Any], bool]] = None
+        self.discard: Optional[Callable[[Any], None]] = None
+
+        self._threads: List[threading.Thread] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._completions: deque = deque(maxlen=1024)
+
+        self.processed = 0
+        self.filtered = 0
+        self.expired = 0
+        self.errors = 0
+        self.busy_time = 0.0
+
+    def start(self) -> None:
+        """Arranca los hilos (y el pool de procesos) de la etapa"""
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        # En modo proceso cada hilo espera el resultado de un proceso
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._work_loop, name=f"Pipeline-{self.name}-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Espera a que terminen los hilos y libera el pool de procesos"""
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self._executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _work_loop(self) -> None:
+        """Bucle de un hilo de la etapa"""
+        while True:
+            item = self.queue.get()
+            if item is _CLOSED:
+                break
+
+            created = getattr(item, "created", None)
+            if self.max_age is not None and created is not None and time.monotonic() - created > self.max_age:
+                with self._lock:
+                    self.expired += 1
+                if self.discard:
+                    self.discard(item)
+                continue
+
+            started = time.monotonic()
+            try:
+                if self._executor:
+                    result = self._executor.submit(self.func, item).result()
+                else:
+                    result = self.func(item)
+            except Exception as e:
+                result = None
+                with self._lock:
+                    self.errors += 1
+                log_message(f"Error en la etapa {self.name}: {e}", level='error')
+
+            finished = time.monotonic()
+            with self._lock:
+                self.busy_time += finished - started
+                if result is None:
+                    self.filtered += 1
+                else:
+                    self.processed += 1
+                    self._completions.append(finished)
+
+            if result is None:
+                if self.discard:
+                    self.discard(item)
+            elif self.output:
+                self.output(result)
+
+    def throughput(self) -> float:
+        """Elementos por segundo completados en la ventana reciente"""
+        now = time.monotonic()
+        with self._lock:
+            recent = [t for t in self._completions if now - t <= THROUGHPUT_WINDOW]
+        if not recent:
+            return 0.0
+        span = max(now - recent[0], 1.0)
+        return len(recent) / span
+
+    def metrics(self) -> Dict[str, Any]:
+        """Métricas de la etapa"""
+        throughput = self.throughput()
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "mode": self.mode,
+                "queue_depth": len(self.queue),
+                "queue_max_depth": self.queue.max_depth,
+                "queue_size": self.queue.maxsize,
+                "processed": self.processed,
+                "filtered": self.filtered,
+                "dropped": self.queue.dropped,
+                "merged": self.queue.merged,
+                "expired": self.expired,
+                "errors": self.errors,
+                "busy_ms": round(self.busy_time * 1000, 1),
+                "throughput": round(throughput, 2),
+            }
+
+class Pipeline:
+    """
+    Cadena de etapas conectadas por colas acotadas
+
+    El resultado de cada etapa se encola en la siguiente con la política de
+    esta; el de la última se entrega a sink. Una etapa lenta solo llena su
+    propia cola: según su política, las anteriores esperan (block) o el
+    trabajo sobrante se descarta o se fusiona, así que la memoria en vuelo
+    está acotada por la suma de las capacidades de las colas. on_discard
+    recibe cada elemento que no llega al final (descartado por una cola,
+    caducado, filtrado o con error), para que quien lo envió no lo espere.
+    """
+
+    def __init__(self, stages: List[Stage], sink: Optional[Callable[[Any], None]] = None,
+                 on_discard: Optional[Callable[[Any], None]] = None):
+        if not stages:
+            raise ValueError("El pipeline necesita al menos una etapa")
+
+        self.stages = list(stages)
+        self.sink = sink
+        self.on_discard = on_discard
+        self._running = False
+
+        for current, following in zip(self.stages, self.stages[1:]):
+            current.output = following.queue.put
+        self.stages[-1].output = self._deliver
+        for stage in self.stages:
+            stage.queue.on_drop = self._discard
+            stage.discard = self._discard
+
+    def _deliver(self, result: Any) -> bool:
+        """Entrega el resultado final al sink"""
+        if self.sink:
+            try:
+                self.sink(result)
+            except Exception as e:
+                log_message(f"Error al entregar resultado del pipeline: {e}", level='error')
+        return True
+
+    def _discard(self, item: Any) -> None:
+        """Avisa de un elemento que no llegará al sink"""
+        if self.on_discard:
+            try:
+                self.on_discard(item)
+            except Exception as e:
+                log_message(f"Error al notificar un descarte del pipeline: {e}", level='error')
+
+    def start(self) -> None:
+        """Arranca todas las etapas"""
+        if self._running:
+            return
+        for stage in self.stages:
+            stage.start()
+        self._running = True
+        log_message("Pipeline iniciado: " + " -> ".join(
+            f"{s.name}({s.workers} {s.mode})" for s in self.stages
+        ))
+
+    def submit(self, item: Any, timeout: Optional[float] = None) -> bool:
+        """Introduce un elemento en la primera etapa"""
+        return self.stages[0].queue.put(item, timeout)
+
+    def stop(self, drain: bool = False, timeout: Optional[float] = None) -> None:
+        """
+        Detiene el pipeline etapa a etapa
+
+        Args:
+            drain: Procesar lo que queda en las colas antes de terminar
+            timeout: Espera máxima por etapa
+        """
+        if not self._running:
+            return
+        # Cerrar en orden: cuando una etapa termina, ya no alimenta a la siguiente
+        for stage in self.stages:
+            stage.queue.close(discard=not drain)
+            stage.join(timeout)
+        self._running = False
+        log_message("Pipeline detenido")
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Métricas de todas las etapas por nombre"""
+        return {stage.name: stage.metrics() for stage in self.stages}
+
+def test_pipeline():
+    """Función de prueba para el pipeline"""
+    class Work:
+        def __init__(self, key, value):
+            self.key = key
+            self.value = value
+            self.created = time.monotonic()
+
+    def slow_lookup(work):
+        time.sleep(0.02)
+        return work
+
+    results = []
+    pipeline = Pipeline([
+        Stage("captura", lambda w: w, workers=1, queue_size=4,
+              policy=POLICY_MERGE, key=lambda w: w.key),
+        Stage("consulta", slow_lookup, workers=2, queue_size=4, policy=POLICY_DROP_OLDEST),
+    ], sink=results.append)
+    pipeline.start()
+
+    for index in range(200):
+        pipeline.submit(Work(index % 5, index))
+        time.sleep(0.001)
+
+    pipeline.stop(drain=True)
+    log_message(f"Resultados: {len(results)}")
+    for name, metrics in pipeline.metrics().items():
+        log_message(f"{name}: {metrics}")
+
+if __name__ == "__main__":
+    test_pipeline()
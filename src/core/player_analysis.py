@@ -0,0 +1,599 @@
+"""
+Análisis de jugadores con un modelo de lenguaje
+Pide a la API de chat de OpenAI (o a un servidor compatible) una lectura del
+estilo de juego de un jugador a partir de sus estadísticas y guarda cada
+análisis en una caché persistente por (sala, nick, huella de las
+estadísticas, versión del prompt), de modo que un habitual cuyas
+estadísticas apenas se han movido no vuelve a costar una llamada. Las
+respuestas se pueden recibir en streaming y cancelar a medias
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import socket
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Mapping, NamedTuple, Optional, Sequence
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.utils.nick_normalizer import lookup_key
+from src.config.settings import ANALYSIS_CACHE_PATH
+from src.core.stats_cache import FRESHNESS_FIELDS
+from src.core.player_classifier import classify
+
+try:
+    import requests
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    REQUESTS_AVAILABLE = False
+    log_message("requests no disponible. No se podrá analizar jugadores.", level='warning')
+
+# Versión del prompt: cambiarla invalida los análisis guardados con el anterior
+PROMPT_VERSION = "1"
+
+SYSTEM_PROMPT = (
+    "Eres un entrenador de poker. A partir de las estadísticas de un rival, "
+    "describe en un párrafo breve su estilo de juego y da dos o tres ajustes "
+    "concretos para explotarlo. Responde en español."
+)
+
+class AnalysisError(Exception):
+    """Error al obtener un análisis del modelo"""
+
+class AnalysisCancelled(AnalysisError):
+    """El análisis se canceló antes de terminar"""
+
+def _abort_response(response) -> None:
+    """
+    Corta una respuesta en curso desde otro hilo
+
+    Cerrar la respuesta no despierta a un hilo bloqueado leyendo del socket;
+    shutdown sí, y la lectura termina al instante con error.
+    """
+    try:
+        sock = response.raw._fp.fp.raw._sock
+        sock.shutdown(socket.SHUT_RDWR)
+    except (AttributeError, OSError):
+        pass
+    response.close()
+
+class CancelToken:
+    """
+    Señal de cancelación de un análisis
+
+    cancel() se puede llamar desde cualquier hilo: marca el análisis como
+    cancelado y corta la respuesta en streaming que tenga asociada, de modo
+    que el modelo deja de generar (y de facturar) tokens.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._response = None
+        self.cancelled_at: Optional[float] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.cancelled_at = time.perf_counter()
+            self._event.set()
+            response, self._response = self._response, None
+        if response is not None:
+            _abort_response(response)
+
+    def bind(self, response) -> None:
+        """Asocia la respuesta en curso; si ya estaba cancelado la corta"""
+        with self._lock:
+            if not self._event.is_set():
+                self._response = response
+                return
+        _abort_response(response)
+
+    def unbind(self) -> None:
+        with self._lock:
+            self._response = None
+
+def analysis_fields(config: dict) -> List[str]:
+    """Estadísticas que entran en el prompt: las seleccionadas y el tamaño de la muestra"""
+    selected = config.get("stats_seleccionadas") or {}
+    order = config.get("stats_order") or list(selected)
+    fields = [stat for stat in order if selected.get(stat)]
+    return fields + [field for field in FRESHNESS_FIELDS if field not in fields]
+
+def build_messages(nick: str, sala: str, stats: Mapping, fields: Sequence[str]) -> List[Dict[str, str]]:
+    """Mensajes de chat para analizar un jugador"""
+    lines = [f"{field}: {stats.get(field)}" for field in fields if stats.get(field) is not None]
+    profile = classify(stats)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": (
+            f"Jugador '{nick}' en la sala {sala}.\n"
+            f"Clasificación automática: {profile.etiqueta} ({profile.motivo}).\n"
+            "Estadísticas:\n" + "\n".join(lines)
+        )},
+    ]
+
+class ChatClient:
+    """
+    Cliente mínimo de POST /chat/completions (API de OpenAI o compatible)
+
+    Habla HTTP directamente con requests, con una sesión keep-alive como el
+    cliente de estadísticas, para poder apuntarlo a un servidor local de
+    prueba y no depender del SDK de openai.
+    """
+
+    def __init__(self, base_url: str, api_key: str, model: str = "gpt-3.5-turbo",
+                 connect_timeout: float = 5.0, read_timeout: float = 60.0, temperature: float = 0.4):
+        if not REQUESTS_AVAILABLE:
+            raise RuntimeError("requests no está instalado")
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.temperature = temperature
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "User-Agent": "PokerBotTRACK",
+        })
+
+    @classmethod
+    def from_config(cls, config: dict) -> "ChatClient":
+        return cls(
+            config.get("openai_base_url", "https://api.openai.com/v1"),
+            config.get("openai_api_key", ""),
+            model=config.get("openai_model", "gpt-3.5-turbo"),
+            read_timeout=float(config.get("openai_timeout", 60)),
+        )
+
+    def complete(self, messages: List[Dict[str, str]]) -> str:
+        """
+        Pide una respuesta completa
+
+        Raises:
+            AnalysisError: Si la petición falla o la respuesta no tiene texto
+        """
+        try:
+            response = self.session.post(
+                self.url, json={"model": self.model, "messages": messages, "temperature": self.temperature},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"].strip()
+        except (requests.RequestException, ValueError, KeyError, IndexError, TypeError) as e:
+            raise AnalysisError(f"Error al pedir el análisis: {e}") from e
+
+    def stream(self, messages: List[Dict[str, str]], token: Optional[CancelToken] = None) -> Iterator[str]:
+        """
+        Pide una respuesta en streaming (eventos SSE) y la entrega por fragmentos
+
+        La respuesta termina con data: [DONE] o, en servidores compatibles
+        que no lo envían, con un finish_reason; si la conexión se cierra sin
+        ninguno de los dos el texto está truncado.
+
+        Raises:
+            AnalysisCancelled: Si el token se cancela antes de terminar
+            AnalysisError: Si la petición falla o la respuesta llega truncada
+        """
+        token = token or CancelToken()
+        if token.cancelled:
+            raise AnalysisCancelled("Análisis cancelado")
+        try:
+            response = self.session.post(
+                self.url, json={"model": self.model, "messages": messages,
+                                "temperature": self.temperature, "stream": True},
+                timeout=self.timeout, stream=True
+            )
+        except requests.RequestException as e:
+            raise AnalysisError(f"Error al pedir el análisis: {e}") from e
+
+        token.bind(response)
+        finished = False
+        try:
+            if response.status_code >= 400:
+                # Leer el cuerpo devuelve la conexión al pool
+                response.content
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if token.cancelled:
+                    break
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    return
+                choice = json.loads(data)["choices"][0]
+                content = (choice.get("delta") or {}).get("content")
+                if content:
+                    yield content
+                if choice.get("finish_reason"):
+                    finished = True
+        except (requests.RequestException, ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+            if not token.cancelled:
+                raise AnalysisError(f"Error al recibir el análisis: {e}") from e
+        finally:
+            token.unbind()
+            response.close()
+        if token.cancelled:
+            raise AnalysisCancelled("Análisis cancelado")
+        if not finished:
+            raise AnalysisError("La respuesta del análisis terminó sin completarse")
+
+    def close(self) -> None:
+        self.session.close()
+
+class AnalysisCache:
+    """
+    Caché persistente de análisis en SQLite
+
+    La clave es (sala, nick canónico, versión del prompt, huella). La huella
+    cuantiza las estadísticas: los porcentajes en pasos de tolerance puntos
+    y el tamaño de la muestra en pasos logarítmicos de sample_tolerance,
+    así que unas estadísticas iguales se encuentran con una sola búsqueda.
+    Si la huella no coincide se comparan las estadísticas guardadas del
+    mismo jugador y se reutiliza el análisis más cercano que esté dentro de
+    la tolerancia en todos los campos (cerca de un borde de cuantización la
+    huella cambia aunque el jugador no). Al superar max_entries se borran
+    los análisis usados hace más tiempo.
+    """
+
+    def __init__(self, path: Optional[Path], fields: Sequence[str], max_entries: int = 2000,
+                 tolerance: float = 2.0, sample_tolerance: float = 0.25,
+                 prompt_version: str = PROMPT_VERSION):
+        self.fields = list(fields)
+        self.max_entries = max(1, max_entries)
+        self.tolerance = max(1e-9, tolerance)
+        self.sample_tolerance = max(1e-9, sample_tolerance)
+        self.prompt_version = prompt_version
+        self._lock = threading.Lock()
+
+        database = ":memory:"
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            database = str(path)
+        self._conn = sqlite3.connect(database, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_cache ("
+            " sala TEXT NOT NULL, nick TEXT NOT NULL, version TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+            " stats TEXT NOT NULL, analysis TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (sala, nick, version, fingerprint)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analysis_cache_last_used ON analysis_cache (last_used)")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _vector(self, stats: Mapping) -> List[Optional[float]]:
+        vector = []
+        for field in self.fields:
+            value = stats.get(field)
+            vector.append(float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None)
+        return vector
+
+    def fingerprint(self, stats: Mapping) -> str:
+        """Huella cuantizada de las estadísticas"""
+        steps = []
+        for field, value in zip(self.fields, self._vector(stats)):
+            if value is None:
+                steps.append(None)
+            elif field in FRESHNESS_FIELDS:
+                steps.append(round(math.log1p(max(0.0, value)) / math.log1p(self.sample_tolerance)))
+            else:
+                steps.append(round(value / self.tolerance))
+        return hashlib.sha1(json.dumps(steps).encode("utf-8")).hexdigest()[:16]
+
+    def _distance(self, a: List[Optional[float]], b: List[Optional[float]]) -> Optional[float]:
+        """Mayor desviación relativa a la tolerancia (<= 1 = dentro), o None si falta un campo"""
+        worst = 0.0
+        for field, x, y in zip(self.fields, a, b):
+            if x is None or y is None:
+                if x is not y:
+                    return None
+                continue
+            if field in FRESHNESS_FIELDS:
+                worst = max(worst, abs(x - y) / max(1.0, x, y) / self.sample_tolerance)
+            else:
+                worst = max(worst, abs(x - y) / self.tolerance)
+        return worst
+
+    def get(self, nick: str, sala: str, stats: Mapping) -> Optional[str]:
+        """Análisis guardado aplicable a estas estadísticas, o None"""
+        nick_key, sala_key = lookup_key(nick, sala)
+        fingerprint = self.fingerprint(stats)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT analysis FROM analysis_cache WHERE sala = ? AND nick = ? AND version = ? AND fingerprint = ?",
+                (sala_key, nick_key, self.prompt_version, fingerprint)
+            ).fetchone()
+            if row is not None:
+                self.hits += 1
+                self._touch(sala_key, nick_key, fingerprint, now)
+                return row[0]
+
+            vector = self._vector(stats)
+            best = None
+            for candidate, saved, analysis in self._conn.execute(
+                "SELECT fingerprint, stats, analysis FROM analysis_cache WHERE sala = ? AND nick = ? AND version = ?",
+                (sala_key, nick_key, self.prompt_version)
+            ).fetchall():
+                distance = self._distance(vector, json.loads(saved))
+                if distance is not None and distance <= 1.0 and (best is None or distance < best[0]):
+                    best = (distance, candidate, analysis)
+            if best is not None:
+                self.near_hits += 1
+                self._touch(sala_key, nick_key, best[1], now)
+                return best[2]
+
+            self.misses += 1
+            return None
+
+    def _touch(self, sala: str, nick: str, fingerprint: str, now: float) -> None:
+        self._conn.execute(
+            "UPDATE analysis_cache SET last_used = ? WHERE sala = ? AND nick = ? AND version = ? AND fingerprint = ?",
+            (now, sala, nick, self.prompt_version, fingerprint)
+        )
+
+    def put(self, nick: str, sala: str, stats: Mapping, analysis: str) -> None:
+        """Guarda un análisis y descarta los menos usados si se supera el límite"""
+        nick_key, sala_key = lookup_key(nick, sala)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache"
+                " (sala, nick, version, fingerprint, stats, analysis, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (sala_key, nick_key, self.prompt_version, self.fingerprint(stats),
+                 json.dumps(self._vector(stats)), analysis, now, now)
+            )
+            self._count = self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+            if self._count > self.max_entries:
+                # Se libera un 10% de golpe para no borrar en cada alta
+                excess = self._count - int(self.max_entries * 0.9)
+                deleted = self._conn.execute(
+                    "DELETE FROM analysis_cache WHERE (sala, nick, version, fingerprint) IN ("
+                    " SELECT sala, nick, version, fingerprint FROM analysis_cache ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                ).rowcount
+                self._count -= deleted
+                self.evicted += deleted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM analysis_cache")
+            self._count = 0
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "evicted": self.evicted,
+                "entries": self._count,
+                "hit_rate": round((self.hits + self.near_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class AnalysisResult(NamedTuple):
+    """Resultado de un análisis"""
+    text: str
+    cached: bool
+    elapsed: float      # segundos hasta tener el texto
+    first_chunk: float  # segundos hasta el primer fragmento (= elapsed sin streaming)
+
+class PlayerAnalyzer:
+    """
+    Análisis de jugadores con caché
+
+    Consulta la caché y, si no hay un análisis aplicable, llama al modelo y
+    guarda la respuesta. Con on_chunk la respuesta llega en streaming y cada
+    fragmento se entrega según llega; un análisis cancelado con su
+    CancelToken no se guarda. submit lo hace en un hilo aparte y devuelve
+    un Future, como el servicio de estadísticas.
+    """
+
+    def __init__(self, client: ChatClient, cache: Optional[AnalysisCache], fields: Sequence[str],
+                 max_workers: int = 2):
+        self.client = client
+        self.cache = cache
+        self.fields = list(fields)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="PlayerAnalyzer")
+
+    @classmethod
+    def from_config(cls, config: dict, cache_path: Optional[Path] = ANALYSIS_CACHE_PATH) -> "PlayerAnalyzer":
+        fields = analysis_fields(config)
+        cache = None
+        try:
+            cache = AnalysisCache(
+                cache_path, fields,
+                max_entries=int(config.get("analysis_cache_max_entries", 2000)),
+                tolerance=float(config.get("analysis_cache_tolerance", 2.0)),
+                sample_tolerance=float(config.get("analysis_cache_sample_tolerance", 0.25)),
+            )
+        except Exception as e:
+            log_message(f"Caché de análisis no disponible ({cache_path}): {e}", level='warning')
+        return cls(ChatClient.from_config(config), cache, fields)
+
+    def analyze(self, nick: str, sala: str, stats: Mapping,
+                on_chunk: Optional[Callable[[str], None]] = None,
+                token: Optional[CancelToken] = None) -> AnalysisResult:
+        """
+        Análisis de un jugador, de la caché si hay uno aplicable
+
+        Args:
+            on_chunk: Recibe cada fragmento de texto (un único fragmento si
+                viene de la caché); None = sin streaming
+            token: Permite cancelar el análisis desde otro hilo
+
+        Raises:
+            AnalysisCancelled: Si se cancela antes de terminar
+            AnalysisError: Si hay que llamar al modelo y falla
+        """
+        started = time.perf_counter()
+        if token is not None and token.cancelled:
+            raise AnalysisCancelled("Análisis cancelado")
+        if self.cache is not None:
+            text = self.cache.get(nick, sala, stats)
+            if text is not None:
+                if on_chunk is not None:
+                    on_chunk(text)
+                elapsed = time.perf_counter() - started
+                return AnalysisResult(text, True, elapsed, elapsed)
+
+        messages = build_messages(nick, sala, stats, self.fields)
+        if on_chunk is None:
+            text = self.client.complete(messages)
+            first_chunk = time.perf_counter() - started
+        else:
+            chunks = []
+            first_chunk = 0.0
+            for chunk in self.client.stream(messages, token):
+                if not chunks:
+                    first_chunk = time.perf_counter() - started
+                chunks.append(chunk)
+                on_chunk(chunk)
+            text = "".join(chunks).strip()
+
+        if self.cache is not None and text:
+            self.cache.put(nick, sala, stats, text)
+        return AnalysisResult(text, False, time.perf_counter() - started, first_chunk)
+
+    def submit(self, nick: str, sala: str, stats: Mapping,
+               on_chunk: Optional[Callable[[str], None]] = None,
+               token: Optional[CancelToken] = None) -> Future:
+        """analyze en segundo plano"""
+        return self._executor.submit(self.analyze, nick, sala, stats, on_chunk, token)
+
+    def metrics(self) -> Dict[str, float]:
+        return self.cache.metrics() if self.cache is not None else {}
+
+    def close(self) -> None:
+        """Descarta los análisis en cola y espera a los que están en curso antes de cerrar la caché"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self.client.close()
+        if self.cache is not None:
+            self.cache.close()
+
+# Analizador compartido por toda la aplicación
+_analyzer: Optional[PlayerAnalyzer] = None
+_analyzer_lock = threading.Lock()
+
+def get_player_analyzer(config: dict) -> Optional[PlayerAnalyzer]:
+    """Devuelve el analizador compartido, o None si no hay clave de API"""
+    global _analyzer
+    with _analyzer_lock:
+        if _analyzer is None and REQUESTS_AVAILABLE and config.get("openai_api_key"):
+            try:
+                _analyzer = PlayerAnalyzer.from_config(config)
+            except Exception as e:
+                log_message(f"Error al crear el analizador de jugadores: {e}", level='error')
+        return _analyzer
+
+def close_player_analyzer() -> None:
+    """Cierra el analizador compartido (al salir de la aplicación)"""
+    global _analyzer
+    with _analyzer_lock:
+        if _analyzer is not None:
+            _analyzer.close()
+            _analyzer = None
+
+def test_player_analysis():
+    """Prueba la caché de análisis contra el servidor local que imita OpenAI"""
+    import tempfile
+    from src.config.settings import DEFAULT_CONFIG
+    from src.utils.stub_servers import OpenAIStubServer, fake_player_stats
+
+    cache_path = Path(tempfile.mkdtemp()) / "analysis_cache.db"
+    with OpenAIStubServer(api_key="clave", latency=0.3) as stub:
+        config = dict(DEFAULT_CONFIG, openai_api_key="clave", openai_base_url=stub.url + "/v1",
+                      analysis_cache_max_entries=20)
+        analyzer = PlayerAnalyzer.from_config(config, cache_path)
+        stats = fake_player_stats("Regular1", "XPK")
+
+        for label, nick, changed in [
+            ("Primera vez", "Regular1", {}),
+            ("Mismas estadísticas", "regular1", {}),
+            ("VPIP +1.2 y 200 manos más", "Regular1", {"vpip": stats["vpip"] + 1.2,
+                                                       "total_manos": stats["total_manos"] + 200}),
+            ("VPIP +6", "Regular1", {"vpip": stats["vpip"] + 6}),
+        ]:
+            result = analyzer.analyze(nick, "XPK", dict(stats, **changed))
+            source = 'caché' if result.cached else 'modelo'
+            log_message(f"{label:<28} {source:<7} {result.elapsed * 1000:6.1f} ms  {result.text[:40]}...")
+
+        # Límite de tamaño: 30 jugadores en una caché de 20
+        for i in range(30):
+            analyzer.analyze(f"jugador{i}", "XPK", fake_player_stats(f"jugador{i}", "XPK"))
+        log_message(f"Métricas: {analyzer.metrics()}, peticiones al modelo: {stub.requests}")
+        analyzer.close()
+
+        # Tras reiniciar, la caché en disco sigue sirviendo
+        analyzer = PlayerAnalyzer.from_config(config, cache_path)
+        result = analyzer.analyze("jugador29", "XPK", fake_player_stats("jugador29", "XPK"))
+        log_message(f"Tras reiniciar: {'caché' if result.cached else 'modelo'} "
+                    f"en {result.elapsed * 1000:.1f} ms")
+
+        # Cambio de prompt: los análisis anteriores no valen
+        analyzer.cache.prompt_version = "2"
+        result = analyzer.analyze("jugador29", "XPK", fake_player_stats("jugador29", "XPK"))
+        log_message(f"Con otra versión del prompt: {'caché' if result.cached else 'modelo'}")
+        analyzer.close()
+
+    # Streaming: el texto llega palabra a palabra y se puede cancelar a medias
+    with OpenAIStubServer(api_key="clave", latency=0.3, words=60, token_delay=0.02) as stub:
+        config = dict(DEFAULT_CONFIG, openai_api_key="clave", openai_base_url=stub.url + "/v1")
+        analyzer = PlayerAnalyzer.from_config(config, None)
+        chunks = []
+        result = analyzer.analyze("Streamer", "XPK", fake_player_stats("Streamer", "XPK"), chunks.append)
+        log_message(f"Streaming: primer fragmento en {result.first_chunk * 1000:.0f} ms, completo en "
+                    f"{result.elapsed * 1000:.0f} ms, {len(chunks)} fragmentos")
+
+        token = CancelToken()
+        future = analyzer.submit("Cancelado", "XPK", fake_player_stats("Cancelado", "XPK"),
+                                 chunks.append, token)
+        time.sleep(0.5)
+        token.cancel()
+        try:
+            future.result()
+        except AnalysisCancelled:
+            stopped = (time.perf_counter() - token.cancelled_at) * 1000
+            log_message(f"Cancelado: el hilo termina {stopped:.1f} ms después de cancel()")
+        time.sleep(0.1)
+        log_message(f"Palabras generadas {stub.completion_words} de {2 * stub.words}, "
+                    f"cancelaciones vistas por el servidor {stub.cancelled}")
+
+        # Respuesta cortada sin [DONE]: es un error, no una cancelación
+        stub.truncate_after = 5
+        try:
+            analyzer.analyze("Truncado", "XPK", fake_player_stats("Truncado", "XPK"), chunks.append)
+        except AnalysisCancelled:
+            log_message("Truncada: tratada como cancelada (incorrecto)")
+        except AnalysisError as e:
+            log_message(f"Truncada: {e}")
+        analyzer.close()
+
+if __name__ == "__main__":
+    test_player_analysis()
@@ -0,0 +1,187 @@
+"""
+Clasificador local del tipo de jugador
+Etiqueta a cada jugador (nit, TAG, LAG, calling station, maniaco...) a partir
+de sus estadísticas con una tabla de decisión evaluada con NumPy sobre todos
+los jugadores a la vez. Responde en microsegundos, así que se muestra en
+cuanto llegan las estadísticas y mientras el análisis completo, más lento,
+está pendiente
+"""
+
+import os
+import sys
+import math
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.core.player_stats import StatsTable
+
+# Estadísticas que usa la tabla de decisión
+FEATURE_STATS = ("vpip", "pfr", "three_bet", "total_manos")
+
+# Manos por debajo de las cuales no se clasifica
+MIN_HANDS = 20
+
+# Tipos de jugador
+TYPE_UNKNOWN = "desconocido"
+TYPE_MANIAC = "maniaco"
+TYPE_STATION = "calling_station"
+TYPE_NIT = "nit"
+TYPE_TAG = "tag"
+TYPE_LAG = "lag"
+TYPE_PASSIVE = "pasivo"
+TYPE_REGULAR = "regular"
+
+TYPE_LABELS = {
+    TYPE_UNKNOWN: "Sin muestra",
+    TYPE_MANIAC: "Maniaco",
+    TYPE_STATION: "Calling station",
+    TYPE_NIT: "Nit",
+    TYPE_TAG: "TAG",
+    TYPE_LAG: "LAG",
+    TYPE_PASSIVE: "Pasivo",
+    TYPE_REGULAR: "Regular",
+}
+
+# Tabla de decisión: gana la primera fila cuyas condiciones se cumplen todas.
+# Cada condición es característica -> [mínimo, máximo); inf = sin límite.
+# ratio = pfr / vpip (qué parte de lo que juega lo juega subiendo)
+_INF = math.inf
+DECISION_TABLE: Tuple[Tuple[str, Dict[str, Tuple[float, float]], str], ...] = (
+    (TYPE_UNKNOWN, {"total_manos": (-_INF, MIN_HANDS)}, "muestra insuficiente"),
+    (TYPE_MANIAC, {"vpip": (45, _INF), "pfr": (30, _INF)}, "juega casi todo y subiendo"),
+    (TYPE_MANIAC, {"vpip": (35, _INF), "three_bet": (14, _INF)}, "3-bet desmesurado"),
+    (TYPE_STATION, {"vpip": (35, _INF), "ratio": (0, 0.4)}, "entra mucho y casi siempre pagando"),
+    (TYPE_NIT, {"vpip": (0, 15)}, "solo juega manos premium"),
+    (TYPE_PASSIVE, {"vpip": (15, 35), "ratio": (0, 0.5)}, "paga más de lo que sube"),
+    (TYPE_TAG, {"vpip": (15, 26), "ratio": (0.65, _INF)}, "selectivo y agresivo"),
+    (TYPE_LAG, {"vpip": (26, 45), "ratio": (0.6, _INF)}, "amplio y agresivo"),
+)
+
+class PlayerProfile(NamedTuple):
+    """Clasificación de un jugador"""
+    tipo: str
+    etiqueta: str
+    motivo: str
+    confianza: float        # 0-1 según el tamaño de la muestra
+    origen: str = "local"   # "local" hasta que lo sustituya el análisis completo
+
+def _features(columns: Mapping[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Columnas de la tabla de decisión, con las derivadas"""
+    features = {stat: np.asarray(columns[stat], dtype=np.float64) for stat in FEATURE_STATS}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        features["ratio"] = np.where(features["vpip"] > 0, features["pfr"] / features["vpip"], 0.0)
+    return features
+
+def classify_columns(columns: Mapping[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Aplica la tabla de decisión a todos los jugadores a la vez
+
+    Args:
+        columns: Columna de valores (NaN = sin dato) de cada estadística de FEATURE_STATS
+
+    Returns:
+        Tupla (fila de DECISION_TABLE de cada jugador, confianza de cada jugador);
+        -1 es "regular" (no cumple ninguna fila)
+    """
+    features = _features(columns)
+    # Sin VPIP no hay nada que clasificar: cuenta como muestra insuficiente
+    hands = np.where(np.isnan(features["vpip"]), 0.0, np.nan_to_num(features["total_manos"], nan=MIN_HANDS))
+    features["total_manos"] = hands
+
+    conditions = []
+    for _tipo, limits, _motivo in DECISION_TABLE:
+        mask = np.ones(len(hands), dtype=bool)
+        for feature, (low, high) in limits.items():
+            values = features[feature]
+            # Las comparaciones con NaN son falsas: un dato ausente no cumple la fila
+            mask &= (values >= low) & (values < high)
+        conditions.append(mask)
+
+    rows = np.select(conditions, np.arange(len(DECISION_TABLE)), default=-1)
+    confidence = hands / (hands + 100)
+    return rows, confidence
+
+def _profiles(rows: np.ndarray, confidence: np.ndarray) -> List[PlayerProfile]:
+    profiles = []
+    for row, conf in zip(rows.tolist(), confidence.tolist()):
+        if row < 0:
+            tipo, motivo = TYPE_REGULAR, "sin rasgos extremos"
+        else:
+            tipo, _limits, motivo = DECISION_TABLE[row]
+        profiles.append(PlayerProfile(tipo, TYPE_LABELS[tipo], motivo, round(conf, 2)))
+    return profiles
+
+def classify_many(players: Sequence[Optional[Mapping]]) -> List[PlayerProfile]:
+    """Clasifica varios jugadores (p. ej. una mesa entera) en una sola pasada"""
+    if not players:
+        return []
+    matrix = np.full((len(players), len(FEATURE_STATS)), np.nan)
+    for i, stats in enumerate(players):
+        if not stats:
+            continue
+        for j, stat in enumerate(FEATURE_STATS):
+            value = stats.get(stat)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                matrix[i, j] = value
+    columns = {stat: matrix[:, j] for j, stat in enumerate(FEATURE_STATS)}
+    return _profiles(*classify_columns(columns))
+
+def classify(stats: Optional[Mapping]) -> PlayerProfile:
+    """Clasifica un jugador"""
+    return classify_many([stats])[0]
+
+def classify_table(table: StatsTable) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Clasifica todos los jugadores de una StatsTable sin copiar sus columnas
+
+    Returns:
+        Lo mismo que classify_columns, en el orden de table.keys
+    """
+    return classify_columns({stat: table.column(stat) if stat in table.layout.index
+                             else np.full(len(table), np.nan) for stat in FEATURE_STATS})
+
+def test_player_classifier():
+    """Prueba la clasificación de perfiles típicos y su coste"""
+    import time
+    from src.core.player_stats import PlayerStats
+    from src.utils.stub_servers import fake_player_stats
+
+    table = [
+        {"vpip": 12, "pfr": 10, "three_bet": 3, "total_manos": 4000},
+        {"vpip": 22, "pfr": 18, "three_bet": 7, "total_manos": 12000},
+        {"vpip": 31, "pfr": 24, "three_bet": 9, "total_manos": 3000},
+        {"vpip": 48, "pfr": 9, "total_manos": 600},
+        {"vpip": 62, "pfr": 41, "three_bet": 18, "total_manos": 150},
+        {"vpip": 27, "pfr": 8, "total_manos": 900},
+        {"vpip": 24, "pfr": 13, "total_manos": 2000},
+        {"vpip": 30, "pfr": 20, "total_manos": 8},
+        None,
+    ]
+    classify_many(table)  # primera llamada: carga de NumPy
+    started = time.perf_counter()
+    profiles = classify_many(table)
+    elapsed = (time.perf_counter() - started) * 1e6
+    for stats, profile in zip(table, profiles):
+        log_message(f"{str(stats):<70} -> {profile.etiqueta} ({profile.motivo}, confianza {profile.confianza})")
+    log_message(f"Mesa de {len(table)} en {elapsed:.0f} µs")
+
+    players = StatsTable.from_items(
+        ((f"jugador{i}", "XPK"), PlayerStats.from_dict(fake_player_stats(f"jugador{i}", "XPK")))
+        for i in range(100000)
+    )
+    started = time.perf_counter()
+    rows, _confidence = classify_table(players)
+    elapsed = (time.perf_counter() - started) * 1000
+    counts = np.bincount(rows + 1, minlength=len(DECISION_TABLE) + 1)
+    summary = {}
+    for row, count in enumerate(counts.tolist()):
+        tipo = TYPE_REGULAR if row == 0 else DECISION_TABLE[row - 1][0]
+        summary[tipo] = summary.get(tipo, 0) + count
+    log_message(f"100000 jugadores en {elapsed:.1f} ms: {summary}")
+
+if __name__ == "__main__":
+    test_player_classifier()
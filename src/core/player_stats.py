@@ -0,0 +1,329 @@
+"""
+Representación compacta de las estadísticas de un jugador
+Un dict de 24 estadísticas por jugador ocupa kilobytes entre la tabla hash,
+las claves y un objeto float por valor. Aquí cada jugador es un objeto con
+__slots__ cuyos valores viven en un array de dobles con la disposición fija
+de stats_order, y para operar sobre miles de jugadores a la vez hay una
+tabla columnar sobre un array estructurado de NumPy
+"""
+
+import os
+import sys
+import math
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.config.settings import DEFAULT_CONFIG
+
+# Campos de identidad que la API incluye junto a las estadísticas
+IDENTITY_FIELDS = ("nick", "sala")
+
+# Los enteros por encima de 2**53 no caben sin pérdida en un doble
+_MAX_EXACT_INT = 2 ** 53
+
+class StatsLayout:
+    """
+    Disposición fija de campos numéricos: posición de cada estadística
+
+    Se genera a partir de stats_order; los campos que no están en la
+    disposición se guardan aparte sin perderse.
+    """
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields: Tuple[str, ...] = tuple(dict.fromkeys(
+            field for field in fields if field not in IDENTITY_FIELDS
+        ))
+        self.index: Dict[str, int] = {field: i for i, field in enumerate(self.fields)}
+        self.dtype = np.dtype([(field, np.float64) for field in self.fields])
+        self._empty = array("d", [math.nan]) * len(self.fields)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "StatsLayout":
+        return cls(config.get("stats_order") or DEFAULT_CONFIG["stats_order"])
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def empty_values(self) -> array:
+        """Array de valores con todos los campos a NaN"""
+        return array("d", self._empty)
+
+class PlayerStats(Mapping):
+    """
+    Estadísticas de un jugador con disposición fija
+
+    Se comporta como un dict de solo lectura (get, in, items, ==) para que
+    el resto de la aplicación no note el cambio. Cada valor ocupa 8 bytes
+    en values; present marca por bits los campos que venían en la respuesta
+    (NaN con el bit puesto es un null) e ints los que eran enteros, para
+    devolverlos con el mismo tipo. Lo que no es numérico o no está en la
+    disposición va a extras.
+    """
+
+    __slots__ = ("layout", "nick", "sala", "values", "present", "ints", "extras")
+
+    def __init__(self, layout: StatsLayout, nick: Optional[str] = None, sala: Optional[str] = None,
+                 values: Optional[array] = None, present: int = 0, ints: int = 0,
+                 extras: Optional[Dict[str, Any]] = None):
+        self.layout = layout
+        self.nick = nick
+        self.sala = sala
+        self.values = values if values is not None else layout.empty_values()
+        self.present = present
+        self.ints = ints
+        self.extras = extras
+
+    @classmethod
+    def from_dict(cls, data: Mapping, layout: Optional[StatsLayout] = None) -> "PlayerStats":
+        """Convierte las estadísticas recibidas de la API"""
+        layout = DEFAULT_LAYOUT if layout is None else layout
+        index = layout.index
+        values = layout.empty_values()
+        nick = sala = None
+        present = ints = 0
+        extras = None
+
+        for field, value in data.items():
+            i = index.get(field)
+            if i is not None:
+                if value is None:
+                    present |= 1 << i
+                    continue
+                if isinstance(value, float):
+                    values[i] = value
+                    present |= 1 << i
+                    continue
+                if isinstance(value, int) and not isinstance(value, bool) and abs(value) < _MAX_EXACT_INT:
+                    values[i] = value
+                    present |= 1 << i
+                    ints |= 1 << i
+                    continue
+            elif field == "nick" and isinstance(value, str):
+                nick = value
+                continue
+            elif field == "sala" and isinstance(value, str):
+                sala = value
+                continue
+            if extras is None:
+                extras = {}
+            extras[field] = value
+
+        return cls(layout, nick, sala, values, present, ints, extras)
+
+    def _value(self, i: int):
+        value = self.values[i]
+        if value != value:
+            return None
+        return int(value) if self.ints >> i & 1 else value
+
+    def __getitem__(self, field: str):
+        i = self.layout.index.get(field)
+        if i is not None and self.present >> i & 1:
+            return self._value(i)
+        if field == "nick" and self.nick is not None:
+            return self.nick
+        if field == "sala" and self.sala is not None:
+            return self.sala
+        if self.extras is not None and field in self.extras:
+            return self.extras[field]
+        raise KeyError(field)
+
+    def get(self, field: str, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def __contains__(self, field) -> bool:
+        i = self.layout.index.get(field)
+        if i is not None and self.present >> i & 1:
+            return True
+        if field == "nick":
+            return self.nick is not None
+        if field == "sala":
+            return self.sala is not None
+        return self.extras is not None and field in self.extras
+
+    def __iter__(self) -> Iterator[str]:
+        if self.nick is not None:
+            yield "nick"
+        if self.sala is not None:
+            yield "sala"
+        present = self.present
+        for i, field in enumerate(self.layout.fields):
+            if present >> i & 1:
+                yield field
+        if self.extras is not None:
+            yield from self.extras
+
+    def __len__(self) -> int:
+        return ((self.nick is not None) + (self.sala is not None) + bin(self.present).count("1")
+                + (len(self.extras) if self.extras is not None else 0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """dict equivalente al JSON de la API"""
+        data: Dict[str, Any] = {}
+        if self.nick is not None:
+            data["nick"] = self.nick
+        if self.sala is not None:
+            data["sala"] = self.sala
+        values, present, ints = self.values, self.present, self.ints
+        for i, field in enumerate(self.layout.fields):
+            if present >> i & 1:
+                value = values[i]
+                data[field] = None if value != value else (int(value) if ints >> i & 1 else value)
+        if self.extras is not None:
+            data.update(self.extras)
+        return data
+
+    def __repr__(self) -> str:
+        return f"PlayerStats({self.to_dict()!r})"
+
+def as_player_stats(stats: Mapping, layout: Optional[StatsLayout] = None) -> PlayerStats:
+    """Devuelve stats como PlayerStats de la disposición, convirtiéndolas si hace falta"""
+    layout = DEFAULT_LAYOUT if layout is None else layout
+    if isinstance(stats, PlayerStats) and stats.layout is layout:
+        return stats
+    return PlayerStats.from_dict(stats, layout)
+
+class StatsTable:
+    """
+    Estadísticas de muchos jugadores en un array estructurado de NumPy
+
+    Una fila por jugador y una columna float64 por campo de la disposición
+    (NaN = sin dato), con las claves en una lista paralela. Cada columna es
+    una vista sin copia sobre la que ordenar, filtrar o calcular percentiles
+    de todos los jugadores a la vez.
+    """
+
+    def __init__(self, layout: Optional[StatsLayout] = None, capacity: int = 1024):
+        self.layout = DEFAULT_LAYOUT if layout is None else layout
+        self.keys: List[Hashable] = []
+        self._rows = np.full(max(1, capacity), np.nan, dtype=self.layout.dtype)
+
+    @classmethod
+    def from_items(cls, items: Iterable[Tuple[Hashable, Mapping]],
+                   layout: Optional[StatsLayout] = None) -> "StatsTable":
+        """Construye la tabla a partir de pares (clave, estadísticas)"""
+        items = list(items)
+        table = cls(layout, capacity=len(items))
+        layout = table.layout
+        if all(isinstance(stats, PlayerStats) and stats.layout is layout for _key, stats in items):
+            # Los arrays de valores ya tienen la disposición de la fila: se copian de golpe
+            if items:
+                buffer = b"".join(stats.values.tobytes() for _key, stats in items)
+                table._rows[:len(items)] = np.frombuffer(buffer, dtype=layout.dtype)
+            table.keys = [key for key, _stats in items]
+            return table
+        for key, stats in items:
+            table.append(key, stats)
+        return table
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def rows(self) -> np.ndarray:
+        """Vista de las filas ocupadas"""
+        return self._rows[:len(self.keys)]
+
+    @property
+    def nbytes(self) -> int:
+        return self._rows.nbytes
+
+    def append(self, key: Hashable, stats: Mapping) -> None:
+        """Añade un jugador; los campos ausentes o nulos quedan a NaN"""
+        count = len(self.keys)
+        if count == len(self._rows):
+            grown = np.full(len(self._rows) * 2, np.nan, dtype=self.layout.dtype)
+            grown[:count] = self._rows
+            self._rows = grown
+
+        row = self._rows[count:count + 1].view(np.float64)
+        if isinstance(stats, PlayerStats) and stats.layout is self.layout:
+            row[:] = np.frombuffer(stats.values, dtype=np.float64)
+        else:
+            for field, i in self.layout.index.items():
+                value = stats.get(field)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    row[i] = value
+        self.keys.append(key)
+
+    def column(self, field: str) -> np.ndarray:
+        """Valores de un campo para todos los jugadores (vista, NaN = sin dato)"""
+        return self.rows[field]
+
+    def matrix(self, fields: Optional[Sequence[str]] = None) -> np.ndarray:
+        """Matriz jugadores x campos (copia) para operaciones de varias columnas"""
+        fields = fields or self.layout.fields
+        return np.column_stack([self.column(field) for field in fields]) if len(self) else \
+            np.empty((0, len(fields)))
+
+    def select(self, mask: np.ndarray) -> List[Hashable]:
+        """Claves de las filas donde mask es True"""
+        return [self.keys[i] for i in np.flatnonzero(mask)]
+
+    def top(self, field: str, count: int = 10, descending: bool = True) -> List[Tuple[Hashable, float]]:
+        """Los count jugadores con el valor más alto (o más bajo) de un campo"""
+        values = self.column(field)
+        valid = np.flatnonzero(~np.isnan(values))
+        if not len(valid) or count <= 0:
+            return []
+        ranked = values[valid] * (-1 if descending else 1)
+        count = min(count, len(valid))
+        chosen = np.argpartition(ranked, count - 1)[:count]
+        chosen = chosen[np.argsort(ranked[chosen], kind="stable")]
+        return [(self.keys[valid[i]], float(values[valid[i]])) for i in chosen]
+
+    def percentiles(self, field: str, quantiles: Sequence[float] = (25, 50, 75)) -> Optional[List[float]]:
+        """Percentiles de un campo entre los jugadores que lo tienen, o None si nadie"""
+        values = self.column(field)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return None
+        return [float(value) for value in np.percentile(values, quantiles)]
+
+    def player(self, i: int) -> PlayerStats:
+        """Fila i como PlayerStats (solo los campos numéricos, como float)"""
+        values = array("d", self._rows[i:i + 1].view(np.float64).tobytes())
+        present = 0
+        for j, value in enumerate(values):
+            if value == value:
+                present |= 1 << j
+        return PlayerStats(self.layout, values=values, present=present)
+
+# Disposición por defecto: el orden de estadísticas de la configuración de fábrica
+DEFAULT_LAYOUT = StatsLayout(DEFAULT_CONFIG["stats_order"])
+
+def test_player_stats():
+    """Prueba la conversión, el comportamiento de dict y la tabla"""
+    import json
+    from src.utils.stub_servers import fake_player_stats
+
+    raw = fake_player_stats("LuckyAce", "XPK")
+    raw.update({"bb_100": None, "id_jugador": 1234, "total_manos": 8123})
+    stats = PlayerStats.from_dict(raw)
+    log_message(f"Igual que el dict: {stats == raw}, JSON idéntico: "
+                f"{json.loads(json.dumps(stats.to_dict())) == raw}")
+    log_message(f"vpip={stats['vpip']!r} total_manos={stats.get('total_manos')!r} "
+                f"bb_100={stats['bb_100']!r} extras={stats.extras} 'wwsf' in: {'wwsf' in stats}")
+
+    table = StatsTable.from_items(
+        ((f"jugador{i}", "XPK"), PlayerStats.from_dict(fake_player_stats(f"jugador{i}", "XPK")))
+        for i in range(1000)
+    )
+    vpip = table.column("vpip")
+    log_message(f"Tabla: {len(table)} jugadores, {table.nbytes / 1024:.0f} KB, "
+                f"VPIP p25/p50/p75 {table.percentiles('vpip')}")
+    log_message(f"Sueltos (VPIP > 45): {len(table.select(vpip > 45))}, "
+                f"más agresivos: {table.top('three_bet', 3)}")
+    log_message(f"Fila 0 recuperada: {table.player(0)['vpip']} == {vpip[0]}")
+
+if __name__ == "__main__":
+    test_player_stats()
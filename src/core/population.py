@@ -0,0 +1,273 @@
+"""
+Modelo de población de jugadores por sala
+Mantiene por sala y estadística un resumen de cuantiles KLL que se actualiza
+con cada jugador nuevo y se guarda en disco, para situar un valor (un VPIP
+de 32) en el percentil que ocupa entre todos los jugadores vistos sin
+ordenar nada al pintar
+"""
+
+import os
+import sys
+import json
+import math
+import random
+import threading
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.utils.nick_normalizer import normalize_sala
+
+class KLLSketch:
+    """
+    Resumen de cuantiles KLL (Karnin, Lang y Liberty)
+
+    Los valores entran en el nivel 0; cuando un nivel se llena se ordena y
+    sube al siguiente uno de cada dos valores (empezando al azar por el
+    primero o el segundo), que pasan a pesar el doble. La capacidad de los
+    niveles decrece geométricamente (factor 2/3) desde el más alto, así que
+    la memoria es O(k) y el error de rango es del orden de 1/k.
+    Las consultas usan una tabla acumulada que se reconstruye solo cuando ha
+    habido altas desde la anterior; después cada consulta es una búsqueda
+    binaria.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        self.k = max(8, k)
+        self.n = 0
+        self.compactors: List[List[float]] = [[]]
+        self._size = 0
+        self._max_size = self._capacity(0)
+        self._random = random.Random(seed)
+        self._values: Optional[List[float]] = None
+        self._cumulative: List[float] = []
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, value: float) -> None:
+        """Añade una observación"""
+        self.compactors[0].append(value)
+        self._size += 1
+        self.n += 1
+        self._values = None
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self) -> None:
+        for level, items in enumerate(self.compactors):
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                items.sort()
+                promoted = items[self._random.random() < 0.5::2]
+                self.compactors[level + 1].extend(promoted)
+                self._size += len(promoted) - len(items)
+                items.clear()
+                break
+        self._max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def _table(self) -> Tuple[List[float], List[float]]:
+        """Valores ordenados y peso acumulado hasta cada uno (incluido)"""
+        if self._values is None:
+            weighted = sorted((value, 1 << level)
+                              for level, items in enumerate(self.compactors) for value in items)
+            self._values = [value for value, _weight in weighted]
+            total = 0
+            self._cumulative = []
+            for _value, weight in weighted:
+                total += weight
+                self._cumulative.append(total)
+        return self._values, self._cumulative
+
+    def rank(self, value: float) -> float:
+        """
+        Fracción de observaciones por debajo de value (0-1)
+
+        Los empates cuentan la mitad, así que el valor más repetido de una
+        población no queda en un extremo.
+        """
+        values, cumulative = self._table()
+        if not values:
+            return 0.5
+        low = bisect_left(values, value)
+        high = bisect_right(values, value)
+        below = cumulative[low - 1] if low else 0
+        upto = cumulative[high - 1] if high else 0
+        return (below + upto) / 2 / cumulative[-1]
+
+    def quantile(self, fraction: float) -> Optional[float]:
+        """Valor aproximado del cuantil fraction (0-1), o None sin observaciones"""
+        values, cumulative = self._table()
+        if not values:
+            return None
+        target = fraction * cumulative[-1]
+        return values[min(len(values) - 1, bisect_left(cumulative, target))]
+
+    def to_dict(self) -> dict:
+        return {"k": self.k, "n": self.n, "compactors": self.compactors}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KLLSketch":
+        sketch = cls(int(data.get("k", 200)))
+        sketch.n = int(data.get("n", 0))
+        sketch.compactors = [[float(value) for value in items] for items in data.get("compactors") or [[]]]
+        sketch._size = sum(len(items) for items in sketch.compactors)
+        sketch._max_size = sum(sketch._capacity(level) for level in range(len(sketch.compactors)))
+        return sketch
+
+class PopulationModel:
+    """
+    Resúmenes de cuantiles por (sala, estadística)
+
+    Cada jugador cuenta una vez, cuando se obtiene por primera vez (los
+    refrescos no lo vuelven a sumar). Se guarda en disco cada save_every
+    observaciones y al cerrar.
+
+    Args:
+        path: Fichero JSON del modelo, o None para no guardarlo
+        fields: Estadísticas a modelar (stats_order)
+        k: Tamaño de los resúmenes; más grande, más preciso
+        save_every: Observaciones entre guardados
+    """
+
+    def __init__(self, path: Optional[Path], fields: Iterable[str], k: int = 200, save_every: int = 500):
+        self.path = Path(path) if path is not None else None
+        self.fields = tuple(fields)
+        self.k = k
+        self.save_every = max(1, save_every)
+        self._sketches: Dict[str, Dict[str, KLLSketch]] = {}
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self.players: Dict[str, int] = {}
+
+    @classmethod
+    def load(cls, path: Optional[Path], fields: Iterable[str], k: int = 200,
+             save_every: int = 500) -> "PopulationModel":
+        """Carga el modelo guardado, o uno vacío si no existe o no se puede leer"""
+        model = cls(path, fields, k, save_every)
+        if model.path is None or not model.path.exists():
+            return model
+        try:
+            with open(model.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for sala, room in data.get("salas", {}).items():
+                model.players[sala] = int(room.get("jugadores", 0))
+                model._sketches[sala] = {
+                    stat: KLLSketch.from_dict(sketch) for stat, sketch in room.get("stats", {}).items()
+                }
+            log_message(f"Modelo de población cargado: {sum(model.players.values())} jugadores")
+        except Exception as e:
+            log_message(f"Error al cargar el modelo de población: {e}", level='error')
+        return model
+
+    def observe(self, sala: str, stats: Mapping) -> None:
+        """Añade un jugador a la población de su sala"""
+        sala = normalize_sala(sala)
+        with self._lock:
+            room = self._sketches.setdefault(sala, {})
+            for stat in self.fields:
+                value = stats.get(stat)
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and value == value:
+                    sketch = room.get(stat)
+                    if sketch is None:
+                        sketch = room[stat] = KLLSketch(self.k)
+                    sketch.update(float(value))
+            self.players[sala] = self.players.get(sala, 0) + 1
+            self._unsaved += 1
+            save = self._unsaved >= self.save_every
+        if save:
+            self.save()
+
+    def percentile(self, sala: str, stat: str, value: float) -> Optional[float]:
+        """Percentil (0-100) de value entre los jugadores de la sala, o None sin datos"""
+        with self._lock:
+            sketch = self._sketches.get(normalize_sala(sala), {}).get(stat)
+            if sketch is None or not sketch.n:
+                return None
+            return sketch.rank(float(value)) * 100
+
+    def percentiles(self, sala: str, stats: Mapping) -> Dict[str, float]:
+        """Percentil de cada estadística numérica de un jugador que tenga población"""
+        ranks = {}
+        for stat in self.fields:
+            value = stats.get(stat)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and value == value:
+                rank = self.percentile(sala, stat, value)
+                if rank is not None:
+                    ranks[stat] = rank
+        return ranks
+
+    def quantile(self, sala: str, stat: str, fraction: float) -> Optional[float]:
+        """Valor de la estadística en el cuantil fraction (0-1) de la sala"""
+        with self._lock:
+            sketch = self._sketches.get(normalize_sala(sala), {}).get(stat)
+            return sketch.quantile(fraction) if sketch is not None else None
+
+    def save(self) -> None:
+        """Guarda el modelo (escritura atómica)"""
+        if self.path is None:
+            return
+        with self._lock:
+            data = {"salas": {
+                sala: {
+                    "jugadores": self.players.get(sala, 0),
+                    "stats": {stat: sketch.to_dict() for stat, sketch in room.items()},
+                }
+                for sala, room in self._sketches.items()
+            }}
+            self._unsaved = 0
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(".tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            log_message(f"Error al guardar el modelo de población: {e}", level='error')
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return {sala: players for sala, players in self.players.items()}
+
+def test_population():
+    """Prueba la precisión de los percentiles y la persistencia"""
+    import time
+    import tempfile
+    import numpy as np
+    from src.utils.stub_servers import fake_player_stats
+
+    path = Path(tempfile.mkdtemp()) / "population.json"
+    model = PopulationModel(path, ["vpip", "pfr", "bb_100"])
+    players = [fake_player_stats(f"jugador{i}", "XPK") for i in range(50000)]
+
+    started = time.perf_counter()
+    for stats in players:
+        model.observe("XPK", stats)
+    log_message(f"50000 jugadores observados en {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    vpip = np.sort([stats["vpip"] for stats in players])
+    worst = 0.0
+    for value in range(10, 50, 3):
+        exact = (np.searchsorted(vpip, value, "left") + np.searchsorted(vpip, value, "right")) / 2 / len(vpip) * 100
+        approx = model.percentile("XPK", "vpip", value)
+        worst = max(worst, abs(exact - approx))
+    log_message(f"Error máximo del percentil de VPIP: {worst:.2f} puntos")
+
+    started = time.perf_counter()
+    for _ in range(10000):
+        model.percentile("XPK", "vpip", 32)
+    log_message(f"Consulta: {(time.perf_counter() - started) * 100:.1f} µs, VPIP 32 = percentil "
+                f"{model.percentile('XPK', 'vpip', 32):.0f}, mediana {model.quantile('XPK', 'vpip', 0.5)}")
+
+    model.save()
+    loaded = PopulationModel.load(path, ["vpip", "pfr", "bb_100"])
+    log_message(f"Guardado {path.stat().st_size / 1024:.0f} KB; recargado: "
+                f"{loaded.percentile('XPK', 'vpip', 32):.1f}, {loaded.metrics()}")
+
+if __name__ == "__main__":
+    test_population()
@@ -0,0 +1,301 @@
+"""
+Protecciones del cliente de la API de estadísticas
+Limitador de peticiones por cubeta de fichas, presupuesto de reintentos con
+espera aleatoria, cortacircuitos, peticiones duplicadas para las respuestas
+lentas y métricas de latencia y errores por endpoint
+"""
+
+import os
+import sys
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+
+T = TypeVar("T")
+
+# Estados del cortacircuitos
+BREAKER_CLOSED = "cerrado"
+BREAKER_OPEN = "abierto"
+BREAKER_HALF_OPEN = "semiabierto"
+
+class TokenBucket:
+    """
+    Limitador de peticiones por cubeta de fichas
+
+    Se reponen rate fichas por segundo hasta un máximo de burst; cada
+    petición consume una y, si no hay, espera a que se reponga.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = max(0.01, rate)
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Consume una ficha; devuelve False si no la hay antes de timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waiting = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                delay = (1 - self._tokens) / self.rate
+                if not waiting:
+                    waiting = True
+                    self.waited += 1
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                delay = min(delay, remaining)
+            time.sleep(delay)
+
+class RetryBudget:
+    """
+    Presupuesto de reintentos
+
+    Cada petición original deposita ratio fichas y cada reintento (o
+    petición duplicada) gasta una, así que los reintentos nunca superan esa
+    fracción del tráfico aunque el servicio falle en todas. min_per_second
+    garantiza algunos reintentos con poco tráfico.
+
+    Args:
+        ratio: Reintentos permitidos por petición original
+        min_per_second: Fichas que se reponen por segundo en cualquier caso
+        cap: Fichas acumulables como máximo
+        base_delay: Espera base antes del primer reintento (s)
+        max_delay: Espera máxima entre reintentos (s)
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, cap: float = 10.0,
+                 base_delay: float = 0.1, max_delay: float = 2.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.cap = cap
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._balance = cap
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.denied = 0
+
+    def deposit(self) -> None:
+        """Apunta una petición original"""
+        with self._lock:
+            self._balance = min(self.cap, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Gasta una ficha para un reintento; False si no quedan"""
+        with self._lock:
+            now = time.monotonic()
+            self._balance = min(self.cap, self._balance + (now - self._last) * self.min_per_second)
+            self._last = now
+            if self._balance >= 1:
+                self._balance -= 1
+                return True
+            self.denied += 1
+            return False
+
+    def backoff(self, attempt: int) -> float:
+        """Espera antes del reintento attempt (0 = primero), con jitter completo"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+class CircuitBreaker:
+    """
+    Cortacircuitos del servicio de estadísticas
+
+    Tras failure_threshold fallos seguidos se abre: durante open_seconds
+    las peticiones fallan al instante sin tocar la red. Después deja pasar
+    una petición de prueba (semiabierto): si funciona se cierra y si falla
+    vuelve a abrirse.
+    """
+
+    def __init__(self, failure_threshold: int = 5, open_seconds: float = 10.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self.state = BREAKER_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    def allow(self) -> bool:
+        """True si la petición puede salir; en semiabierto solo deja una"""
+        with self._lock:
+            if self.state == BREAKER_OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = BREAKER_HALF_OPEN
+                self._probing = False
+            if self.state == BREAKER_CLOSED:
+                return True
+            if self.state == BREAKER_HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def is_open(self) -> bool:
+        """True si el servicio se considera caído (sin consumir la prueba)"""
+        with self._lock:
+            return self.state == BREAKER_OPEN and time.monotonic() - self._opened_at < self.open_seconds
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != BREAKER_CLOSED:
+                log_message("API de estadísticas recuperada: cortacircuitos cerrado")
+            self.state = BREAKER_CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == BREAKER_HALF_OPEN or \
+                    (self.state == BREAKER_CLOSED and self._failures >= self.failure_threshold):
+                if self.state == BREAKER_CLOSED:
+                    log_message(f"API de estadísticas con {self._failures} fallos seguidos: "
+                                f"cortacircuitos abierto {self.open_seconds:g} s", level='warning')
+                self.state = BREAKER_OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self.opened += 1
+
+class EndpointMetrics:
+    """Peticiones, errores, reintentos y latencias recientes de un endpoint"""
+
+    def __init__(self, window: int = 512):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            if ok:
+                self.latencies.append(latency)
+            else:
+                self.errors += 1
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Percentil de latencia en segundos, o None con menos de 20 muestras"""
+        with self._lock:
+            if len(self.latencies) < 20:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, float]:
+        p50, p95, p99 = (self.percentile(f) for f in (0.5, 0.95, 0.99))
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+            }
+
+def hedged_call(executor: ThreadPoolExecutor, attempt: Callable[[], T], delay: float,
+                may_hedge: Callable[[], bool], metrics: EndpointMetrics) -> T:
+    """
+    Ejecuta attempt y, si no ha respondido en delay segundos, lanza una copia
+
+    Devuelve la primera respuesta correcta; si una copia falla se espera a
+    la otra. La copia solo sale si may_hedge lo permite (presupuesto).
+
+    Raises:
+        La excepción del último intento que falle
+    """
+    primary: Future = executor.submit(attempt)
+    done, _ = wait([primary], timeout=delay)
+    if done or not may_hedge():
+        return primary.result()
+
+    metrics.count("hedges")
+    pending = {primary, executor.submit(attempt)}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                # La copia que pierde termina sola y su resultado se descarta
+                if future is not primary:
+                    metrics.count("hedge_wins")
+                return future.result()
+            error = future.exception()
+    raise error
+
+def test_resilience():
+    """Prueba el cliente de estadísticas contra el servidor local con fallos inyectados"""
+    from src.core.stats_client import StatsClient, StatsAPIError
+    from src.utils.stub_servers import StatsStubServer
+
+    # Un 30% de errores 503: los reintentos los absorben
+    with StatsStubServer(error_rate=0.3, seed=1) as stub:
+        client = StatsClient(stub.url, rate=200, burst=200, max_retries=3)
+        ok = sum(1 for i in range(100) if client.get_stats(f"jugador{i}", "XPK"))
+        log_message(f"Con 30% de 503: {ok}/100 correctas, fallos inyectados {stub.faults['error']}, "
+                    f"métricas {client.metrics()['endpoints']['jugador']}")
+        client.close()
+
+    # Servicio caído: el cortacircuitos corta el tráfico
+    with StatsStubServer(error_rate=1.0) as stub:
+        client = StatsClient(stub.url, max_retries=1, breaker_failures=5, breaker_open_seconds=0.5)
+        started = time.perf_counter()
+        errors = 0
+        for i in range(50):
+            try:
+                client.fetch_stats(f"jugador{i}", "XPK")
+            except StatsAPIError:
+                errors += 1
+        log_message(f"Caído: {errors}/50 errores en {(time.perf_counter() - started) * 1000:.0f} ms, "
+                    f"peticiones al servidor {stub.requests}, estado {client.breaker.state}")
+        stub.error_rate = 0.0
+        time.sleep(0.6)
+        log_message(f"Recuperado: {bool(client.get_stats('jugador1', 'XPK'))}, estado {client.breaker.state}")
+        client.close()
+
+    # Colas lentas: el hedging recorta el p99
+    for hedging in (False, True):
+        with StatsStubServer(slow_rate=0.05, slow_latency=0.3, latency=0.01, seed=2) as stub:
+            client = StatsClient(stub.url, rate=1000, burst=1000, hedging=hedging, hedge_delay=0.05)
+            for i in range(200):
+                client.get_stats(f"jugador{i}", "XPK")
+            log_message(f"Hedging {'sí' if hedging else 'no'}: {client.metrics()['endpoints']['jugador']}")
+            client.close()
+
+    # Limitador: 50 peticiones a 100/s con ráfaga de 10
+    bucket = TokenBucket(100, 10)
+    started = time.perf_counter()
+    for _ in range(50):
+        bucket.acquire()
+    log_message(f"Limitador: 50 fichas en {(time.perf_counter() - started) * 1000:.0f} ms (esperado ~400 ms)")
+
+if __name__ == "__main__":
+    test_resilience()
@@ -0,0 +1,70 @@
+"""
+Deduplicación de llamadas concurrentes (single-flight)
+Si varias llamadas piden la misma clave mientras hay una en curso, todas
+comparten esa llamada y su resultado en lugar de repetirla
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+class SingleFlight:
+    """
+    Mapa de llamadas en curso por clave
+
+    La primera llamada de una clave la ejecuta; las que llegan mientras
+    sigue en curso reciben el mismo Future. Las excepciones se propagan a
+    todos los que esperan. La clave se olvida al terminar la llamada, así
+    que una petición posterior vuelve a ejecutarse. Cada llamada guarda
+    además un dato de quien la inició (p. ej. el nick tal como lo escribió),
+    que reciben los que se unen a ella.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Tuple[Future, Any]] = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.collapsed = 0
+
+    def submit(self, key: Hashable, start: Callable[[], Future],
+               leader: Optional[Any] = None) -> Tuple[Future, bool, Any]:
+        """
+        Comparte o inicia una llamada asíncrona
+
+        Args:
+            key: Clave de deduplicación
+            start: Función que inicia la llamada y devuelve su Future; se
+                invoca con el bloqueo tomado, así que no debe bloquear
+            leader: Dato que se guarda con la llamada si esta la inicia
+
+        Returns:
+            Tupla (future, iniciada, leader de la llamada) donde iniciada es
+            False si se compartió una llamada ya en curso
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.collapsed += 1
+                return call[0], False, call[1]
+            future = start()
+            self._calls[key] = (future, leader)
+            self.started += 1
+
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future, True, leader
+
+    def in_flight(self) -> int:
+        """Número de llamadas en curso"""
+        with self._lock:
+            return len(self._calls)
+
+    def _forget(self, key: Hashable, future: Future) -> None:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call[0] is future:
+                del self._calls[key]
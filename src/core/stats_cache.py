@@ -0,0 +1,410 @@
+"""
+Caché de estadísticas de jugadores en dos niveles
+Un LRU en memoria delante de un almacén SQLite en disco (modo WAL) que
+sobrevive a los reinicios, con una caducidad por entrada que depende del
+tamaño de la muestra y de lo que ha cambiado el jugador, y entrega de datos
+caducados mientras se refrescan en segundo plano
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Hashable, Iterator, Mapping, Optional, Tuple
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.core.player_stats import DEFAULT_LAYOUT, PlayerStats, StatsLayout, StatsTable, as_player_stats
+
+# Estado de una entrada al consultarla
+CACHE_FRESH = "fresh"    # dentro del TTL: se usa tal cual
+CACHE_STALE = "stale"    # caducada pero utilizable: se usa y se refresca
+CACHE_MISS = "miss"      # no existe o es demasiado antigua
+
+# Clave de la caché: (nick normalizado, sala normalizada)
+CacheKey = Tuple[str, str]
+
+class CacheEntry:
+    """Entrada de la caché (estadísticas compactas) con su historial de refrescos"""
+
+    __slots__ = ("stats", "fetched_at", "expires_at", "checks", "changes", "last_seen")
+
+    def __init__(self, stats: PlayerStats, fetched_at: float, expires_at: float,
+                 checks: int = 1, changes: int = 0):
+        self.stats = stats
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+        self.checks = checks            # veces que se ha obtenido de la API
+        self.changes = changes          # veces que las estadísticas habían cambiado
+        self.last_seen = 0.0            # última vez que alguien la pidió
+
+# Campos de las estadísticas que usa la política de frescura
+FRESHNESS_FIELDS = ("total_manos",)
+
+def sample_size(stats: Mapping) -> int:
+    """Número de manos de la muestra (total_manos), 0 si no se conoce"""
+    try:
+        return max(0, int(float(stats.get("total_manos", 0) or 0)))
+    except (TypeError, ValueError):
+        return 0
+
+class FreshnessPolicy:
+    """
+    Calcula cuánto tiempo es fresca cada entrada
+
+    Cada mano nueva mueve los porcentajes de un jugador en proporción
+    inversa a su muestra, así que la vida base crece linealmente con
+    total_manos (ttl_per_hand segundos por mano). Después se ajusta con el
+    historial: la tasa de cambio observada en los refrescos (suavizada de
+    Laplace, 0.5 sin historial) escala la vida entre casi 0 (siempre
+    cambia) y el doble (nunca cambia). El resultado se acota a
+    [min_ttl, max_ttl].
+    """
+
+    def __init__(self, min_ttl: float = 600, max_ttl: float = 3 * 86400, ttl_per_hand: float = 20):
+        self.min_ttl = min_ttl
+        self.max_ttl = max(min_ttl, max_ttl)
+        self.ttl_per_hand = ttl_per_hand
+
+    @classmethod
+    def from_config(cls, config: dict) -> "FreshnessPolicy":
+        return cls(
+            min_ttl=float(config.get("stats_cache_ttl_min", 600)),
+            max_ttl=float(config.get("stats_cache_ttl_max", 3 * 86400)),
+            ttl_per_hand=float(config.get("stats_cache_ttl_per_hand", 20)),
+        )
+
+    @staticmethod
+    def change_rate(checks: int, changes: int) -> float:
+        """Probabilidad estimada de que un refresco encuentre cambios"""
+        # Los cambios se cuentan desde el segundo refresco
+        return (changes + 1) / (max(0, checks - 1) + 2)
+
+    def ttl(self, stats: Mapping, checks: int = 1, changes: int = 0) -> float:
+        """Vida en segundos de una entrada"""
+        base = sample_size(stats) * self.ttl_per_hand
+        ttl = base * 2 * (1 - self.change_rate(checks, changes))
+        return min(self.max_ttl, max(self.min_ttl, ttl))
+
+class LRUCache:
+    """Diccionario acotado que descarta la entrada usada hace más tiempo"""
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max(1, max_entries)
+        self._data: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def items(self) -> list:
+        """Copia de los pares (clave, valor), del usado hace más tiempo al más reciente"""
+        with self._lock:
+            return list(self._data.items())
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+class SQLiteStatsStore:
+    """
+    Almacén persistente de estadísticas en SQLite
+
+    Usa el diario WAL para que las lecturas no esperen a las escrituras y
+    una única conexión protegida por un bloqueo, compartida entre hilos.
+    """
+
+    def __init__(self, path: Path, layout: Optional[StatsLayout] = None):
+        self.path = Path(path)
+        self.layout = DEFAULT_LAYOUT if layout is None else layout
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS player_stats ("
+            " sala TEXT NOT NULL, nick TEXT NOT NULL, stats TEXT NOT NULL, fetched_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL DEFAULT 0, checks INTEGER NOT NULL DEFAULT 1,"
+            " changes INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (sala, nick)) WITHOUT ROWID"
+        )
+        # Bases creadas antes de guardar el historial de refrescos
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(player_stats)")}
+        for column, definition in (("expires_at", "REAL NOT NULL DEFAULT 0"),
+                                   ("checks", "INTEGER NOT NULL DEFAULT 1"),
+                                   ("changes", "INTEGER NOT NULL DEFAULT 0")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE player_stats ADD COLUMN {column} {definition}")
+
+    def get(self, key: CacheKey) -> Optional[CacheEntry]:
+        """Devuelve la entrada guardada o None"""
+        nick, sala = key
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stats, fetched_at, expires_at, checks, changes FROM player_stats"
+                " WHERE sala = ? AND nick = ?", (sala, nick)
+            ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(PlayerStats.from_dict(json.loads(row[0]), self.layout), row[1], row[2], row[3], row[4])
+
+    def put(self, key: CacheKey, entry: CacheEntry) -> None:
+        nick, sala = key
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO player_stats (sala, nick, stats, fetched_at, expires_at, checks, changes)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sala, nick, json.dumps(entry.stats.to_dict(), ensure_ascii=False), entry.fetched_at,
+                 entry.expires_at, entry.checks, entry.changes)
+            )
+
+    def delete(self, key: CacheKey) -> None:
+        nick, sala = key
+        with self._lock:
+            self._conn.execute("DELETE FROM player_stats WHERE sala = ? AND nick = ?", (sala, nick))
+
+    def purge(self, expired_before: float) -> int:
+        """Elimina las entradas caducadas antes de expired_before; devuelve cuántas"""
+        with self._lock:
+            return self._conn.execute("DELETE FROM player_stats WHERE expires_at < ?", (expired_before,)).rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM player_stats")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def iter_stats(self, batch: int = 5000) -> Iterator[Tuple[CacheKey, dict]]:
+        """Recorre por bloques las (clave, estadísticas) guardadas; omite las ilegibles"""
+        last = ("", "")
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT sala, nick, stats FROM player_stats WHERE (sala, nick) > (?, ?)"
+                    " ORDER BY sala, nick LIMIT ?", (last[0], last[1], batch)
+                ).fetchall()
+            if not rows:
+                return
+            for sala, nick, stats in rows:
+                try:
+                    yield (nick, sala), json.loads(stats)
+                except ValueError:
+                    continue
+            last = (rows[-1][0], rows[-1][1])
+
+    def iter_nicks(self, batch: int = 5000) -> Iterator[Tuple[str, str]]:
+        """
+        Recorre los (nick, sala) guardados por bloques
+
+        Usa el nick original de las estadísticas si lo incluyen y, si no,
+        la clave canónica.
+        """
+        for (nick, sala), stats in self.iter_stats(batch):
+            yield str(stats.get("nick") or nick), sala
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM player_stats").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class StatsCache:
+    """
+    Caché de estadísticas por (nick normalizado, sala)
+
+    Cada entrada es fresca hasta su expires_at, calculado por la política de
+    frescura al guardarla; después, y durante stale_ttl segundos más, se
+    sigue entregando marcada como caducada para que quien la pide la
+    muestre al instante y pida un refresco. Pasado ese tiempo se trata como
+    ausente. Las lecturas del disco se suben al LRU. Las estadísticas se
+    guardan en memoria como PlayerStats con la disposición de layout.
+    """
+
+    def __init__(self, path: Optional[Path], max_entries: int = 5000,
+                 policy: Optional[FreshnessPolicy] = None, stale_ttl: float = 7 * 86400,
+                 layout: Optional[StatsLayout] = None):
+        self.policy = policy or FreshnessPolicy()
+        self.stale_ttl = stale_ttl
+        self.layout = DEFAULT_LAYOUT if layout is None else layout
+        self.memory = LRUCache(max_entries)
+        self.store: Optional[SQLiteStatsStore] = None
+
+        if path is not None:
+            try:
+                self.store = SQLiteStatsStore(path, self.layout)
+                self.store.purge(time.time() - stale_ttl)
+            except Exception as e:
+                log_message(f"Caché en disco no disponible ({path}): {e}", level='warning')
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def state_of(self, entry: CacheEntry, now: Optional[float] = None) -> str:
+        """Estado de una entrada en un instante"""
+        now = time.time() if now is None else now
+        if now <= entry.expires_at:
+            return CACHE_FRESH
+        if now <= entry.expires_at + self.stale_ttl:
+            return CACHE_STALE
+        return CACHE_MISS
+
+    def peek(self, key: CacheKey) -> Optional[CacheEntry]:
+        """Entrada de la caché sin contarla como consulta"""
+        entry = self.memory.get(key)
+        if entry is None and self.store is not None:
+            try:
+                entry = self.store.get(key)
+            except Exception as e:
+                log_message(f"Error al leer la caché en disco: {e}", level='error')
+                return None
+            if entry is not None:
+                self.memory.put(key, entry)
+        return entry
+
+    def get(self, key: CacheKey) -> Tuple[Optional[PlayerStats], str]:
+        """
+        Consulta una entrada
+
+        Returns:
+            Tupla (estadísticas o None, estado CACHE_FRESH/CACHE_STALE/CACHE_MISS);
+            las estadísticas se leen como un dict pero no se pueden modificar
+        """
+        now = time.time()
+        in_memory = self.memory.get(key) is not None
+        entry = self.peek(key)
+
+        state = CACHE_MISS if entry is None else self.state_of(entry, now)
+        with self._lock:
+            if state == CACHE_MISS:
+                self.misses += 1
+            else:
+                if state == CACHE_FRESH:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                if not in_memory:
+                    self.disk_hits += 1
+
+        if state == CACHE_MISS:
+            return None, CACHE_MISS
+        entry.last_seen = now
+        return entry.stats, state
+
+    def put(self, key: CacheKey, stats: Mapping, fetched_at: Optional[float] = None) -> CacheEntry:
+        """
+        Guarda unas estadísticas recién obtenidas en ambos niveles
+
+        Compara con la entrada anterior para actualizar el historial de
+        cambios y recalcula su vida con la política de frescura.
+        """
+        now = time.time() if fetched_at is None else fetched_at
+        stats = as_player_stats(stats, self.layout)
+        previous = self.peek(key)
+
+        checks, changes, last_seen = 1, 0, 0.0
+        if previous is not None:
+            checks = previous.checks + 1
+            changes = previous.changes + (1 if previous.stats != stats else 0)
+            last_seen = previous.last_seen
+
+        entry = CacheEntry(stats, now, now + self.policy.ttl(stats, checks, changes), checks, changes)
+        entry.last_seen = last_seen
+        self.memory.put(key, entry)
+        if self.store is not None:
+            try:
+                self.store.put(key, entry)
+            except Exception as e:
+                log_message(f"Error al escribir la caché en disco: {e}", level='error')
+        return entry
+
+    def known_nicks(self) -> Iterator[Tuple[str, str]]:
+        """(nick, sala) de todos los jugadores guardados en disco"""
+        if self.store is None:
+            return iter(())
+        return self.store.iter_nicks()
+
+    def table(self, include_disk: bool = False) -> StatsTable:
+        """
+        Estadísticas de los jugadores en caché como tabla de NumPy
+
+        Args:
+            include_disk: Incluir también los jugadores que solo están en disco
+        """
+        entries = {key: entry.stats for key, entry in self.memory.items()}
+        if include_disk and self.store is not None:
+            try:
+                for key, stats in self.store.iter_stats():
+                    if key not in entries:
+                        entries[key] = stats
+            except Exception as e:
+                log_message(f"Error al leer la caché en disco: {e}", level='error')
+        return StatsTable.from_items(entries.items(), self.layout)
+
+    def invalidate(self, key: CacheKey) -> None:
+        """Elimina una entrada de ambos niveles"""
+        self.memory.pop(key)
+        if self.store is not None:
+            try:
+                self.store.delete(key)
+            except Exception as e:
+                log_message(f"Error al borrar de la caché en disco: {e}", level='error')
+
+    def clear(self) -> None:
+        """Vacía ambos niveles"""
+        self.memory.clear()
+        if self.store is not None:
+            try:
+                self.store.clear()
+            except Exception as e:
+                log_message(f"Error al vaciar la caché en disco: {e}", level='error')
+        log_message("Caché de estadísticas vaciada")
+
+    def metrics(self) -> Dict[str, int]:
+        """Contadores de la caché"""
+        with self._lock:
+            metrics = {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self.memory),
+            }
+        if self.store is not None:
+            try:
+                metrics["disk_entries"] = self.store.count()
+            except Exception:
+                pass
+        return metrics
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
+            self.store = None
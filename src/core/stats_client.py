@@ -0,0 +1,525 @@
+"""
+Cliente HTTP de la API de estadísticas de pokerprotrack
+Mantiene un pool de conexiones persistentes (keep-alive) y lanza las
+búsquedas de varios nicks en paralelo desde un pool de hilos
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import quote
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.core.stats_cache import FRESHNESS_FIELDS
+from src.core.resilience import TokenBucket, RetryBudget, CircuitBreaker, EndpointMetrics, hedged_call
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    REQUESTS_AVAILABLE = False
+    log_message("requests no disponible. No se podrán consultar estadísticas.", level='warning')
+
+# urllib3 descomprime brotli si hay un módulo de brotli instalado
+try:
+    import brotli  # noqa: F401
+    BROTLI_AVAILABLE = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        BROTLI_AVAILABLE = True
+    except ImportError:
+        BROTLI_AVAILABLE = False
+
+# Clave de una búsqueda: (nick, sala)
+LookupKey = Tuple[str, str]
+
+# Callback por jugador de un lote: ((nick, sala), estadísticas o None)
+ResultCallback = Callable[[LookupKey, Optional[dict]], None]
+
+# Campos que se piden siempre además de las estadísticas seleccionadas: el
+# nick para el índice de nicks conocidos y los de la política de frescura
+BASE_FIELDS = ("nick",) + FRESHNESS_FIELDS
+
+T = TypeVar("T")
+
+class StatsAPIError(Exception):
+    """Error de comunicación con la API de estadísticas"""
+
+class CircuitOpenError(StatsAPIError):
+    """La API se considera caída y la petición no se ha enviado"""
+
+def is_retryable(error: Exception) -> bool:
+    """True para los fallos transitorios: red, tiempo agotado, 429 y 5xx"""
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else 0
+        return status == 429 or status >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout,
+                              requests.exceptions.ChunkedEncodingError))
+
+def projected_fields(config: dict) -> Optional[List[str]]:
+    """
+    Campos que se piden a la API según stats_seleccionadas
+
+    Returns:
+        Los campos seleccionados más BASE_FIELDS, o None (todos los campos)
+        si la configuración no selecciona ninguno
+    """
+    selected = config.get("stats_seleccionadas") or {}
+    order = config.get("stats_order") or list(selected)
+    fields = [stat for stat in order if selected.get(stat)]
+    if not fields:
+        return None
+    return list(dict.fromkeys([*BASE_FIELDS, *fields]))
+
+class StatsClient:
+    """
+    Cliente de la API de estadísticas
+
+    Todas las peticiones comparten una sesión de requests cuyo adaptador
+    conserva hasta pool_size conexiones abiertas con el servidor, así que
+    solo la primera búsqueda de cada conexión paga el establecimiento TCP y
+    TLS. Las búsquedas concurrentes se ejecutan en un pool de max_workers
+    hilos; si el pool de conexiones está agotado, esperan a que quede una
+    libre en lugar de abrir conexiones de usar y tirar.
+
+    Si se indican fields, solo se piden esos campos de cada jugador. Las
+    respuestas se aceptan comprimidas (gzip, y brotli si está instalado) y
+    los lotes se piden en NDJSON para procesar cada jugador según llega.
+
+    Cada búsqueda pasa por un limitador de peticiones compartido (rate por
+    segundo, ráfagas de burst) y por un cortacircuitos que, tras varios
+    fallos seguidos, hace fallar al instante con CircuitOpenError. Los
+    fallos transitorios se reintentan hasta max_retries veces con espera
+    exponencial aleatoria, dentro de un presupuesto de retry_ratio
+    reintentos por petición. Con hedging, si una petición tarda más que
+    hedge_delay (o que el p95 del endpoint si es 0) se lanza una copia y
+    vale la primera respuesta; las copias gastan del mismo presupuesto.
+    """
+
+    def __init__(self, api_url: str, token: str = "", connect_timeout: float = 3.0,
+                 read_timeout: float = 10.0, pool_size: int = 16, max_workers: int = 16,
+                 fields: Optional[Sequence[str]] = None, rate: float = 20.0, burst: float = 40.0,
+                 max_retries: int = 2, retry_ratio: float = 0.2, breaker_failures: int = 5,
+                 breaker_open_seconds: float = 10.0, hedging: bool = False, hedge_delay: float = 0.0):
+        if not REQUESTS_AVAILABLE:
+            raise RuntimeError("requests no está instalado")
+
+        self.api_url = api_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_workers = max_workers
+        self.fields: Optional[List[str]] = list(fields) if fields else None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate, br" if BROTLI_AVAILABLE else "gzip, deflate",
+            "Connection": "keep-alive",
+            "User-Agent": "PokerBotTRACK",
+        })
+        if token:
+            self.session.headers["Authorization"] = f"Token {token}"
+
+        # None = aún no se sabe si el servidor tiene endpoint de lote
+        self.bulk_supported: Optional[bool] = None
+
+        self.limiter = TokenBucket(rate, burst)
+        self.retry_budget = RetryBudget(retry_ratio)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_open_seconds)
+        self.max_retries = max_retries
+        self.hedging = hedging
+        self.hedge_delay = hedge_delay
+        self.endpoints: Dict[str, EndpointMetrics] = {}
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="StatsClient")
+        self._attempts: Optional[ThreadPoolExecutor] = None
+        if hedging:
+            self._attempts = ThreadPoolExecutor(max_workers=pool_size * 2, thread_name_prefix="StatsAttempt")
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.error_count = 0
+        self.total_latency = 0.0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "StatsClient":
+        """Crea un cliente con los valores de la configuración"""
+        return cls(
+            config.get("api_url", ""),
+            config.get("token", ""),
+            connect_timeout=float(config.get("api_connect_timeout", 3.0)),
+            read_timeout=float(config.get("api_read_timeout", 10.0)),
+            pool_size=int(config.get("api_pool_size", 16)),
+            max_workers=int(config.get("api_pool_size", 16)),
+            fields=projected_fields(config),
+            rate=float(config.get("api_rate_limit", 20)),
+            burst=float(config.get("api_rate_burst", 40)),
+            max_retries=int(config.get("api_max_retries", 2)),
+            retry_ratio=float(config.get("api_retry_ratio", 0.2)),
+            breaker_failures=int(config.get("api_breaker_failures", 5)),
+            breaker_open_seconds=float(config.get("api_breaker_open_s", 10)),
+            hedging=bool(config.get("api_hedge_enabled", False)),
+            hedge_delay=float(config.get("api_hedge_delay_ms", 0)) / 1000.0,
+        )
+
+    def _endpoint(self, name: str) -> EndpointMetrics:
+        with self._lock:
+            if name not in self.endpoints:
+                self.endpoints[name] = EndpointMetrics()
+            return self.endpoints[name]
+
+    def _call(self, endpoint: str, attempt: Callable[[], T]) -> T:
+        """
+        Ejecuta una petición idempotente con limitador, cortacircuitos,
+        reintentos y, si está activo, hedging
+
+        Raises:
+            CircuitOpenError: Si la API se considera caída
+            La excepción del último intento si todos fallan
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("API de estadísticas no disponible (cortacircuitos abierto)")
+        metrics = self._endpoint(endpoint)
+        self.retry_budget.deposit()
+
+        retry = 0
+        while True:
+            if not self.limiter.acquire(timeout=self.timeout[1]):
+                raise StatsAPIError("Límite de peticiones a la API agotado")
+
+            delay = None
+            if self._attempts is not None:
+                delay = self.hedge_delay or metrics.percentile(0.95)
+            started = time.perf_counter()
+            try:
+                if delay:
+                    result = hedged_call(
+                        self._attempts, attempt, delay,
+                        lambda: self.retry_budget.withdraw() and self.limiter.acquire(timeout=0),
+                        metrics,
+                    )
+                else:
+                    result = attempt()
+            except Exception as e:
+                metrics.record(time.perf_counter() - started, False)
+                if not is_retryable(e):
+                    # El servicio ha respondido: no cuenta como caída
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if retry >= self.max_retries or self.breaker.is_open() or not self.retry_budget.withdraw():
+                    raise
+                metrics.count("retries")
+                time.sleep(self.retry_budget.backoff(retry))
+                retry += 1
+                continue
+
+            metrics.record(time.perf_counter() - started, True)
+            self.breaker.record_success()
+            return result
+
+    def player_url(self, nick: str, sala: str) -> str:
+        """URL de las estadísticas de un jugador"""
+        return f"{self.api_url}/jugador/{quote(sala, safe='')}/{quote(nick, safe='')}"
+
+    def fetch_stats(self, nick: str, sala: str) -> Optional[dict]:
+        """
+        Obtiene las estadísticas de un jugador de forma síncrona
+
+        Returns:
+            Diccionario de estadísticas, o None si el jugador no existe
+
+        Raises:
+            StatsAPIError: Si la petición falla o el servidor responde con error
+        """
+        params = {"campos": ",".join(self.fields)} if self.fields else None
+
+        def attempt() -> Optional[dict]:
+            response = self.session.get(self.player_url(nick, sala), params=params, timeout=self.timeout)
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            return response.json()
+
+        started = time.perf_counter()
+        try:
+            return self._call("jugador", attempt)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            with self._lock:
+                self.error_count += 1
+            raise StatsAPIError(f"Error al obtener estadísticas de {nick} ({sala}): {e}") from e
+        finally:
+            with self._lock:
+                self.request_count += 1
+                self.total_latency += time.perf_counter() - started
+
+    def get_stats(self, nick: str, sala: str) -> Optional[dict]:
+        """Como fetch_stats, pero registra el error y devuelve None"""
+        try:
+            return self.fetch_stats(nick, sala)
+        except StatsAPIError as e:
+            log_message(str(e), level='error')
+            return None
+
+    def submit(self, nick: str, sala: str) -> Future:
+        """Lanza una búsqueda en segundo plano; el Future propaga StatsAPIError"""
+        return self._executor.submit(self.fetch_stats, nick, sala)
+
+    def lookup_many(self, keys: Iterable[LookupKey]) -> Dict[LookupKey, Optional[dict]]:
+        """
+        Busca varios jugadores a la vez
+
+        Todas las búsquedas se lanzan antes de esperar la primera respuesta;
+        las claves repetidas se consultan una sola vez.
+
+        Args:
+            keys: Pares (nick, sala)
+
+        Returns:
+            Diccionario (nick, sala) -> estadísticas o None (también si falló)
+        """
+        futures = {key: self.submit(*key) for key in dict.fromkeys(keys)}
+        results = {}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except StatsAPIError as e:
+                log_message(str(e), level='error')
+                results[key] = None
+        return results
+
+    def bulk_url(self) -> str:
+        """URL del endpoint de búsqueda en lote"""
+        return f"{self.api_url}/jugadores/lote"
+
+    def lookup_bulk(self, keys: List[LookupKey], on_result: Optional[ResultCallback] = None
+                    ) -> Optional[Dict[LookupKey, Optional[dict]]]:
+        """
+        Busca varios jugadores con una sola petición al endpoint de lote
+
+        La respuesta se pide en NDJSON (un jugador por línea) y se procesa
+        a medida que llega; si el servidor responde con un único JSON se
+        procesa entero.
+
+        Args:
+            keys: Pares (nick, sala) sin repetir
+            on_result: Se llama con cada jugador en cuanto se recibe
+
+        Returns:
+            Diccionario (nick, sala) -> estadísticas o None, o None si el
+            servidor no tiene endpoint de lote (404/405/501); el cliente lo
+            recuerda en bulk_supported para no volver a intentarlo
+
+        Raises:
+            StatsAPIError: Si la petición falla
+        """
+        if not keys:
+            return {}
+        if self.bulk_supported is False:
+            return None
+
+        payload = {"jugadores": [{"nick": nick, "sala": sala} for nick, sala in keys]}
+        if self.fields:
+            payload["campos"] = self.fields
+        headers = {"Accept": "application/x-ndjson, application/json;q=0.5"}
+
+        # Con reintentos o copias un jugador puede llegar dos veces: se
+        # entrega solo la primera
+        delivered = set()
+        delivered_lock = threading.Lock()
+
+        def deliver(key: LookupKey, stats: Optional[dict]) -> None:
+            with delivered_lock:
+                if key in delivered:
+                    return
+                delivered.add(key)
+            on_result(key, stats)
+
+        def attempt() -> Optional[Dict[LookupKey, Optional[dict]]]:
+            with self.session.post(self.bulk_url(), json=payload, headers=headers,
+                                   timeout=self.timeout, stream=True) as response:
+                if response.status_code >= 400:
+                    # Leer el cuerpo del error para que la conexión vuelva al pool
+                    _ = response.content
+                if response.status_code in (404, 405, 501):
+                    self.bulk_supported = False
+                    log_message("La API no tiene endpoint de lote; se usarán peticiones individuales")
+                    return None
+                response.raise_for_status()
+                self.bulk_supported = True
+
+                if "ndjson" in response.headers.get("Content-Type", ""):
+                    entries = (json.loads(line) for line in response.iter_lines(chunk_size=16384) if line)
+                else:
+                    entries = iter(response.json().get("resultados", []))
+
+                results: Dict[LookupKey, Optional[dict]] = {key: None for key in keys}
+                for entry in entries:
+                    key = (entry.get("nick"), entry.get("sala"))
+                    if key in results:
+                        results[key] = entry.get("stats")
+                        if on_result is not None:
+                            deliver(key, results[key])
+                return results
+
+        started = time.perf_counter()
+        try:
+            return self._call("lote", attempt)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            with self._lock:
+                self.error_count += 1
+            raise StatsAPIError(f"Error en la búsqueda en lote de {len(keys)} jugadores: {e}") from e
+        finally:
+            with self._lock:
+                self.request_count += 1
+                self.total_latency += time.perf_counter() - started
+
+    def subscriptions_url(self, sub_id: str = "") -> str:
+        """URL de las suscripciones, o de una suscripción concreta"""
+        base = f"{self.api_url}/suscripciones"
+        return f"{base}/{quote(sub_id, safe='')}" if sub_id else base
+
+    def open_subscription(self) -> Optional[str]:
+        """
+        Abre una suscripción a cambios de estadísticas
+
+        Returns:
+            Id de la suscripción, o None si el servidor no tiene
+            suscripciones (404/405/501)
+
+        Raises:
+            StatsAPIError: Si la petición falla
+        """
+        try:
+            payload = {"campos": self.fields} if self.fields else {}
+            response = self.session.post(self.subscriptions_url(), json=payload, timeout=self.timeout)
+            if response.status_code in (404, 405, 501):
+                return None
+            response.raise_for_status()
+            return str(response.json()["id"])
+        except Exception as e:
+            raise StatsAPIError(f"Error al abrir la suscripción de estadísticas: {e}") from e
+
+    def update_subscription(self, sub_id: str, add: Iterable[LookupKey] = (),
+                            remove: Iterable[LookupKey] = ()) -> bool:
+        """
+        Da de alta y de baja jugadores en una suscripción
+
+        Returns:
+            False si la suscripción ya no existe en el servidor
+
+        Raises:
+            StatsAPIError: Si la petición falla
+        """
+        payload = {
+            "alta": [{"nick": nick, "sala": sala} for nick, sala in add],
+            "baja": [{"nick": nick, "sala": sala} for nick, sala in remove],
+        }
+        try:
+            response = self.session.post(self.subscriptions_url(sub_id), json=payload, timeout=self.timeout)
+            if response.status_code == 404:
+                return False
+            response.raise_for_status()
+            return True
+        except Exception as e:
+            raise StatsAPIError(f"Error al actualizar la suscripción {sub_id}: {e}") from e
+
+    def poll_changes(self, sub_id: str, cursor: int, wait: float
+                     ) -> Optional[Tuple[int, List[Tuple[LookupKey, Optional[dict]]]]]:
+        """
+        Espera cambios de los jugadores suscritos (long-poll)
+
+        El servidor retiene la petición hasta que hay cambios posteriores a
+        cursor o pasan wait segundos.
+
+        Returns:
+            (nuevo cursor, [((nick, sala), estadísticas)]), o None si la
+            suscripción ya no existe en el servidor
+
+        Raises:
+            StatsAPIError: Si la petición falla
+        """
+        url = f"{self.subscriptions_url(sub_id)}/cambios"
+        timeout = (self.timeout[0], wait + self.timeout[1])
+        try:
+            response = self.session.get(url, params={"cursor": cursor, "espera": wait}, timeout=timeout)
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            data = response.json()
+            changes = [((entry.get("nick"), entry.get("sala")), entry.get("stats"))
+                       for entry in data.get("cambios", [])]
+            return int(data.get("cursor", cursor)), changes
+        except Exception as e:
+            raise StatsAPIError(f"Error al esperar cambios de la suscripción {sub_id}: {e}") from e
+
+    def close_subscription(self, sub_id: str) -> None:
+        """Cierra una suscripción; los errores se ignoran"""
+        try:
+            self.session.delete(self.subscriptions_url(sub_id), timeout=self.timeout)
+        except Exception:
+            pass
+
+    def metrics(self) -> Dict[str, object]:
+        """Contadores de uso del cliente y métricas por endpoint"""
+        with self._lock:
+            average = self.total_latency / self.request_count if self.request_count else 0.0
+            endpoints = dict(self.endpoints)
+            metrics = {
+                "requests": self.request_count,
+                "errors": self.error_count,
+                "avg_latency_ms": round(average * 1000, 1),
+            }
+        metrics.update({
+            "breaker": self.breaker.state,
+            "breaker_rejected": self.breaker.rejected,
+            "retries_denied": self.retry_budget.denied,
+            "rate_limited": self.limiter.waited,
+            "endpoints": {name: m.snapshot() for name, m in endpoints.items()},
+        })
+        return metrics
+
+    def close(self) -> None:
+        """Cierra el pool de hilos y las conexiones abiertas"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._attempts is not None:
+            self._attempts.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+def test_stats_client():
+    """Función de prueba del cliente contra el servidor local"""
+    from src.utils.stub_servers import StatsStubServer
+
+    nicks: List[LookupKey] = [(f"jugador{i}", "XPK") for i in range(40)]
+
+    with StatsStubServer(token="test", latency=0.05, unknown=("jugador7",)) as stub:
+        client = StatsClient(stub.url, "test", pool_size=8, max_workers=40)
+
+        started = time.perf_counter()
+        results = client.lookup_many(nicks)
+        elapsed = time.perf_counter() - started
+
+        found = sum(1 for stats in results.values() if stats)
+        log_message(f"{found}/{len(nicks)} jugadores en {elapsed * 1000:.0f} ms "
+                    f"(secuencial: ~{len(nicks) * stub.latency * 1000:.0f} ms)")
+
+        client.lookup_many(nicks)
+        log_message(f"Peticiones: {stub.requests}, conexiones TCP: {stub.connections}")
+        log_message(f"Métricas: {client.metrics()}")
+        client.close()
+
+if __name__ == "__main__":
+    test_stats_client()
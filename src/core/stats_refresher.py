@@ -0,0 +1,210 @@
+"""
+Planificador de refrescos de la caché de estadísticas
+Reparte un presupuesto de peticiones a la API entre las entradas caducadas,
+empezando por las que más probablemente han cambiado y más importan ahora
+"""
+
+import os
+import sys
+import math
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.core.stats_cache import StatsCache, CacheEntry, CacheKey, FreshnessPolicy, sample_size, CACHE_FRESH
+
+# Tiempo (s) en que se reduce a ~1/3 el interés de un jugador que ya no se ve
+RECENCY_DECAY = 300.0
+
+def refresh_value(entry: CacheEntry, now: float) -> float:
+    """
+    Valor esperado de refrescar una entrada
+
+    Es el producto de tres factores:
+    - probabilidad de que haya cambiado: su tasa de cambio histórica por
+      la fracción de su vida que ha pasado (1 - e^(-edad/vida))
+    - cuánto pueden haberse movido sus números: 1/sqrt(manos + 1)
+    - interés actual: decae exponencialmente desde la última vez que se pidió
+    """
+    life = max(1.0, entry.expires_at - entry.fetched_at)
+    age = max(0.0, now - entry.fetched_at)
+    p_change = FreshnessPolicy.change_rate(entry.checks, entry.changes) * (1 - math.exp(-age / life))
+    magnitude = 1 / math.sqrt(sample_size(entry.stats) + 1)
+    recency = math.exp(-max(0.0, now - entry.last_seen) / RECENCY_DECAY)
+    return p_change * magnitude * recency
+
+class RefreshScheduler:
+    """
+    Refresca las entradas caducadas dentro de un presupuesto de peticiones
+
+    Las entradas pedidas mientras estaban caducadas se apuntan como
+    candidatas. Un hilo gasta budget_per_minute peticiones por minuto (con
+    ráfagas de hasta una sexta parte) en la candidata de mayor valor
+    esperado en cada momento; las que ya se refrescaron por otra vía se
+    descartan sin gastar presupuesto. Si hay más de max_candidates, se
+    olvida la de menor valor.
+
+    Las candidatas están en un montículo con el valor calculado al
+    apuntarlas (o al volver a pedirlas). Como el valor cambia con el tiempo,
+    la cima se recalcula antes de elegirla y, si ya no supera a la
+    siguiente, vuelve al montículo con su valor actual; así cada elección
+    consulta la caché unas pocas veces en lugar de una por candidata. Un
+    segundo montículo ordenado al revés da la candidata que se olvida. Los
+    elementos superados se descartan al salir a la cima, y ambos montículos
+    se reconstruyen cuando duplican a las candidatas vivas.
+
+    Args:
+        cache: Caché de la que se leen las entradas
+        fetch: Función (clave, nick, sala) -> Future que lanza el refresco
+        budget_per_minute: Peticiones de refresco por minuto
+        max_candidates: Candidatas pendientes como máximo
+    """
+
+    def __init__(self, cache: StatsCache, fetch: Callable[[CacheKey, str, str], Future],
+                 budget_per_minute: float = 120, max_candidates: int = 1000):
+        self.cache = cache
+        self.fetch = fetch
+        self.rate = max(0.01, budget_per_minute / 60.0)
+        self.burst = max(1.0, budget_per_minute / 6.0)
+        self.max_candidates = max(1, max_candidates)
+
+        self._candidates: Dict[CacheKey, Tuple[str, str]] = {}
+        self._heap: List[Tuple[float, int, CacheKey]] = []   # (-valor, secuencia, clave)
+        self._low: List[Tuple[float, int, CacheKey]] = []    # (valor, secuencia, clave)
+        self._scores: Dict[CacheKey, Tuple[float, int]] = {}  # clave -> (valor, secuencia vigente)
+        self._sequence = itertools.count()
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._condition = threading.Condition()
+        self._stopping = False
+
+        self.requested = 0
+        self.refreshed = 0
+        self.skipped = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, name="StatsRefresher", daemon=True)
+        self._thread.start()
+
+    def request(self, key: CacheKey, nick: str, sala: str) -> None:
+        """Apunta una entrada caducada como candidata a refresco"""
+        with self._condition:
+            now = time.time()
+            if key in self._candidates:
+                # Volver a pedirla aumenta su interés; si ya estaba apuntada
+                # con un valor igual o mayor no se añade nada al montículo
+                value = self._value(key, now)
+                if value > self._scores[key][0]:
+                    self._push(key, value)
+                return
+            self.requested += 1
+            self._candidates[key] = (nick, sala)
+            self._push(key, self._value(key, now))
+            if len(self._candidates) > self.max_candidates:
+                worst = self._pop_worst()
+                del self._candidates[worst]
+                self.dropped += 1
+            self._condition.notify()
+
+    def stop(self) -> None:
+        """Detiene el planificador; las candidatas pendientes se descartan"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def metrics(self) -> Dict[str, int]:
+        """Contadores del planificador"""
+        with self._condition:
+            return {
+                "requested": self.requested,
+                "refreshed": self.refreshed,
+                "skipped": self.skipped,
+                "dropped": self.dropped,
+                "pending": len(self._candidates),
+            }
+
+    def _value(self, key: CacheKey, now: float) -> float:
+        entry = self.cache.peek(key)
+        return refresh_value(entry, now) if entry is not None else 0.0
+
+    def _push(self, key: CacheKey, value: float) -> None:
+        """Guarda el valor de una candidata; sus elementos anteriores de los montículos caducan"""
+        sequence = next(self._sequence)
+        self._scores[key] = (value, sequence)
+        heapq.heappush(self._heap, (-value, sequence, key))
+        heapq.heappush(self._low, (value, sequence, key))
+
+        # Reconstruir cuando los elementos caducados superan a los vivos
+        if len(self._heap) + len(self._low) > 4 * len(self._scores) + 32:
+            self._heap = [(-value, sequence, key) for key, (value, sequence) in self._scores.items()]
+            self._low = [(value, sequence, key) for key, (value, sequence) in self._scores.items()]
+            heapq.heapify(self._heap)
+            heapq.heapify(self._low)
+
+    def _pop_worst(self) -> CacheKey:
+        """Saca la candidata de menor valor guardado (hay al menos una)"""
+        while True:
+            _, sequence, key = heapq.heappop(self._low)
+            score = self._scores.get(key)
+            if score is not None and score[1] == sequence:
+                del self._scores[key]
+                return key
+
+    def _pop_best(self, now: float) -> Optional[CacheKey]:
+        """Saca del montículo la candidata de mayor valor actual"""
+        while self._heap:
+            _, sequence, key = heapq.heappop(self._heap)
+            score = self._scores.get(key)
+            if score is None or score[1] != sequence:
+                continue  # Descartada o con un valor más reciente en el montículo
+            value = self._value(key, now)
+            if self._heap and value < -self._heap[0][0]:
+                self._push(key, value)
+                continue
+            del self._scores[key]
+            return key
+        return None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _run(self) -> None:
+        """Bucle que gasta el presupuesto en las candidatas más valiosas"""
+        while True:
+            with self._condition:
+                while not self._stopping:
+                    self._refill()
+                    if self._candidates and self._tokens >= 1:
+                        break
+                    timeout = None if not self._candidates else (1 - self._tokens) / self.rate
+                    self._condition.wait(timeout)
+                if self._stopping:
+                    return
+
+                now = time.time()
+                key = self._pop_best(now)
+                if key is None:
+                    self._candidates.clear()
+                    continue
+                nick, sala = self._candidates.pop(key)
+
+                entry = self.cache.peek(key)
+                if entry is None or self.cache.state_of(entry, now) == CACHE_FRESH:
+                    self.skipped += 1
+                    continue
+                self._tokens -= 1
+                self.refreshed += 1
+
+            try:
+                self.fetch(key, nick, sala)
+            except Exception as e:
+                log_message(f"Error al refrescar estadísticas de {nick}: {e}", level='error')
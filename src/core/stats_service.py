@@ -0,0 +1,407 @@
+"""
+Servicio de estadísticas de jugadores
+Punto de entrada único para buscar estadísticas: descarta los nicks
+imposibles y los ya confirmados como inexistentes, responde desde la caché
+cuando puede, deduplica las búsquedas concurrentes del mismo jugador y las
+agrupa en lotes hacia la API
+"""
+
+import os
+import sys
+import time
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.utils.nick_normalizer import lookup_key
+from src.utils.nick_validator import validate_nick
+from src.config.settings import STATS_CACHE_PATH, HISTORY_PATH, POPULATION_PATH
+from src.core.stats_client import StatsClient, StatsAPIError, CircuitOpenError, LookupKey, REQUESTS_AVAILABLE
+from src.core.lookup_batcher import LookupBatcher, PRIORITY_AUTO, PRIORITY_INTERACTIVE
+from src.core.single_flight import SingleFlight
+from src.core.stats_cache import StatsCache, FreshnessPolicy, CacheKey, CACHE_MISS, CACHE_STALE
+from src.core.player_stats import StatsLayout
+from src.core.stats_refresher import RefreshScheduler
+from src.core.negative_cache import NegativeCache
+from src.core.nick_index import NickIndex, nick_index, read_history_nicks
+from src.core.stats_subscription import StatsSubscription
+from src.core.population import PopulationModel
+
+def _completed(result) -> Future:
+    """Future ya resuelto con un resultado"""
+    future: Future = Future()
+    future.set_result(result)
+    return future
+
+def _failed(error: Exception) -> Future:
+    """Future ya resuelto con una excepción"""
+    future: Future = Future()
+    future.set_exception(error)
+    return future
+
+class StatsService:
+    """
+    Búsqueda de estadísticas con caché, deduplicación y agrupación
+
+    Antes de nada, el texto debe pasar las reglas de nick de la sala y la
+    clave no debe estar en la caché negativa (jugadores que la API acaba de
+    confirmar que no existen); si no, se responde None sin tocar la red.
+    Las búsquedas interactivas se saltan la caché negativa.
+
+    Un jugador en caché se responde sin tocar la red. Si su entrada está
+    caducada se entrega igualmente y se apunta en el planificador de
+    refrescos, que la pide según su valor esperado y el presupuesto.
+
+    Las búsquedas simultáneas de la misma clave normalizada (nick, sala)
+    comparten una única petición en curso: un habitual sentado en varias
+    mesas se consulta una sola vez por barrido. Si la petición falla, todos
+    los que esperan reciben el error. Cuando una búsqueda interactiva se
+    une a una automática que aún espera en la ventana de agrupación, esta
+    se adelanta.
+
+    Los jugadores sentados se siguen con una suscripción: sus cambios
+    llegan por long-poll y actualizan la caché, y mientras la suscripción
+    funciona sus entradas caducadas no se refrescan aparte. Con el
+    cortacircuitos del cliente abierto no se pide nada a la API: se sirve
+    lo que haya en caché, aunque haya pasado su margen de caducidad, y si
+    no hay nada se falla al instante con CircuitOpenError. Cada jugador
+    nuevo se suma al modelo de población de su sala.
+    """
+
+    def __init__(self, client: StatsClient, batcher: LookupBatcher, cache: Optional[StatsCache] = None,
+                 refresh_budget: float = 120, negative: Optional[NegativeCache] = None,
+                 index: Optional[NickIndex] = None, push_wait: Optional[float] = None,
+                 population: Optional[PopulationModel] = None):
+        self.client = client
+        self.batcher = batcher
+        self.cache = cache
+        self.negative = negative
+        self.index = index
+        self.population = population
+        self.flights = SingleFlight()
+        self.rejected = 0
+        self.refresher: Optional[RefreshScheduler] = None
+        if cache is not None:
+            self.refresher = RefreshScheduler(
+                cache, lambda key, nick, sala: self._fetch(key, nick, sala, PRIORITY_AUTO), refresh_budget
+            )
+        self.subscription: Optional[StatsSubscription] = None
+        if cache is not None and push_wait:
+            self.subscription = StatsSubscription(client, self._apply_change, push_wait)
+
+    @classmethod
+    def from_config(cls, config: dict, cache_path=STATS_CACHE_PATH,
+                    population_path=POPULATION_PATH) -> "StatsService":
+        """Crea el servicio completo a partir de la configuración"""
+        client = StatsClient.from_config(config)
+        cache = StatsCache(
+            cache_path,
+            max_entries=int(config.get("stats_cache_max_entries", 5000)),
+            policy=FreshnessPolicy.from_config(config),
+            stale_ttl=float(config.get("stats_cache_stale_ttl", 7 * 86400)),
+            layout=StatsLayout.from_config(config),
+        )
+        negative = NegativeCache(
+            ttl=float(config.get("negative_cache_ttl", 600)),
+            capacity=int(config.get("negative_cache_capacity", 20000)),
+        )
+        # Los nicks de la caché en disco y del historial alimentan el índice
+        # de nicks conocidos con el que se corrigen las lecturas del OCR
+        nick_index.load_async([
+            read_history_nicks(HISTORY_PATH, config.get("sala_default", "XPK")),
+            cache.known_nicks(),
+        ])
+        population = PopulationModel.load(population_path, cache.layout.fields,
+                                          int(config.get("population_sketch_k", 200)))
+        push_wait = float(config.get("stats_push_wait", 25)) if config.get("stats_push_enabled", True) else None
+        return cls(client, LookupBatcher.from_config(client, config), cache,
+                   float(config.get("stats_refresh_budget", 120)), negative, nick_index, push_wait,
+                   population)
+
+    def submit(self, nick: str, sala: str, priority: int = PRIORITY_AUTO) -> Future:
+        """
+        Busca un jugador en la caché o lanza su búsqueda
+
+        Returns:
+            Future con las estadísticas o None; propaga StatsAPIError. Los
+            nicks rechazados y los aciertos de caché (frescos, caducados o
+            negativos) se devuelven ya resueltos
+        """
+        if validate_nick(nick, sala) is not None:
+            self.rejected += 1
+            return _completed(None)
+
+        key = lookup_key(nick, sala)
+        if self.negative is not None and priority > PRIORITY_INTERACTIVE and key in self.negative:
+            return _completed(None)
+
+        if self.cache is not None:
+            stats, state = self.cache.get(key)
+            # Una entrada sin alguno de los campos pedidos (se seleccionó
+            # otra estadística después de guardarla) cuenta como fallo
+            if state != CACHE_MISS and self._has_fields(stats):
+                if state == CACHE_STALE and not self._pushed(key) and not self.client.breaker.is_open():
+                    self.refresher.request(key, nick, sala)
+                return _completed(stats)
+
+        if self.client.breaker.is_open():
+            entry = self.cache.peek(key) if self.cache is not None else None
+            if entry is not None:
+                return _completed(entry.stats)
+            return _failed(CircuitOpenError("API de estadísticas no disponible (cortacircuitos abierto)"))
+        return self._fetch(key, nick, sala, priority)
+
+    def _has_fields(self, stats: dict) -> bool:
+        """True si las estadísticas tienen todos los campos que se piden a la API"""
+        fields = self.client.fields
+        return not fields or all(field in stats for field in fields)
+
+    def watch_seated(self, keys: Iterable[LookupKey]) -> None:
+        """Fija los jugadores sentados cuyos cambios se reciben por suscripción"""
+        if self.subscription is not None:
+            self.subscription.set_keys(keys)
+
+    def _pushed(self, key: CacheKey) -> bool:
+        """True si los cambios de la clave llegan por la suscripción"""
+        return self.subscription is not None and self.subscription.covers(key)
+
+    def _apply_change(self, nick: str, sala: str, stats: Optional[dict]) -> None:
+        """Aplica a la caché un cambio recibido por la suscripción"""
+        key = lookup_key(nick, sala)
+        if stats is None:
+            self.cache.invalidate(key)
+        else:
+            self.cache.put(key, stats)
+
+    def get_cached(self, nick: str, sala: str) -> Optional[dict]:
+        """Estadísticas en caché (frescas o caducadas) sin consultar la red"""
+        if self.cache is None:
+            return None
+        stats, _state = self.cache.get(lookup_key(nick, sala))
+        return stats
+
+    def clear_cache(self) -> None:
+        """Vacía la caché en memoria y en disco y la caché negativa"""
+        if self.cache is not None:
+            self.cache.clear()
+        if self.negative is not None:
+            self.negative.clear()
+
+    def _fetch(self, key: CacheKey, nick: str, sala: str, priority: int) -> Future:
+        """Lanza la búsqueda en la API, compartiendo la que ya esté en curso"""
+        future, started, leader = self.flights.submit(
+            key, lambda: self._start(key, nick, sala, priority), (nick, sala)
+        )
+        if not started and priority <= PRIORITY_INTERACTIVE and not future.done():
+            # El agrupador tiene la búsqueda con la grafía de quien la inició
+            self.batcher.promote(*leader)
+        return future
+
+    def _start(self, key: CacheKey, nick: str, sala: str, priority: int) -> Future:
+        future = self.batcher.submit(nick, sala, priority)
+        # Se registra antes que la limpieza del single-flight: quien llegue
+        # después de la respuesta ya la encuentra en la caché
+        future.add_done_callback(lambda done: self._store(key, nick, sala, done))
+        return future
+
+    def _store(self, key: CacheKey, nick: str, sala: str, done: Future) -> None:
+        if done.cancelled() or done.exception() is not None:
+            return
+        stats = done.result()
+        if stats is None:
+            if self.negative is not None:
+                self.negative.add(key)
+            return
+        entry = self.cache.put(key, stats) if self.cache is not None else None
+        if self.population is not None and (entry is None or entry.checks == 1):
+            self.population.observe(sala, stats)
+        if self.index is not None:
+            self.index.add(nick, sala)
+
+    def percentiles(self, sala: str, stats: Optional[dict]) -> Dict[str, float]:
+        """Percentil de cada estadística del jugador en la población de la sala"""
+        if self.population is None or not stats:
+            return {}
+        return self.population.percentiles(sala, stats)
+
+    def lookup(self, nick: str, sala: str, priority: int = PRIORITY_INTERACTIVE) -> Optional[dict]:
+        """Búsqueda síncrona; registra el error y devuelve None si falla"""
+        try:
+            return self.submit(nick, sala, priority).result()
+        except StatsAPIError as e:
+            log_message(str(e), level='error')
+            return None
+
+    def lookup_many(self, keys: Iterable[LookupKey], priority: int = PRIORITY_AUTO) -> Dict[LookupKey, Optional[dict]]:
+        """
+        Busca varios jugadores a la vez
+
+        Returns:
+            Diccionario (nick, sala) -> estadísticas o None (también si falló)
+        """
+        futures = {key: self.submit(key[0], key[1], priority) for key in dict.fromkeys(keys)}
+        results = {}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except StatsAPIError as e:
+                log_message(str(e), level='error')
+                results[key] = None
+        return results
+
+    def metrics(self) -> Dict[str, dict]:
+        """Métricas de cada capa del servicio"""
+        return {
+            "rejected": self.rejected,
+            "negative": self.negative.metrics() if self.negative is not None else {},
+            "cache": self.cache.metrics() if self.cache is not None else {},
+            "refresher": self.refresher.metrics() if self.refresher is not None else {},
+            "subscription": self.subscription.metrics() if self.subscription is not None else {},
+            "population": self.population.metrics() if self.population is not None else {},
+            "client": self.client.metrics(),
+            "batcher": self.batcher.metrics(),
+            "single_flight": {
+                "started": self.flights.started,
+                "collapsed": self.flights.collapsed,
+                "in_flight": self.flights.in_flight(),
+            },
+        }
+
+    def close(self) -> None:
+        """Detiene el agrupador y cierra las conexiones y la caché"""
+        if self.subscription is not None:
+            self.subscription.stop()
+        if self.refresher is not None:
+            self.refresher.stop()
+        self.batcher.stop()
+        self.client.close()
+        if self.cache is not None:
+            self.cache.close()
+        if self.population is not None:
+            self.population.save()
+
+# Servicio compartido por toda la aplicación
+_service: Optional[StatsService] = None
+_service_lock = threading.Lock()
+
+def get_stats_service(config: dict) -> Optional[StatsService]:
+    """Devuelve el servicio compartido, creándolo la primera vez"""
+    global _service
+    with _service_lock:
+        if _service is None and REQUESTS_AVAILABLE:
+            try:
+                _service = StatsService.from_config(config)
+            except Exception as e:
+                log_message(f"Error al crear el servicio de estadísticas: {e}", level='error')
+        return _service
+
+def close_stats_service() -> None:
+    """Cierra el servicio compartido (al salir de la aplicación)"""
+    global _service
+    with _service_lock:
+        if _service is not None:
+            _service.close()
+            _service = None
+
+def test_stats_service():
+    """Función de prueba del servicio contra el servidor local"""
+    import tempfile
+    from src.utils.stub_servers import StatsStubServer
+
+    cache_path = Path(tempfile.mkdtemp()) / "stats_cache.db"
+    population_path = cache_path.with_name("population.json")
+
+    with StatsStubServer(latency=0.05) as stub:
+        service = StatsService.from_config({"api_url": stub.url, "api_batch_window_ms": 20}, cache_path,
+                                           population_path)
+
+        # El mismo habitual leído en cuatro mesas, con variaciones del OCR
+        variants = ["Regular1", "regular1", " Regular1 ", "REGULAR1"]
+        futures = [service.submit(nick, "XPK") for nick in variants]
+        futures += [service.submit(f"jugador{i}", "XPK") for i in range(8)]
+        results = [f.result() for f in futures]
+        log_message(f"Resultados: {sum(1 for r in results if r)}/{len(results)}, "
+                    f"claves enviadas: {sum(stub.batch_sizes)}")
+        log_message(f"Single-flight: {service.metrics()['single_flight']}")
+
+        # Segunda vista del mismo jugador: desde la caché en memoria
+        started = time.perf_counter()
+        for _ in range(1000):
+            service.submit("regular1", "xpk").result()
+        log_message(f"Acierto en memoria: {(time.perf_counter() - started) * 1000:.1f} µs")
+        service.close()
+
+        # Tras un reinicio, desde disco; caducadas a la fuerza, se sirven y se refrescan
+        service = StatsService.from_config({"api_url": stub.url}, cache_path, population_path)
+        keys = [("Regular1", "XPK")] + [(f"jugador{i}", "XPK") for i in range(8)]
+        for nick, sala in keys:
+            entry = service.cache.peek(lookup_key(nick, sala))
+            entry.expires_at = entry.fetched_at = time.time() - 3600
+        requests_before = stub.requests
+        stats = [service.submit(nick, sala).result() for nick, sala in keys]
+        time.sleep(0.3)
+        log_message(f"Tras reiniciar: {sum(1 for s in stats if s)}/{len(keys)} servidas, "
+                    f"refrescadas en {stub.requests - requests_before} peticiones")
+        log_message(f"Planificador: {service.metrics()['refresher']}, caché: {service.metrics()['cache']}")
+        regular = service.get_cached("Regular1", "XPK")
+        log_message(f"Población: {service.metrics()['population']} (los refrescos no suman), "
+                    f"percentiles de Regular1: VPIP {service.percentiles('XPK', regular).get('vpip'):.0f}")
+        service.clear_cache()
+        log_message(f"Tras limpiar: {service.metrics()['cache']}")
+        service.close()
+
+    # Una búsqueda interactiva con otra grafía adelanta la automática pendiente
+    with StatsStubServer(latency=0.01) as stub:
+        service = StatsService.from_config({"api_url": stub.url, "api_batch_window_ms": 500}, None, None)
+        pending = service.submit("Regular2", "XPK")
+        started = time.perf_counter()
+        service.submit("regular2", "XPK", PRIORITY_INTERACTIVE).result()
+        log_message(f"Interactiva unida a una automática: {(time.perf_counter() - started) * 1000:.0f} ms "
+                    f"(ventana automática 500 ms), misma petición: {pending.done()}")
+        service.close()
+
+    # Jugadores sentados: sus cambios llegan por la suscripción
+    with StatsStubServer() as stub:
+        service = StatsService.from_config({"api_url": stub.url, "stats_push_wait": 2}, None, None)
+        seated = [(f"sentado{i}", "XPK") for i in range(6)]
+        service.lookup_many(seated)
+        service.watch_seated(seated)
+        time.sleep(0.3)
+        requests_before = stub.requests
+        stub.update_player("sentado2", "XPK", {"nick": "sentado2", "vpip": 99, "total_manos": 1234})
+        stub.update_player("ajeno", "XPK", {"vpip": 1})
+        time.sleep(0.3)
+        log_message(f"Tras el cambio: vpip={service.get_cached('sentado2', 'XPK')['vpip']}, "
+                    f"peticiones: {stub.requests - requests_before}, "
+                    f"suscripción: {service.metrics()['subscription']}")
+        service.watch_seated(seated[:2])
+        time.sleep(0.3)
+        log_message(f"Tras levantarse cuatro: {service.metrics()['subscription']}")
+        service.close()
+
+    # Basura del OCR y jugadores inexistentes no repiten la petición
+    with StatsStubServer(latency=0.01, unknown=("Fantasma",)) as stub:
+        service = StatsService.from_config({"api_url": stub.url}, None, None)
+        for nick in ["||||", "a", "Иванabc王", "Fantasma"]:
+            service.submit(nick, "XPK").result()
+        requests_before = stub.requests
+        for _ in range(100):
+            service.submit("Fantasma", "XPK").result()
+        log_message(f"Rechazados: {service.rejected}, peticiones repetidas para un inexistente: "
+                    f"{stub.requests - requests_before}, caché negativa: {service.metrics()['negative']}")
+        service.close()
+
+    # Los fallos llegan a todos los que esperan
+    with StatsStubServer(latency=0.05, token="otro") as stub:
+        service = StatsService.from_config({"api_url": stub.url, "token": "malo"}, None, None)
+        futures = [service.submit("Regular1", "XPK") for _ in range(3)]
+        errors = sum(1 for f in futures if f.exception() is not None)
+        log_message(f"Errores propagados: {errors}/3, peticiones: {stub.requests}")
+        service.close()
+
+if __name__ == "__main__":
+    test_stats_service()
@@ -0,0 +1,202 @@
+"""
+Suscripción a cambios de estadísticas
+Mantiene en el servidor la lista de jugadores sentados y recibe por
+long-poll solo las estadísticas que cambian, en lugar de volver a pedir
+periódicamente las de todos
+"""
+
+import os
+import sys
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.utils.nick_normalizer import lookup_key
+from src.core.stats_client import StatsClient, StatsAPIError, LookupKey
+from src.core.stats_cache import CacheKey
+
+# Callback de cambios: (nick, sala, estadísticas o None si el jugador ya no existe)
+ChangeCallback = Callable[[str, str, Optional[dict]], None]
+
+class StatsSubscription:
+    """
+    Suscripción de long-poll a los cambios de los jugadores sentados
+
+    set_keys fija el conjunto de jugadores que interesan; un hilo de control
+    abre la suscripción en el servidor y le envía solo las altas y bajas
+    respecto a lo ya suscrito, y un hilo de sondeo espera los cambios
+    (el servidor retiene cada petición hasta wait segundos) y los entrega a
+    on_change. Si el servidor pierde la suscripción se abre otra y se
+    vuelven a dar de alta todos. Si el servidor no tiene suscripciones, los
+    hilos terminan y supported queda en False.
+
+    Args:
+        client: Cliente de la API
+        on_change: Callback por cada jugador cambiado
+        wait: Segundos que el servidor puede retener cada sondeo
+        retry_delay: Espera tras un error de red antes de reintentar
+    """
+
+    def __init__(self, client: StatsClient, on_change: ChangeCallback,
+                 wait: float = 25.0, retry_delay: float = 5.0):
+        self.client = client
+        self.on_change = on_change
+        self.wait = wait
+        self.retry_delay = retry_delay
+
+        self._desired: Dict[CacheKey, LookupKey] = {}
+        self._subscribed: Dict[CacheKey, LookupKey] = {}
+        self._sub_id: Optional[str] = None
+        self._cursor = 0
+        self._healthy = False
+        self._stopping = False
+        self._condition = threading.Condition()
+
+        # None = aún no se sabe si el servidor tiene suscripciones
+        self.supported: Optional[bool] = None
+        self.updates = 0
+        self.polls = 0
+        self.pushed = 0
+        self.reopened = 0
+
+        self._control = threading.Thread(target=self._run_control, name="StatsSubscription", daemon=True)
+        self._poller = threading.Thread(target=self._run_poll, name="StatsSubscriptionPoll", daemon=True)
+        self._control.start()
+        self._poller.start()
+
+    def set_keys(self, keys: Iterable[LookupKey]) -> None:
+        """Fija los jugadores (nick, sala) de los que se quieren recibir cambios"""
+        desired = {lookup_key(nick, sala): (nick, sala) for nick, sala in keys}
+        with self._condition:
+            self._desired = desired
+            self._condition.notify_all()
+
+    def covers(self, key: CacheKey) -> bool:
+        """True si los cambios de la clave llegan por la suscripción"""
+        with self._condition:
+            return self._healthy and key in self._subscribed
+
+    def stop(self) -> None:
+        """Detiene los hilos y cierra la suscripción en el servidor"""
+        with self._condition:
+            self._stopping = True
+            sub_id = self._sub_id
+            self._condition.notify_all()
+        self._control.join()
+        # El sondeo en curso puede tardar hasta wait segundos en volver
+        self._poller.join(timeout=1.0)
+        if sub_id:
+            self.client.close_subscription(sub_id)
+
+    def metrics(self) -> Dict[str, int]:
+        """Contadores de la suscripción"""
+        with self._condition:
+            return {
+                "subscribed": len(self._subscribed),
+                "desired": len(self._desired),
+                "updates": self.updates,
+                "polls": self.polls,
+                "pushed": self.pushed,
+                "reopened": self.reopened,
+            }
+
+    def _idle(self) -> bool:
+        """True si el servidor ya refleja los jugadores deseados (con el bloqueo tomado)"""
+        if self.supported is False:
+            return True
+        if self._sub_id is None:
+            return not self._desired
+        return self._desired.keys() == self._subscribed.keys()
+
+    def _lost(self, sub_id: str) -> None:
+        """Olvida una suscripción que el servidor ya no tiene (con el bloqueo tomado)"""
+        if self._sub_id == sub_id:
+            self._sub_id = None
+            self._subscribed = {}
+            self._healthy = False
+            self.reopened += 1
+            self._condition.notify_all()
+
+    def _run_control(self) -> None:
+        """Bucle que abre la suscripción y envía altas y bajas"""
+        while True:
+            with self._condition:
+                while not self._stopping and self._idle():
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                sub_id = self._sub_id
+                add = {k: v for k, v in self._desired.items() if k not in self._subscribed}
+                remove = {k: v for k, v in self._subscribed.items() if k not in self._desired}
+
+            try:
+                if sub_id is None:
+                    sub_id = self.client.open_subscription()
+                    with self._condition:
+                        if sub_id is None:
+                            self.supported = False
+                            log_message("La API no tiene suscripciones; se mantiene el refresco periódico")
+                            return
+                        self.supported = True
+                        self._sub_id = sub_id
+                        self._cursor = 0
+                        self._condition.notify_all()
+                    continue
+
+                if not self.client.update_subscription(sub_id, add.values(), remove.values()):
+                    with self._condition:
+                        self._lost(sub_id)
+                    continue
+                with self._condition:
+                    if self._sub_id == sub_id:
+                        self._subscribed.update(add)
+                        for key in remove:
+                            self._subscribed.pop(key, None)
+                        # El servidor ya sigue estas claves; un error de
+                        # sondeo lo desmiente hasta el siguiente sondeo bueno
+                        self._healthy = True
+                        self.updates += 1
+                        self._condition.notify_all()
+            except StatsAPIError as e:
+                log_message(str(e), level='error')
+                with self._condition:
+                    self._condition.wait(self.retry_delay)
+
+    def _run_poll(self) -> None:
+        """Bucle de long-poll que entrega los cambios recibidos"""
+        while True:
+            with self._condition:
+                while not self._stopping and self.supported is not False and \
+                        (self._sub_id is None or not self._subscribed):
+                    self._condition.wait()
+                if self._stopping or self.supported is False:
+                    return
+                sub_id, cursor = self._sub_id, self._cursor
+
+            try:
+                result = self.client.poll_changes(sub_id, cursor, self.wait)
+            except StatsAPIError as e:
+                log_message(str(e), level='error')
+                with self._condition:
+                    self._healthy = False
+                    self._condition.wait(self.retry_delay)
+                continue
+
+            with self._condition:
+                self.polls += 1
+                if result is None:
+                    self._lost(sub_id)
+                    continue
+                if self._sub_id != sub_id:
+                    continue
+                self._cursor, changes = result
+                self._healthy = True
+                self.pushed += len(changes)
+
+            for (nick, sala), stats in changes:
+                try:
+                    self.on_change(nick, sala, stats)
+                except Exception as e:
+                    log_message(f"Error al aplicar el cambio de {nick}: {e}", level='error')
@@ -0,0 +1,194 @@
+"""
+Pipeline de análisis de mesas
+Captura de asientos -> OCR en procesos -> búsqueda de estadísticas -> interfaz,
+construido sobre las etapas de src.core.pipeline. El planificador del modo
+automático lo alimenta con un TableWork por mesa
+"""
+
+import os
+import sys
+import time
+import numpy as np
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.utils.windows import capture_window_array
+from src.core.change_detector import get_seat_rects, seats_capture_rect
+from src.core.pipeline import Pipeline, Stage, POLICY_MERGE
+from src.utils.nick_normalizer import clean_display_nick
+from src.core.nick_index import resolve_ocr_nick
+from src.core.player_classifier import PlayerProfile, classify_many
+
+# Búsqueda de estadísticas en bloque: [(nick, sala)] -> {(nick, sala): estadísticas o None}
+StatsLookup = Callable[[List[Tuple[str, str]]], Dict[Tuple[str, str], Optional[dict]]]
+
+class TableWork:
+    """Trabajo de una mesa que recorre el pipeline"""
+
+    def __init__(self, hwnd: int, seats: Optional[List[int]] = None):
+        self.hwnd = hwnd
+        self.seats = seats                      # None = todos los asientos
+        self.created = time.monotonic()
+        self.images: Dict[int, np.ndarray] = {}
+        self.nicks: Dict[int, str] = {}
+        self.confidences: Dict[int, float] = {}
+        self.stats: Dict[int, dict] = {}
+        self.profiles: Dict[int, PlayerProfile] = {}
+
+def merge_table_work(pending: TableWork, new: TableWork) -> TableWork:
+    """Fusiona dos trabajos pendientes de la misma mesa"""
+    if pending.seats is None or new.seats is None:
+        new.seats = None
+    else:
+        new.seats = sorted(set(pending.seats) | set(new.seats))
+    # Conservar lo ya capturado o leído de los asientos que el nuevo no trae
+    for seat, image in pending.images.items():
+        if seat not in new.images:
+            new.images[seat] = image
+    for seat, nick in pending.nicks.items():
+        if seat not in new.nicks:
+            new.nicks[seat] = nick
+            new.confidences[seat] = pending.confidences.get(seat, 1.0)
+    return new
+
+def capture_seats(work: TableWork, seat_rects: List[tuple]) -> Optional[TableWork]:
+    """
+    Etapa de captura: recorta los asientos pedidos
+
+    Los recortes se copian y el búfer del pool se libera enseguida, de modo
+    que un OCR lento no retiene búferes de captura.
+    """
+    frame = capture_window_array(work.hwnd, seats_capture_rect(seat_rects))
+    if frame is None:
+        return None
+
+    try:
+        seats = range(len(seat_rects)) if work.seats is None else work.seats
+        for seat in seats:
+            if not 0 <= seat < len(seat_rects):
+                continue
+            x, y, width, height = seat_rects[seat]
+            work.images[seat] = np.ascontiguousarray(frame.array[y:y + height, x:x + width])
+    finally:
+        frame.release()
+
+    return work if work.images else None
+
+def ocr_seats(work: TableWork, lang: str = "ch", save_debug: bool = False) -> TableWork:
+    """
+    Etapa de OCR: reconoce el nick de cada recorte
+
+    Se ejecuta en un proceso aparte; importa el motor OCR de forma diferida
+    para que cada proceso cree sus propias instancias.
+    """
+    from src.core.ocr_engine import recognize_frame
+
+    for seat, image in work.images.items():
+        text, confidence = recognize_frame(image, lang, True, save_debug)
+        work.nicks[seat] = clean_display_nick(text)
+        work.confidences[seat] = confidence
+
+    # Las imágenes no viajan más allá del OCR
+    work.images = {}
+    return work
+
+def lookup_stats(work: TableWork, lookup: Optional[StatsLookup], sala: str) -> TableWork:
+    """
+    Etapa de consulta: busca a la vez las estadísticas de todos los nicks leídos
+
+    Antes corrige las lecturas de baja confianza con el índice de nicks
+    conocidos, que vive en el proceso principal. Después clasifica a todos
+    los jugadores de la mesa con el clasificador local en una sola llamada.
+    Sin lookup solo se corrigen los nicks.
+    """
+    for seat, nick in work.nicks.items():
+        work.nicks[seat] = resolve_ocr_nick(nick, work.confidences.get(seat, 1.0), sala)
+
+    seats = {seat: nick for seat, nick in work.nicks.items() if nick and seat not in work.stats}
+    if lookup is None or not seats:
+        return work
+
+    try:
+        results = lookup([(nick, sala) for nick in seats.values()])
+    except Exception as e:
+        log_message(f"Error al buscar estadísticas de la mesa {work.hwnd}: {e}", level='error')
+        return work
+
+    for seat, nick in seats.items():
+        stats = results.get((nick, sala))
+        if stats is not None:
+            work.stats[seat] = stats
+
+    seats_with_stats = sorted(work.stats)
+    for seat, profile in zip(seats_with_stats, classify_many([work.stats[s] for s in seats_with_stats])):
+        work.profiles[seat] = profile
+    return work
+
+def build_table_pipeline(config: dict, sink: Callable[[TableWork], None],
+                         lookup: Optional[StatsLookup] = None,
+                         ocr_processes: int = 0, lookup_threads: int = 4,
+                         on_discard: Optional[Callable[[TableWork], None]] = None) -> Pipeline:
+    """
+    Construye el pipeline de análisis de mesas
+
+    Todas las colas fusionan por hwnd: si una etapa se retrasa, los trabajos
+    pendientes de una mesa se sustituyen por el más reciente en lugar de
+    acumularse, y los que superan auto_check_interval se descartan.
+
+    Args:
+        config: Configuración de la aplicación
+        sink: Recibe cada TableWork terminado (p. ej. el emit de una señal Qt)
+        lookup: Búsqueda en bloque (p. ej. StatsService.lookup_many); None
+            = la etapa de consulta solo corrige los nicks
+        ocr_processes: Procesos de OCR; 0 = según el número de CPUs
+        lookup_threads: Hilos de consulta (E/S)
+        on_discard: Recibe cada TableWork que no llega a sink
+
+    Returns:
+        Pipeline sin arrancar
+    """
+    seat_rects = get_seat_rects(config)
+    lang = config.get("idioma_ocr", "ch")
+    save_debug = config.get("guardar_capturas_debug", False)
+    max_age = float(config.get("auto_check_interval", 30))
+    if ocr_processes <= 0:
+        ocr_processes = max(1, min(4, (os.cpu_count() or 2) // 2))
+
+    by_table = dict(policy=POLICY_MERGE, key=lambda work: work.hwnd,
+                    merge=merge_table_work, max_age=max_age)
+
+    stages = [
+        Stage("captura", partial(capture_seats, seat_rects=seat_rects),
+              workers=2, queue_size=32, **by_table),
+        Stage("ocr", partial(ocr_seats, lang=lang, save_debug=save_debug),
+              workers=ocr_processes, mode="process", queue_size=ocr_processes * 2, **by_table),
+        Stage("consulta", partial(lookup_stats, lookup=lookup, sala=config.get("sala_default", "XPK")),
+              workers=lookup_threads, queue_size=32, **by_table),
+    ]
+
+    return Pipeline(stages, sink, on_discard)
+
+def test_table_pipeline():
+    """Prueba la fusión de trabajos parciales de una mesa en la cola del OCR"""
+    from src.config.settings import DEFAULT_CONFIG
+
+    pipeline = build_table_pipeline(DEFAULT_CONFIG, sink=lambda work: None, ocr_processes=1)
+    ocr_queue = pipeline.stages[1].queue
+
+    first = TableWork(1, [0])
+    first.images[0] = np.zeros((20, 80, 4), dtype=np.uint8)
+    second = TableWork(1, [2])
+    second.images[2] = np.ones((20, 80, 4), dtype=np.uint8)
+    ocr_queue.put(first)
+    ocr_queue.put(second)
+
+    merged = ocr_queue.get()
+    complete = merged.seats == [0, 2] and sorted(merged.images) == [0, 2]
+    log_message(f"En cola: {len(ocr_queue)}, fusionados: {ocr_queue.merged}, asientos {merged.seats}, "
+                f"recortes {sorted(merged.images)} -> {'correcto' if complete else 'FALTAN RECORTES'}")
+
+if __name__ == "__main__":
+    test_table_pipeline()
@@ -0,0 +1,135 @@
+"""
+Registro incremental de mesas de poker abiertas
+Mantiene las mesas conocidas por hwnd y solo reclasifica las ventanas nuevas
+o cuyo título ha cambiado, emitiendo eventos de alta, baja y cambio de título
+"""
+
+import os
+import sys
+import time
+import threading
+from typing import Dict, List, Tuple, Optional
+from PySide6.QtCore import QThread, Signal
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.utils.capture_backends import get_capture_backend
+from src.utils.table_classifier import classify_title, TableInfo
+
+class TableRegistry(QThread):
+    """
+    Registro de mesas que enumera las ventanas en segundo plano
+
+    El hilo recorre las ventanas cada scan_interval segundos (o antes si se
+    llama a request_scan) y compara con el estado anterior. Las señales se
+    emiten desde el hilo del registro; Qt las entrega en el hilo del
+    receptor, por lo que la interfaz puede conectarlas directamente.
+    """
+
+    tableAdded = Signal(int, str)       # hwnd, título
+    tableRemoved = Signal(int)          # hwnd
+    tableRetitled = Signal(int, str)    # hwnd, nuevo título
+    scanCompleted = Signal(int)         # número de mesas tras el escaneo
+
+    def __init__(self, scan_interval: float = 1.0, parent=None):
+        super().__init__(parent)
+        self.scan_interval = scan_interval
+        self._windows: Dict[int, str] = {}
+        self._tables: Dict[int, Tuple[str, TableInfo]] = {}
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self.last_scan_time = 0.0
+
+    def tables(self) -> List[Tuple[int, str]]:
+        """Mesas conocidas como (hwnd, title), ordenadas por título"""
+        with self._lock:
+            tables = [(hwnd, title) for hwnd, (title, _) in self._tables.items()]
+        tables.sort(key=lambda x: x[1])
+        return tables
+
+    def table_info(self, hwnd: int) -> Optional[TableInfo]:
+        """Metadatos de una mesa conocida"""
+        with self._lock:
+            entry = self._tables.get(hwnd)
+        return entry[1] if entry else None
+
+    def request_scan(self) -> None:
+        """Pide un escaneo inmediato sin esperar al siguiente ciclo"""
+        self._wake_event.set()
+
+    def stop(self) -> None:
+        """Detiene el hilo y espera a que termine"""
+        self._stop_event.set()
+        self._wake_event.set()
+        self.wait()
+
+    def scan(self) -> Tuple[List[Tuple[int, str]], List[int], List[Tuple[int, str]]]:
+        """
+        Enumera las ventanas y actualiza el registro
+
+        Returns:
+            Tupla (añadidas, eliminadas, retituladas)
+        """
+        started = time.perf_counter()
+        try:
+            windows = get_capture_backend().list_windows()
+        except Exception as e:
+            log_message(f"Error al enumerar ventanas: {e}", level='error')
+            return [], [], []
+
+        added, removed, retitled = [], [], []
+        current = {}
+
+        with self._lock:
+            for hwnd, title in windows:
+                current[hwnd] = title
+
+                # Solo se clasifican las ventanas nuevas o con título distinto
+                if self._windows.get(hwnd) == title:
+                    continue
+
+                info = classify_title(title)
+                was_table = hwnd in self._tables
+
+                if info.is_table:
+                    self._tables[hwnd] = (title, info)
+                    if was_table:
+                        retitled.append((hwnd, title))
+                    else:
+                        added.append((hwnd, title))
+                elif was_table:
+                    del self._tables[hwnd]
+                    removed.append(hwnd)
+
+            # Mesas cuyas ventanas ya no existen
+            for hwnd in list(self._tables):
+                if hwnd not in current:
+                    del self._tables[hwnd]
+                    removed.append(hwnd)
+
+            self._windows = current
+            table_count = len(self._tables)
+
+        self.last_scan_time = time.perf_counter() - started
+
+        for hwnd, title in added:
+            self.tableAdded.emit(hwnd, title)
+        for hwnd in removed:
+            self.tableRemoved.emit(hwnd)
+        for hwnd, title in retitled:
+            self.tableRetitled.emit(hwnd, title)
+        self.scanCompleted.emit(table_count)
+
+        if added or removed:
+            log_message(f"Mesas: +{len(added)} -{len(removed)} (total {table_count})")
+
+        return added, removed, retitled
+
+    def run(self):
+        """Bucle de enumeración"""
+        while not self._stop_event.is_set():
+            self.scan()
+            self._wake_event.wait(self.scan_interval)
+            self._wake_event.clear()
@@ -417,6 +417,9 @@ class MainWindow(QMainWindow):
         )
         
         if reply == QMessageBox.Yes:
+            # Detener hilos en segundo plano
+            self.main_tab.shutdown()
+            
             # Guardar configuración antes de cerrar
             save_config(self.config)
             event.accept()
@@ -8,20 +8,30 @@ import sys
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, 
     QComboBox, QTableWidget, QTableWidgetItem, QCheckBox, 
-    QFrame, QHeaderView, QSizePolicy, QMessageBox, QSpacerItem
+    QFrame, QHeaderView, QSizePolicy, QMessageBox, QSpacerItem, QCompleter
 )
-from PySide6.QtCore import Qt, Signal, Slot, QTimer, QSize
+from PySide6.QtCore import Qt, Signal, Slot, QTimer, QSize, QStringListModel
 from PySide6.QtGui import QIntValidator, QIcon, QPixmap
 
 # Añadir directorio raíz al path para importaciones
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..')))
 from src.utils.logger import log_message
 from src.config.settings import load_config, save_config
-from src.utils.windows import find_poker_tables, get_window_under_cursor
+from src.utils.windows import get_window_under_cursor
+from src.core.table_registry import TableRegistry
+from src.core.auto_scheduler import AutoModeScheduler
+from src.core.change_detector import SeatChangeWatcher
+from src.core.stats_service import get_stats_service
+from src.core.lookup_batcher import PRIORITY_INTERACTIVE
+from src.core.nick_suggester import NickSuggester
+from src.core.stats_cache import sample_size
+from src.core.player_classifier import classify
+from src.core.player_analysis import AnalysisCancelled, CancelToken, get_player_analyzer
 from src.ui.widgets.card_widget import CardWidget
 from src.ui.widgets.modern_button import ModernButton
 from src.ui.widgets.status_indicator import StatusIndicator
 from src.ui.widgets.toast_notification import ToastManager
+from src.ui.widgets.streaming_text import StreamingTextView
 from src.ui.styles.theme import get_color
 
 class MainTab(QWidget):
@@ -30,6 +40,8 @@ class MainTab(QWidget):
     # Señales
     analyzeRequested = Signal(str, str, bool)  # nick, sala, is_manual
     autoModeToggled = Signal(bool)            # estado del modo automático
+    statsReady = Signal(str, str, object)     # nick, sala, estadísticas o None
+    analysisFinished = Signal(object, str)    # token del análisis, nota final
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -40,13 +52,45 @@ class MainTab(QWidget):
         
         # Estado del modo automático
         self.auto_mode_active = False
+        self.auto_scheduler = None
+        self.seat_watcher = None
         
         # Gestor de notificaciones
         self.toast_manager = ToastManager(self)
         
+        # Filas de la tabla de mesas por hwnd
+        self.table_items = {}
+        self.manual_refresh_pending = False
+        
+        # Nicks sentados por mesa en modo automático
+        self.seated_nicks = {}
+        
+        # Autocompletado de nicks en segundo plano
+        self.nick_suggester = NickSuggester(limit=self.config.get("autocomplete_max_results", 10))
+        self.nick_suggester.suggestionsReady.connect(self.on_suggestions_ready)
+        self.nick_suggester.start()
+        self.statsReady.connect(self.on_stats_ready)
+        self.analysisFinished.connect(self.on_analysis_finished)
+        
+        # Análisis en curso (se cancela al cambiar de mesa)
+        self.analysis_token = None
+        
+        # El servicio de estadísticas carga el índice de nicks conocidos
+        get_stats_service(self.config)
+        
         # Crear UI
         self.setup_ui()
         
+        # Registro de mesas con enumeración en segundo plano
+        self.table_registry = TableRegistry(self.config.get("table_scan_interval_ms", 1000) / 1000.0)
+        self.table_registry.tableAdded.connect(self.add_table_row)
+        self.table_registry.tableRemoved.connect(self.remove_table_row)
+        self.table_registry.tableRetitled.connect(self.update_table_row)
+        self.table_registry.tableAdded.connect(self.sync_auto_tables)
+        self.table_registry.tableRemoved.connect(self.sync_auto_tables)
+        self.table_registry.scanCompleted.connect(self.on_tables_scanned)
+        self.table_registry.start()
+        
         # Actualizar estado inicial
         self.update_auto_mode_ui()
         
@@ -101,6 +145,21 @@ class MainTab(QWidget):
         self.nick_input.returnPressed.connect(self.on_search_clicked)
         search_layout.addWidget(self.nick_input)
         
+        # Sugerencias: las calcula el hilo de autocompletado, así que el
+        # completer no filtra y solo muestra la lista recibida
+        self.suggestion_model = QStringListModel(self)
+        self.nick_completer = QCompleter(self.suggestion_model, self)
+        self.nick_completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.nick_completer.setWidget(self.nick_input)
+        self.nick_completer.activated[str].connect(self.on_suggestion_picked)
+        
+        # Antirrebote: la consulta sale cuando se deja de escribir
+        self.suggest_timer = QTimer(self)
+        self.suggest_timer.setSingleShot(True)
+        self.suggest_timer.setInterval(self.config.get("autocomplete_debounce_ms", 60))
+        self.suggest_timer.timeout.connect(self.request_suggestions)
+        self.nick_input.textEdited.connect(lambda _text: self.suggest_timer.start())
+        
         # Selector de sala
         search_layout.addWidget(QLabel("Sala:"))
         self.room_combo = QComboBox()
@@ -116,6 +175,16 @@ class MainTab(QWidget):
         # Añadir layout al contenido de la tarjeta
         search_card.content_layout.addLayout(search_layout)
         
+        # Análisis del último jugador buscado, que se escribe según llega
+        self.analysis_label = QLabel()
+        self.analysis_label.setStyleSheet(f"color: {get_color('text_secondary')}; font-weight: bold;")
+        self.analysis_view = StreamingTextView(self)
+        self.analysis_view.setMaximumHeight(120)
+        self.analysis_label.hide()
+        self.analysis_view.hide()
+        search_card.content_layout.addWidget(self.analysis_label)
+        search_card.content_layout.addWidget(self.analysis_view)
+        
         # Añadir tarjeta al layout principal
         parent_layout.addWidget(search_card)
     
@@ -125,14 +194,17 @@ class MainTab(QWidget):
         tables_card = CardWidget(title="Mesas Detectadas", parent=self)
         
         # Tabla de mesas
-        self.tables_table = QTableWidget(0, 2)
-        self.tables_table.setHorizontalHeaderLabels(["ID", "Título"])
+        self.tables_table = QTableWidget(0, 3)
+        self.tables_table.setHorizontalHeaderLabels(["ID", "Título", "Jugadores"])
         self.tables_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
         self.tables_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.tables_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
         self.tables_table.setEditTriggers(QTableWidget.NoEditTriggers)
         self.tables_table.setSelectionBehavior(QTableWidget.SelectRows)
         self.tables_table.setSelectionMode(QTableWidget.SingleSelection)
         self.tables_table.setAlternatingRowColors(True)
+        # Cambiar de mesa cancela el análisis en curso: nadie lo está mirando
+        self.tables_table.itemSelectionChanged.connect(self.cancel_analysis)
         self.tables_table.setStyleSheet(f"""
             QTableView {{
                 border: 1px solid {get_color('border')};
@@ -327,51 +399,225 @@ class MainTab(QWidget):
         # Notificar al usuario
         self.parent.set_status(f"Buscando {nick} en {sala}...")
         
-        # En esta etapa simplemente mostramos un mensaje con el toast, 
-        # en la siguiente etapa enviaremos la señal analyzeRequested
         self.toast_manager.info(
             "Búsqueda iniciada", 
             f"Buscando '{nick}' en '{sala}'"
         )
         
-        # Simular proceso
-        QTimer.singleShot(1500, lambda: self.parent.set_status("Listo"))
+        self.lookup_nick(nick, sala)
+    
+    def request_suggestions(self):
+        """Pide sugerencias para el texto actual del buscador"""
+        text = self.nick_input.text().strip()
+        if not text:
+            self.nick_completer.popup().hide()
+            return
+        self.nick_suggester.request(text, self.room_combo.currentText())
+    
+    @Slot(str, str, list)
+    def on_suggestions_ready(self, text, sala, suggestions):
+        """Muestra las sugerencias si siguen correspondiendo al texto escrito"""
+        if text != self.nick_input.text().strip() or sala != self.room_combo.currentText():
+            return
+        self.suggestion_model.setStringList(suggestions)
+        if suggestions:
+            self.nick_completer.complete()
+        else:
+            self.nick_completer.popup().hide()
+    
+    @Slot(str)
+    def on_suggestion_picked(self, nick):
+        """Busca el nick elegido entre las sugerencias"""
+        self.suggest_timer.stop()
+        self.nick_input.setText(nick)
+        self.on_search_clicked()
+    
+    def lookup_nick(self, nick, sala):
+        """Busca las estadísticas de un nick, primero en la caché"""
+        service = get_stats_service(self.config)
+        if not service:
+            self.toast_manager.error(
+                "Servicio no disponible",
+                "No se pudo acceder al servicio de estadísticas"
+            )
+            self.parent.set_status("Listo")
+            return
+        
+        def deliver(future):
+            try:
+                stats = future.result()
+            except Exception as e:
+                log_message(f"Error al buscar {nick}: {e}", level='error')
+                stats = None
+            try:
+                # Se emite desde el hilo que resolvió la búsqueda; Qt lo
+                # entrega en el hilo de la interfaz
+                self.statsReady.emit(nick, sala, stats)
+            except RuntimeError:
+                pass  # La pestaña ya se ha destruido
+        
+        service.submit(nick, sala, PRIORITY_INTERACTIVE).add_done_callback(deliver)
+    
+    @Slot(str, str, object)
+    def on_stats_ready(self, nick, sala, stats):
+        """Informa del resultado de una búsqueda manual"""
+        self.parent.set_status("Listo")
+        if stats is None:
+            self.toast_manager.warning(
+                "Jugador no encontrado",
+                f"No hay estadísticas de '{nick}' en '{sala}'"
+            )
+            return
+        
+        message = f"'{nick}' en '{sala}': {sample_size(stats)} manos"
+        if self.config.get("mostrar_analisis", True):
+            # Clasificación local inmediata; el análisis completo la sustituirá
+            profile = classify(stats)
+            message += f"\n{profile.etiqueta}: {profile.motivo}"
+            self.request_analysis(nick, sala, stats)
+        ranks = self.population_ranks(sala, stats)
+        if ranks:
+            message += "\n" + " · ".join(ranks[:4])
+        self.toast_manager.success("Estadísticas encontradas", message)
+    
+    def request_analysis(self, nick, sala, stats):
+        """
+        Pide en segundo plano el análisis completo del jugador (de la caché si
+        lo hay) y lo va escribiendo en el panel según llega
+        """
+        analyzer = get_player_analyzer(self.config)
+        if not analyzer:
+            return
+        
+        self.cancel_analysis()
+        token = self.analysis_token = CancelToken()
+        self.analysis_label.setText(f"Análisis de {nick} ({sala})")
+        self.analysis_label.show()
+        self.analysis_view.show()
+        generation = self.analysis_view.begin()
+        
+        def on_chunk(chunk):
+            # Desde el hilo del análisis: solo se encola, la vista vuelca por fotograma
+            self.analysis_view.append_chunk(chunk, generation)
+        
+        def deliver(future):
+            try:
+                result = future.result()
+                footer = "(análisis guardado)" if result.cached else ""
+            except AnalysisCancelled:
+                footer = "(cancelado)"
+            except Exception as e:
+                log_message(f"Error al analizar a {nick}: {e}", level='error')
+                footer = "No se pudo completar el análisis"
+            try:
+                self.analysisFinished.emit(token, footer)
+            except RuntimeError:
+                pass  # La pestaña ya se ha destruido
+        
+        analyzer.submit(nick, sala, stats, on_chunk, token).add_done_callback(deliver)
+    
+    @Slot(object, str)
+    def on_analysis_finished(self, token, footer):
+        """Cierra el panel de análisis si el que termina sigue siendo el actual"""
+        if token is not self.analysis_token:
+            return
+        self.analysis_token = None
+        self.analysis_view.finish(footer)
+    
+    def cancel_analysis(self):
+        """Cancela el análisis en curso; el modelo deja de generar tokens"""
+        token, self.analysis_token = self.analysis_token, None
+        if token is None:
+            return
+        token.cancel()
+        self.analysis_view.finish("(cancelado)")
+    
+    def format_stats(self, stats):
+        """Estadísticas seleccionadas de un jugador con su formato ("VPIP:22 PFR:18")"""
+        selected = self.config.get("stats_seleccionadas", {})
+        formats = self.config.get("stats_format", {})
+        parts = []
+        for stat in self.config.get("stats_order", []):
+            value = stats.get(stat)
+            if selected.get(stat) and value is not None:
+                if isinstance(value, float):
+                    value = f"{value:g}"
+                parts.append(formats.get(stat, stat.upper() + ":{value}").format(value=value))
+        return " ".join(parts)
+    
+    def population_ranks(self, sala, stats):
+        """Percentil de las estadísticas seleccionadas en la población de la sala ("VPIP p78")"""
+        service = get_stats_service(self.config)
+        if not service:
+            return []
+        percentiles = service.percentiles(sala, stats)
+        selected = self.config.get("stats_seleccionadas", {})
+        formats = self.config.get("stats_format", {})
+        ranks = []
+        for stat in self.config.get("stats_order", []):
+            if selected.get(stat) and stat in percentiles:
+                label = formats.get(stat, stat.upper()).split(":")[0]
+                ranks.append(f"{label} p{percentiles[stat]:.0f}")
+        return ranks
     
     def refresh_tables(self):
-        """Refresca la lista de mesas detectadas"""
+        """Pide al registro un escaneo inmediato de las mesas"""
         log_message("Refrescando lista de mesas")
         
         # Mostrar indicador de carga
         self.parent.set_status("Buscando mesas de poker...")
         
-        # Limpiar tabla primero
-        self.tables_table.setRowCount(0)
-        
-        # Detectar mesas reales
-        tables = find_poker_tables()
-        
-        # Añadir filas a la tabla con animación simple
-        for i, (hwnd, title) in enumerate(tables):
-            # Pequeña pausa para efecto visual
-            QTimer.singleShot(i * 100, lambda h=hwnd, t=title: self.add_table_row(h, t))
+        # El resultado llega por las señales del registro, sin bloquear la interfaz
+        self.manual_refresh_pending = True
+        self.table_registry.request_scan()
+    
+    @Slot(int)
+    def on_tables_scanned(self, table_count):
+        """Informa del resultado de un refresco manual"""
+        if not self.manual_refresh_pending:
+            return
+        self.manual_refresh_pending = False
         
         # Mostrar mensaje sin mesas
-        if not tables:
+        if not table_count:
             self.toast_manager.warning(
                 "Sin mesas", 
                 "No se encontraron mesas de poker abiertas"
             )
         
         # Actualizar mensaje de estado
-        QTimer.singleShot(len(tables) * 100 + 200, 
-                        lambda: self.parent.set_status(f"Se encontraron {len(tables)} mesas"))
+        self.parent.set_status(f"Se encontraron {table_count} mesas")
     
+    @Slot(int, str)
     def add_table_row(self, hwnd, title):
-        """Añade una fila a la tabla de mesas (con efecto visual)"""
+        """Añade una fila a la tabla de mesas"""
+        if hwnd in self.table_items:
+            self.update_table_row(hwnd, title)
+            return
+        
         row = self.tables_table.rowCount()
         self.tables_table.insertRow(row)
-        self.tables_table.setItem(row, 0, QTableWidgetItem(str(hwnd)))
+        id_item = QTableWidgetItem(str(hwnd))
+        self.tables_table.setItem(row, 0, id_item)
         self.tables_table.setItem(row, 1, QTableWidgetItem(title))
+        self.tables_table.setItem(row, 2, QTableWidgetItem(""))
+        self.table_items[hwnd] = id_item
+    
+    @Slot(int)
+    def remove_table_row(self, hwnd):
+        """Elimina la fila de una mesa cerrada"""
+        id_item = self.table_items.pop(hwnd, None)
+        if id_item is not None:
+            self.tables_table.removeRow(id_item.row())
+        if self.seated_nicks.pop(hwnd, None) is not None:
+            self.update_seated_subscription()
+    
+    @Slot(int, str)
+    def update_table_row(self, hwnd, title):
+        """Actualiza el título de una mesa existente"""
+        id_item = self.table_items.get(hwnd)
+        if id_item is not None:
+            self.tables_table.item(id_item.row(), 1).setText(title)
     
     def analyze_selected_table(self):
         """Analiza la mesa seleccionada"""
@@ -405,6 +651,15 @@ class MainTab(QWidget):
         """Limpia la caché de nicks"""
         log_message("Solicitud para limpiar caché de nicks")
         
+        service = get_stats_service(self.config)
+        if not service:
+            self.toast_manager.error(
+                "Caché no disponible",
+                "No se pudo acceder a la caché de nicks"
+            )
+            return
+        service.clear_cache()
+        
         # Notificar al usuario
         self.toast_manager.success(
             "Caché limpiada", 
@@ -423,6 +678,7 @@ class MainTab(QWidget):
         
         # Notificar estado
         if self.auto_mode_active:
+            self.start_auto_engine()
             log_message("Modo automático activado")
             self.parent.set_status("Modo automático activado")
             self.auto_status.start_animation()
@@ -432,6 +688,7 @@ class MainTab(QWidget):
                 "Modo automático activado. Analizando mesas periódicamente."
             )
         else:
+            self.stop_auto_engine()
             log_message("Modo automático desactivado")
             self.parent.set_status("Modo automático desactivado")
             self.auto_status.stop_animation()
@@ -441,6 +698,91 @@ class MainTab(QWidget):
                 "Modo automático desactivado"
             )
     
+    def start_auto_engine(self):
+        """Arranca el planificador (y su pipeline de mesas) y la vigilancia de asientos"""
+        # La etapa de consulta busca a la vez todos los asientos de todas las
+        # mesas; el servicio agrupa las búsquedas concurrentes en lotes
+        service = get_stats_service(self.config)
+        lookup = service.lookup_many if service else None
+        self.auto_scheduler = AutoModeScheduler(self.config, lookup)
+        self.auto_scheduler.tableAnalyzed.connect(self.on_table_analyzed)
+        
+        # Los cambios en los asientos adelantan la lectura de su mesa
+        self.seat_watcher = SeatChangeWatcher(self.config)
+        self.seat_watcher.seatsChanged.connect(self.auto_scheduler.notify_change)
+        
+        self.sync_auto_tables()
+        self.auto_scheduler.start()
+        self.seat_watcher.start()
+    
+    def stop_auto_engine(self):
+        """Detiene el planificador y la vigilancia de asientos"""
+        if self.seat_watcher:
+            self.seat_watcher.stop()
+            self.seat_watcher = None
+        if self.auto_scheduler:
+            self.auto_scheduler.stop()
+            self.auto_scheduler = None
+        # Los jugadores mostrados dejan de actualizarse
+        for id_item in self.table_items.values():
+            players_item = self.tables_table.item(id_item.row(), 2)
+            players_item.setText("")
+            players_item.setToolTip("")
+        if self.seated_nicks:
+            self.seated_nicks = {}
+            self.update_seated_subscription()
+    
+    def sync_auto_tables(self, *args):
+        """Sincroniza las mesas del modo automático con el registro"""
+        if not self.auto_scheduler:
+            return
+        tables = self.table_registry.tables()
+        self.auto_scheduler.set_tables(tables)
+        self.seat_watcher.set_tables(hwnd for hwnd, _ in tables)
+    
+    @Slot(int, object)
+    def on_table_analyzed(self, hwnd, work):
+        """Muestra los jugadores de una mesa en modo automático, con sus estadísticas y perfil"""
+        seated = [nick for _, nick in sorted(work.nicks.items()) if nick]
+        log_message(f"Mesa {hwnd}: {', '.join(seated) if seated else 'sin jugadores'}")
+        
+        show_stats = self.config.get("mostrar_stats", True)
+        show_profile = self.config.get("mostrar_analisis", True)
+        summary, details = [], []
+        for seat, nick in sorted(work.nicks.items()):
+            if not nick:
+                continue
+            stats = work.stats.get(seat)
+            profile = work.profiles.get(seat)
+            label = f"{nick} ({profile.etiqueta})" if show_profile and profile else nick
+            summary.append(label)
+            line = f"Asiento {seat + 1}: {label}"
+            if stats is None:
+                line += " - sin estadísticas"
+            elif show_stats:
+                line += f" - {self.format_stats(stats)}"
+            details.append(line)
+        
+        id_item = self.table_items.get(hwnd)
+        if id_item is not None:
+            players_item = self.tables_table.item(id_item.row(), 2)
+            players_item.setText(" · ".join(summary) if summary else "Sin jugadores")
+            players_item.setToolTip("\n".join(details))
+        
+        if self.seated_nicks.get(hwnd) != seated:
+            self.seated_nicks[hwnd] = seated
+            self.update_seated_subscription()
+    
+    def update_seated_subscription(self):
+        """Suscribe los cambios de estadísticas de los jugadores sentados en todas las mesas"""
+        service = get_stats_service(self.config)
+        if not service:
+            return
+        sala = self.config.get("sala_default", "XPK")
+        service.watch_seated(
+            (nick, sala) for nicks in self.seated_nicks.values() for nick in nicks
+        )
+    
     def update_auto_mode_ui(self):
         """Actualiza la interfaz según el estado del modo automático"""
         if self.auto_mode_active:
@@ -464,6 +806,8 @@ class MainTab(QWidget):
             if 5 <= interval <= 300:
                 self.config["auto_check_interval"] = interval
                 save_config(self.config)
+                if self.auto_scheduler:
+                    self.auto_scheduler.set_max_interval(interval)
                 log_message(f"Intervalo de modo automático actualizado a {interval} segundos")
         except ValueError:
             pass
@@ -478,6 +822,10 @@ class MainTab(QWidget):
         """Actualiza la configuración para mostrar análisis"""
         self.config["mostrar_analisis"] = checked
         save_config(self.config)
+        if not checked:
+            self.cancel_analysis()
+            self.analysis_label.hide()
+            self.analysis_view.hide()
         log_message(f"Mostrar análisis: {checked}")
     
     def toggle_show_dialog(self, checked):
@@ -497,4 +845,11 @@ class MainTab(QWidget):
     def on_tab_activated(self):
         """Se llama cuando esta pestaña se activa"""
         # Refrescar mesas automáticamente al activar la pestaña
-        self.refresh_tables()
\ No newline at end of file
+        self.refresh_tables()
+    
+    def shutdown(self):
+        """Detiene los hilos en segundo plano de la pestaña"""
+        self.cancel_analysis()
+        self.stop_auto_engine()
+        self.nick_suggester.stop()
+        self.table_registry.stop()
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Área de texto que se va rellenando mientras llega una respuesta en streaming
+"""
+
+from PySide6.QtWidgets import QPlainTextEdit
+from PySide6.QtCore import QTimer
+from PySide6.QtGui import QTextCursor
+
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..')))
+from src.ui.styles.theme import get_color
+from src.ui.styles.constants import *
+
+class StreamingTextView(QPlainTextEdit):
+    """
+    Texto de solo lectura que recibe fragmentos desde cualquier hilo
+
+    append_chunk solo encola el fragmento; un temporizador del hilo de la
+    interfaz vuelca lo acumulado en una sola inserción por fotograma, así
+    que un modelo rápido no provoca un repintado por palabra. Cada begin()
+    abre una generación nueva y los fragmentos de la anterior (p. ej. de un
+    análisis cancelado que aún no ha terminado) se descartan.
+    """
+
+    def __init__(self, parent=None, frame_ms=16):
+        """
+        Inicializa el área de texto
+
+        Args:
+            parent: Widget padre
+            frame_ms: Milisegundos entre volcados (16 = un fotograma a 60 Hz)
+        """
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setObjectName("streaming-text")
+        self.setStyleSheet(f"""
+            QPlainTextEdit#streaming-text {{
+                background-color: {get_color('surface')};
+                color: {get_color('text_primary')};
+                border: 1px solid {get_color('border')};
+                border-radius: {BORDER_RADIUS_SMALL}px;
+                font-size: {FONT_SIZE_SMALL}px;
+            }}
+        """)
+
+        self._lock = threading.Lock()
+        self._pending = []
+        self._generation = 0
+        self.flushes = 0
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(frame_ms)
+        self._timer.timeout.connect(self.flush)
+
+    def begin(self, text=""):
+        """
+        Vacía el área y empieza a aceptar fragmentos (hilo de la interfaz)
+
+        Returns:
+            Número de generación que hay que pasar a append_chunk
+        """
+        with self._lock:
+            self._generation += 1
+            self._pending.clear()
+            generation = self._generation
+        self.setPlainText(text)
+        self._timer.start()
+        return generation
+
+    def append_chunk(self, text, generation):
+        """Encola un fragmento; se puede llamar desde cualquier hilo"""
+        with self._lock:
+            if generation == self._generation:
+                self._pending.append(text)
+
+    def flush(self):
+        """Inserta de una vez todo lo pendiente al final del texto"""
+        with self._lock:
+            if not self._pending:
+                return
+            text = "".join(self._pending)
+            self._pending.clear()
+        cursor = self.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self.ensureCursorVisible()
+        self.flushes += 1
+
+    def finish(self, footer=""):
+        """Vuelca lo pendiente y deja de aceptar fragmentos (hilo de la interfaz)"""
+        self.flush()
+        with self._lock:
+            self._generation += 1
+        self._timer.stop()
+        if footer:
+            self.appendPlainText(footer)
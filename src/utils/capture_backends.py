@@ -0,0 +1,537 @@
+"""
+Backends de captura de ventanas para PokerBot TRACK
+Separa el acceso a win32 del resto de la aplicación y permite reproducir
+sesiones grabadas desde disco para pruebas y benchmarks sin Windows
+"""
+
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import List, Tuple, Optional, Dict
+from PIL import Image
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.utils.frame_pool import FramePool, FrameBuffer
+
+# Importar win32 (manejo condicional)
+try:
+    import ctypes
+    import win32gui
+    import win32ui
+    import win32con
+    import win32api
+    from ctypes import windll
+    WIN32_AVAILABLE = True
+except ImportError:
+    WIN32_AVAILABLE = False
+
+# Variables de entorno para reproducir o grabar sesiones
+REPLAY_ENV_VAR = "POKERBOT_REPLAY"
+REPLAY_SPEED_ENV_VAR = "POKERBOT_REPLAY_SPEED"
+RECORD_ENV_VAR = "POKERBOT_RECORD"
+
+class CaptureBackend:
+    """
+    Interfaz base de captura de ventanas
+
+    Las implementaciones por defecto no encuentran ventanas ni capturan nada,
+    por lo que esta clase sirve también como backend nulo en sistemas sin
+    soporte de captura.
+    """
+
+    name = "null"
+
+    def list_windows(self) -> List[Tuple[int, str]]:
+        """Devuelve las ventanas visibles como tuplas (hwnd, title)"""
+        return []
+
+    def get_window_text(self, hwnd: int) -> str:
+        """Devuelve el título de una ventana"""
+        return ""
+
+    def get_parent(self, hwnd: int) -> Optional[int]:
+        """Devuelve el handle de la ventana padre, o None"""
+        return None
+
+    def window_at_cursor(self) -> Optional[int]:
+        """Devuelve el handle de la ventana bajo el cursor, o None"""
+        return None
+
+    def get_foreground_window(self) -> Optional[int]:
+        """Devuelve el handle de la ventana activa, o None"""
+        return None
+
+    def get_window_rect(self, hwnd: int) -> Tuple[int, int, int, int]:
+        """Devuelve (left, top, right, bottom) de una ventana"""
+        return 0, 0, 0, 0
+
+    def is_window(self, hwnd: int) -> bool:
+        """Comprueba si una ventana existe"""
+        return False
+
+    def capture(self, hwnd: int, rect: Tuple[int, int, int, int] = None) -> Optional[Image.Image]:
+        """Captura una región (x, y, width, height) de una ventana como imagen PIL"""
+        return None
+
+    def capture_into(self, hwnd: int, rect: Tuple[int, int, int, int],
+                     pool: FramePool) -> Optional[FrameBuffer]:
+        """
+        Captura una región en un buffer BGRA (alto x ancho x 4) tomado del pool
+
+        La implementación por defecto copia el resultado de capture(); los
+        backends que puedan escribir directamente en el buffer la sobrescriben.
+        """
+        image = self.capture(hwnd, rect)
+        if image is None:
+            return None
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        buffer = pool.acquire((image.height, image.width, 4))
+        buffer.array[..., 2::-1] = np.asarray(image)
+        buffer.array[..., 3] = 255
+        return buffer
+
+    def focus(self, hwnd: int) -> bool:
+        """Pone el foco en una ventana"""
+        return False
+
+    def click(self, hwnd: int, x: int, y: int) -> bool:
+        """Envía un clic a una posición relativa de una ventana"""
+        return False
+
+class Win32CaptureBackend(CaptureBackend):
+    """Backend de captura basado en la API win32"""
+
+    name = "win32"
+
+    def list_windows(self) -> List[Tuple[int, str]]:
+        windows = []
+
+        def enum_windows_callback(hwnd, _):
+            if win32gui.IsWindowVisible(hwnd):
+                title = win32gui.GetWindowText(hwnd)
+                if title:
+                    windows.append((hwnd, title))
+
+        win32gui.EnumWindows(enum_windows_callback, None)
+        return windows
+
+    def get_window_text(self, hwnd: int) -> str:
+        return win32gui.GetWindowText(hwnd)
+
+    def get_parent(self, hwnd: int) -> Optional[int]:
+        return win32gui.GetParent(hwnd) or None
+
+    def window_at_cursor(self) -> Optional[int]:
+        cursor_pos = win32gui.GetCursorPos()
+        return win32gui.WindowFromPoint(cursor_pos) or None
+
+    def get_foreground_window(self) -> Optional[int]:
+        return win32gui.GetForegroundWindow() or None
+
+    def get_window_rect(self, hwnd: int) -> Tuple[int, int, int, int]:
+        return win32gui.GetWindowRect(hwnd)
+
+    def is_window(self, hwnd: int) -> bool:
+        return bool(win32gui.IsWindow(hwnd))
+
+    def _with_window_bitmap(self, hwnd: int, rect: Optional[Tuple[int, int, int, int]], read):
+        """
+        Copia la ventana a un bitmap compatible y llama a read(bitmap, width, height)
+
+        Todos los recursos GDI se liberan al terminar, aunque read falle.
+        """
+        # Si no se especifica rect, capturar toda la ventana
+        if rect is None:
+            left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+            width, height = right - left, bottom - top
+            x, y = 0, 0
+        else:
+            x, y, width, height = rect
+
+        # Obtener DC y crear DC compatible
+        hwnd_dc = win32gui.GetWindowDC(hwnd)
+        mfc_dc = win32ui.CreateDCFromHandle(hwnd_dc)
+        save_dc = mfc_dc.CreateCompatibleDC()
+
+        # Crear bitmap compatible y seleccionarlo en el DC
+        save_bitmap = win32ui.CreateBitmap()
+        save_bitmap.CreateCompatibleBitmap(mfc_dc, width, height)
+        save_dc.SelectObject(save_bitmap)
+
+        try:
+            # Copiar bits de la ventana al bitmap
+            result = windll.user32.PrintWindow(hwnd, save_dc.GetSafeHdc(), 3)
+
+            # Alternativa si PrintWindow no funciona
+            if not result:
+                save_dc.BitBlt((0, 0), (width, height), mfc_dc, (x, y), win32con.SRCCOPY)
+
+            return read(save_bitmap, width, height)
+        finally:
+            # Liberar recursos
+            win32gui.DeleteObject(save_bitmap.GetHandle())
+            save_dc.DeleteDC()
+            mfc_dc.DeleteDC()
+            win32gui.ReleaseDC(hwnd, hwnd_dc)
+
+    def capture(self, hwnd: int, rect: Tuple[int, int, int, int] = None) -> Optional[Image.Image]:
+        def read(bitmap, width, height):
+            # Convertir a imagen PIL
+            bmpinfo = bitmap.GetInfo()
+            bmpstr = bitmap.GetBitmapBits(True)
+            return Image.frombuffer(
+                'RGB',
+                (bmpinfo['bmWidth'], bmpinfo['bmHeight']),
+                bmpstr, 'raw', 'BGRX', 0, 1
+            )
+
+        return self._with_window_bitmap(hwnd, rect, read)
+
+    def capture_into(self, hwnd: int, rect: Tuple[int, int, int, int],
+                     pool: FramePool) -> Optional[FrameBuffer]:
+        def read(bitmap, width, height):
+            # Copiar los bits directamente al buffer del pool, sin objetos intermedios
+            buffer = pool.acquire((height, width, 4))
+            size = buffer.array.nbytes
+            copied = windll.gdi32.GetBitmapBits(
+                bitmap.GetHandle(), size, buffer.array.ctypes.data_as(ctypes.c_void_p)
+            )
+            if copied != size:
+                buffer.release()
+                return None
+            return buffer
+
+        return self._with_window_bitmap(hwnd, rect, read)
+
+    def focus(self, hwnd: int) -> bool:
+        # Comprobar si está minimizada y restaurarla
+        if win32gui.IsIconic(hwnd):
+            win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
+
+        # Traer la ventana al frente y verificar que realmente se activó
+        win32gui.SetForegroundWindow(hwnd)
+        return win32gui.GetForegroundWindow() == hwnd
+
+    def click(self, hwnd: int, x: int, y: int) -> bool:
+        # Enviar mensaje de clic sin mover el cursor físico
+        win32api.SendMessage(
+            hwnd,
+            win32con.WM_LBUTTONDOWN,
+            win32con.MK_LBUTTON,
+            win32api.MAKELONG(x, y)
+        )
+        win32api.SendMessage(
+            hwnd,
+            win32con.WM_LBUTTONUP,
+            0,
+            win32api.MAKELONG(x, y)
+        )
+        return True
+
+class ReplaySource(ABC):
+    """
+    Fuente de eventos grabados para el backend de reproducción
+
+    Cada evento tiene una marca de tiempo relativa al inicio de la grabación,
+    la lista de ventanas visibles en ese momento y los fotogramas capturados.
+    Un fotograma se mantiene vigente hasta que llega uno nuevo de la misma
+    ventana.
+    """
+
+    @property
+    @abstractmethod
+    def timestamps(self) -> List[float]:
+        """Marcas de tiempo (segundos) de cada evento, en orden creciente"""
+
+    @abstractmethod
+    def windows_at(self, index: int) -> List[Tuple[int, str]]:
+        """Ventanas visibles en el evento indicado"""
+
+    @abstractmethod
+    def frame_at(self, index: int, hwnd: int) -> Optional[Image.Image]:
+        """Último fotograma de una ventana grabado hasta el evento indicado"""
+
+    def foreground_at(self, index: int) -> Optional[int]:
+        """Ventana activa en el evento indicado"""
+        return None
+
+    def cursor_at(self, index: int) -> Optional[int]:
+        """Ventana bajo el cursor en el evento indicado"""
+        return None
+
+class DirectoryReplaySource(ReplaySource):
+    """
+    Grabación almacenada como directorio con un índice JSON y fotogramas PNG
+
+    Formato de index.json:
+        {"events": [{"t": 0.0, "windows": [[hwnd, title], ...],
+                     "foreground": hwnd, "cursor": hwnd,
+                     "frames": {"hwnd": "ruta/relativa.png"}}]}
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "index.json"), "r", encoding="utf-8") as f:
+            index = json.load(f)
+
+        self._events = index.get("events", [])
+        self._timestamps = [float(event.get("t", 0.0)) for event in self._events]
+
+        # Para cada ventana, lista ordenada de (evento, ruta) con sus fotogramas
+        self._frames: Dict[int, Tuple[List[int], List[str]]] = {}
+        for i, event in enumerate(self._events):
+            for hwnd, frame_path in event.get("frames", {}).items():
+                indexes, paths = self._frames.setdefault(int(hwnd), ([], []))
+                indexes.append(i)
+                paths.append(frame_path)
+
+        # Caché del último fotograma decodificado por ventana
+        self._decoded: Dict[int, Tuple[str, Image.Image]] = {}
+
+    @property
+    def timestamps(self) -> List[float]:
+        return self._timestamps
+
+    def windows_at(self, index: int) -> List[Tuple[int, str]]:
+        return [(int(hwnd), title) for hwnd, title in self._events[index].get("windows", [])]
+
+    def frame_at(self, index: int, hwnd: int) -> Optional[Image.Image]:
+        if hwnd not in self._frames:
+            return None
+
+        indexes, paths = self._frames[hwnd]
+        position = bisect.bisect_right(indexes, index) - 1
+        if position < 0:
+            return None
+
+        frame_path = paths[position]
+        cached = self._decoded.get(hwnd)
+        if cached and cached[0] == frame_path:
+            return cached[1]
+
+        with Image.open(os.path.join(self.path, frame_path)) as img:
+            frame = img.convert('RGB')
+        self._decoded[hwnd] = (frame_path, frame)
+        return frame
+
+    def foreground_at(self, index: int) -> Optional[int]:
+        return self._events[index].get("foreground")
+
+    def cursor_at(self, index: int) -> Optional[int]:
+        return self._events[index].get("cursor")
+
+class ReplayCaptureBackend(CaptureBackend):
+    """
+    Backend que reproduce una sesión grabada desde disco
+
+    Con speed > 0 la grabación avanza con el reloj real multiplicado por
+    speed (1.0 = tiempo real, 10.0 = diez veces más rápido). Con speed == 0
+    la reproducción solo avanza al llamar a advance(), lo que permite
+    recorrer los eventos tan rápido como sea posible en un benchmark.
+    """
+
+    name = "replay"
+
+    def __init__(self, source: ReplaySource, speed: float = 1.0, loop: bool = False):
+        self.source = source
+        self.speed = speed
+        self.loop = loop
+        self._lock = threading.Lock()
+        self._start_time = time.monotonic()
+        self._step_index = 0
+
+        if not source.timestamps:
+            log_message("La grabación a reproducir no contiene eventos", level='warning')
+
+    def restart(self):
+        """Vuelve al inicio de la grabación"""
+        with self._lock:
+            self._start_time = time.monotonic()
+            self._step_index = 0
+
+    def advance(self) -> bool:
+        """
+        Avanza al siguiente evento (modo paso a paso)
+
+        Returns:
+            False si la grabación ha terminado
+        """
+        with self._lock:
+            last = len(self.source.timestamps) - 1
+            if self._step_index < last:
+                self._step_index += 1
+                return True
+            if self.loop and last >= 0:
+                self._step_index = 0
+                return True
+            return False
+
+    def finished(self) -> bool:
+        """Indica si la reproducción ha llegado al último evento"""
+        timestamps = self.source.timestamps
+        if self.loop or not timestamps:
+            return not timestamps
+        if self.speed <= 0:
+            return self._step_index >= len(timestamps) - 1
+        return (time.monotonic() - self._start_time) * self.speed >= timestamps[-1]
+
+    def current_index(self) -> int:
+        """Índice del evento vigente según el modo de reproducción"""
+        timestamps = self.source.timestamps
+        if not timestamps:
+            return -1
+
+        if self.speed <= 0:
+            return self._step_index
+
+        elapsed = (time.monotonic() - self._start_time) * self.speed
+        if self.loop and timestamps[-1] > 0:
+            elapsed %= timestamps[-1]
+        return max(0, bisect.bisect_right(timestamps, elapsed) - 1)
+
+    def list_windows(self) -> List[Tuple[int, str]]:
+        index = self.current_index()
+        return self.source.windows_at(index) if index >= 0 else []
+
+    def get_window_text(self, hwnd: int) -> str:
+        return dict(self.list_windows()).get(hwnd, "")
+
+    def window_at_cursor(self) -> Optional[int]:
+        index = self.current_index()
+        return self.source.cursor_at(index) if index >= 0 else None
+
+    def get_foreground_window(self) -> Optional[int]:
+        index = self.current_index()
+        return self.source.foreground_at(index) if index >= 0 else None
+
+    def get_window_rect(self, hwnd: int) -> Tuple[int, int, int, int]:
+        index = self.current_index()
+        frame = self.source.frame_at(index, hwnd) if index >= 0 else None
+        if frame is None:
+            return 0, 0, 0, 0
+        return 0, 0, frame.width, frame.height
+
+    def is_window(self, hwnd: int) -> bool:
+        return any(known == hwnd for known, _ in self.list_windows())
+
+    def capture(self, hwnd: int, rect: Tuple[int, int, int, int] = None) -> Optional[Image.Image]:
+        index = self.current_index()
+        frame = self.source.frame_at(index, hwnd) if index >= 0 else None
+        if frame is None:
+            return None
+
+        if rect is None:
+            return frame.copy()
+
+        x, y, width, height = rect
+        return frame.crop((x, y, x + width, y + height))
+
+    def focus(self, hwnd: int) -> bool:
+        return self.is_window(hwnd)
+
+    def click(self, hwnd: int, x: int, y: int) -> bool:
+        return self.is_window(hwnd)
+
+def open_replay_source(path: str) -> ReplaySource:
+    """
+    Abre una grabación desde disco
+
+    Args:
+        path: Directorio con index.json o archivo de sesión .pbrec
+
+    Returns:
+        Fuente de reproducción correspondiente
+    """
+    if os.path.isdir(path):
+        return DirectoryReplaySource(path)
+
+    # Importar aquí para evitar dependencias circulares
+    from src.utils.session_recorder import SessionRecordingSource
+    return SessionRecordingSource(path)
+
+# Backend activo (se crea bajo demanda)
+_backend: Optional[CaptureBackend] = None
+_backend_lock = threading.Lock()
+_recorder = None
+
+def _create_default_backend() -> CaptureBackend:
+    """Elige el backend según el entorno"""
+    replay_path = os.getenv(REPLAY_ENV_VAR)
+    if replay_path:
+        speed = float(os.getenv(REPLAY_SPEED_ENV_VAR, "1.0"))
+        log_message(f"Usando backend de reproducción: {replay_path} (velocidad {speed}x)")
+        backend = ReplayCaptureBackend(open_replay_source(replay_path), speed=speed)
+    elif WIN32_AVAILABLE:
+        backend = Win32CaptureBackend()
+    else:
+        log_message("win32 no disponible. La captura de ventanas no funcionará.", level='warning')
+        backend = CaptureBackend()
+
+    record_path = os.getenv(RECORD_ENV_VAR)
+    if record_path:
+        backend = _wrap_with_recorder(backend, record_path)
+
+    return backend
+
+def _wrap_with_recorder(backend: CaptureBackend, path: str) -> CaptureBackend:
+    """Envuelve un backend para grabar la sesión en path"""
+    global _recorder
+
+    # Importar aquí para evitar dependencias circulares
+    from src.utils.session_recorder import SessionRecorder, RecordingCaptureBackend
+
+    _recorder = SessionRecorder(path)
+    return RecordingCaptureBackend(backend, _recorder)
+
+def start_session_recording(path: str) -> None:
+    """
+    Empieza a grabar todo lo que devuelva el backend activo
+
+    Args:
+        path: Ruta del archivo .pbrec a crear
+    """
+    global _backend
+    stop_session_recording()
+    backend = get_capture_backend()
+    with _backend_lock:
+        _backend = _wrap_with_recorder(backend, path)
+
+def stop_session_recording() -> None:
+    """Detiene la grabación en curso, si la hay, y restaura el backend original"""
+    global _backend, _recorder
+    with _backend_lock:
+        recorder, _recorder = _recorder, None
+        if recorder is not None and hasattr(_backend, "inner"):
+            _backend = _backend.inner
+    if recorder is not None:
+        recorder.close()
+
+def get_capture_backend() -> CaptureBackend:
+    """Obtiene el backend de captura activo"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _create_default_backend()
+        return _backend
+
+def set_capture_backend(backend: Optional[CaptureBackend]) -> None:
+    """
+    Establece el backend de captura activo
+
+    Args:
+        backend: Backend a usar, o None para volver a elegirlo según el entorno
+    """
+    global _backend
+    with _backend_lock:
+        _backend = backend
+    if backend is not None:
+        log_message(f"Backend de captura establecido: {backend.name}")
@@ -0,0 +1,105 @@
+"""
+Pool de buffers de fotogramas reutilizables
+Evita reservar memoria nueva para cada captura: los fotogramas se escriben
+en arrays NumPy preasignados que se devuelven al pool al terminar
+"""
+
+import threading
+import numpy as np
+from typing import Dict, List, Tuple, Optional
+
+class FrameBuffer:
+    """
+    Buffer prestado por un FramePool
+
+    El array debe considerarse inválido después de release(). Puede usarse
+    como gestor de contexto para liberarlo automáticamente.
+    """
+
+    __slots__ = ("array", "_pool", "_key", "_released")
+
+    def __init__(self, array: np.ndarray, pool: Optional["FramePool"], key):
+        self.array = array
+        self._pool = pool
+        self._key = key
+        self._released = False
+
+    @property
+    def rgb(self) -> np.ndarray:
+        """Vista RGB (sin copia) de un buffer BGRA"""
+        return self.array[..., 2::-1]
+
+    def release(self) -> None:
+        """Devuelve el buffer al pool (llamadas repetidas se ignoran)"""
+        if self._released:
+            return
+        self._released = True
+        if self._pool is not None:
+            self._pool._give_back(self._key, self.array)
+
+    def __enter__(self) -> "FrameBuffer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+class FramePool:
+    """Pool de arrays preasignados agrupados por forma y tipo"""
+
+    def __init__(self, max_per_shape: int = 8):
+        """
+        Inicializa el pool
+
+        Args:
+            max_per_shape: Buffers libres que se conservan por cada forma
+        """
+        self.max_per_shape = max_per_shape
+        self._free: Dict[Tuple, List[np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def acquire(self, shape: Tuple[int, ...], dtype=np.uint8) -> FrameBuffer:
+        """
+        Obtiene un buffer con la forma y tipo indicados
+
+        El contenido del buffer no se inicializa.
+        """
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                self.reuses += 1
+                return FrameBuffer(free.pop(), self, key)
+            self.allocations += 1
+
+        return FrameBuffer(np.empty(shape, dtype=dtype), self, key)
+
+    def _give_back(self, key, array: np.ndarray) -> None:
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) < self.max_per_shape:
+                free.append(array)
+
+    def clear(self) -> None:
+        """Libera todos los buffers libres (p. ej. al cerrar mesas)"""
+        with self._lock:
+            self._free.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Estadísticas de uso del pool"""
+        with self._lock:
+            free_bytes = sum(a.nbytes for arrays in self._free.values() for a in arrays)
+            return {
+                "allocations": self.allocations,
+                "reuses": self.reuses,
+                "free_buffers": sum(len(arrays) for arrays in self._free.values()),
+                "free_bytes": free_bytes,
+            }
+
+def wrap_array(array: np.ndarray) -> FrameBuffer:
+    """Envuelve un array que no pertenece a ningún pool"""
+    return FrameBuffer(array, None, None)
+
+# Instancia global del pool de fotogramas
+frame_pool = FramePool()
@@ -12,6 +12,7 @@ from typing import Optional, Tuple
 # Añadir directorio raíz al path para importaciones
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from src.utils.logger import log_message
+from src.utils.frame_pool import FrameBuffer, FramePool, frame_pool
 
 def enhance_for_ocr(image: Image.Image) -> Image.Image:
     """
@@ -46,7 +47,7 @@ def enhance_for_ocr(image: Image.Image) -> Image.Image:
         width, height = image.size
         
         # Umbralización simple
-        threshold = np.array(image).mean() * 0.7
+        threshold = float(np.array(image).mean()) * 0.7
         image = image.point(lambda p: p > threshold and 255)
         
         return image
@@ -55,6 +56,89 @@ def enhance_for_ocr(image: Image.Image) -> Image.Image:
         log_message(f"Error al mejorar imagen para OCR: {e}", level='error')
         return image  # Devolver imagen original en caso de error
 
+def enhance_for_ocr_array(frame: np.ndarray, bgr: bool = True, pool: FramePool = None) -> FrameBuffer:
+    """
+    Versión NumPy de enhance_for_ocr que trabaja sobre buffers del pool
+    
+    Aplica los mismos pasos (escalado de recortes pequeños, escala de grises,
+    contraste, doble enfoque y umbralización) sin crear imágenes intermedias:
+    todos los resultados parciales se escriben en buffers reutilizables. Los
+    recortes pequeños se amplían con LANCZOS como en enhance_for_ocr; es la
+    única copia adicional y solo ocurre en recortes de pocos píxeles.
+    
+    Args:
+        frame: Array alto x ancho (gris) o alto x ancho x 3/4 canales
+        bgr: True si los canales están en orden BGR(A), como en las capturas
+        pool: Pool del que tomar los buffers (por defecto el pool global)
+        
+    Returns:
+        FrameBuffer con la imagen binarizada (uint8, alto x ancho). El
+        llamador debe liberarlo con release() al terminar.
+    """
+    pool = pool or frame_pool
+    height, width = frame.shape[:2]
+    
+    # Un recorte vacío no tiene nada que reconocer
+    if width == 0 or height == 0:
+        return pool.acquire((height, width), np.uint8)
+    
+    # Aumentar tamaño ligeramente si es pequeña (mismo tamaño final que enhance_for_ocr)
+    out_height, out_width = height, width
+    if width < 100 or height < 30:
+        scale_factor = max(2, 100 / width, 30 / height)
+        out_height, out_width = int(height * scale_factor), int(width * scale_factor)
+    
+    with pool.acquire((height, width), np.float32) as gray_buf, \
+         pool.acquire((out_height, out_width), np.float32) as work_buf, \
+         pool.acquire((out_height, out_width), np.float32) as sum_buf:
+        gray = gray_buf.array
+        
+        # Convertir a escala de grises (mismos pesos que PIL)
+        if frame.ndim == 2:
+            np.copyto(gray, frame)
+        else:
+            red, blue = (2, 0) if bgr else (0, 2)
+            scratch = sum_buf.array.reshape(-1)[:height * width].reshape(height, width)
+            np.multiply(frame[..., red], np.float32(0.299), out=gray)
+            np.multiply(frame[..., 1], np.float32(0.587), out=scratch)
+            gray += scratch
+            np.multiply(frame[..., blue], np.float32(0.114), out=scratch)
+            gray += scratch
+        
+        image = work_buf.array
+        if (out_height, out_width) != (height, width):
+            resized = Image.fromarray(gray, mode='F').resize((out_width, out_height), Image.LANCZOS)
+            np.copyto(image, np.asarray(resized))
+            np.clip(image, 0, 255, out=image)
+        else:
+            np.copyto(image, gray)
+        
+        # Aumentar contraste (factor 2 respecto a la media)
+        mean = float(image.mean())
+        image *= 2.0
+        image -= mean
+        np.clip(image, 0, 255, out=image)
+        
+        # Aumentar nitidez dos veces (kernel SHARPEN de PIL, bordes sin cambios)
+        if out_height > 2 and out_width > 2:
+            inner = image[1:-1, 1:-1]
+            total = sum_buf.array[1:-1, 1:-1]
+            for _ in range(2):
+                np.add(image[:-2, :-2], image[:-2, 1:-1], out=total)
+                for dy, dx in ((0, 2), (1, 0), (1, 1), (1, 2), (2, 0), (2, 1), (2, 2)):
+                    total += image[dy:out_height - 2 + dy, dx:out_width - 2 + dx]
+                total *= -0.125
+                inner *= 2.125
+                inner += total
+                np.clip(inner, 0, 255, out=inner)
+        
+        # Umbralización simple
+        threshold = float(image.mean()) * 0.7
+        result = pool.acquire((out_height, out_width), np.uint8)
+        np.greater(image, threshold, out=result.array.view(np.bool_))
+        result.array *= 255
+        return result
+
 def enhance_for_asian_chars(image: Image.Image) -> Image.Image:
     """
     Mejora específica para reconocimiento de caracteres asiáticos
@@ -84,7 +168,7 @@ def enhance_for_asian_chars(image: Image.Image) -> Image.Image:
             image = image.filter(ImageFilter.SHARPEN)
         
         # Umbralización adaptativa más fuerte
-        threshold = np.array(image).mean() * 0.6
+        threshold = float(np.array(image).mean()) * 0.6
         image = image.point(lambda p: p > threshold and 255)
         
         return image
@@ -202,6 +286,21 @@ def test_image_processing():
         log_message(f"Hash original: {hash1[:16]}...")
         log_message(f"Hash mejorado: {hash2[:16]}...")
         log_message(f"Similitud: {similarity:.2f}")
+        
+        # La versión NumPy debe binarizar igual que la de PIL, también con recortes pequeños
+        for box in [(0, 0, test_img.width, test_img.height), (10, 20, 90, 45), (5, 5, 40, 20)]:
+            crop = test_img.crop(box)
+            expected = np.array(enhance_for_ocr(crop))
+            with enhance_for_ocr_array(np.asarray(crop), bgr=False) as enhanced_array:
+                if enhanced_array.array.shape == expected.shape:
+                    matching = float((enhanced_array.array == expected).mean())
+                    log_message(f"Recorte {crop.size}: {matching:.1%} de píxeles iguales a enhance_for_ocr")
+                else:
+                    log_message(f"Recorte {crop.size}: tamaño distinto {enhanced_array.array.shape} "
+                                f"frente a {expected.shape}", level='error')
+        
+        with enhance_for_ocr_array(np.zeros((0, 40, 3), dtype=np.uint8)) as empty:
+            log_message(f"Recorte vacío: {empty.array.shape}")
 
 # Para pruebas directas
 if __name__ == "__main__":
@@ -0,0 +1,110 @@
+"""
+Normalización de nicks de jugadores
+Produce la clave canónica con la que se deduplican y guardan las búsquedas
+de un mismo jugador aunque el OCR lo lea con otra anchura de caracteres,
+otro espaciado o mayúsculas, y la clave de comparación del OCR, que además
+pliega los caracteres que el OCR confunde entre sí. El texto original se
+conserva para mostrarlo; las claves solo se usan para comparar.
+"""
+
+import unicodedata
+from functools import lru_cache
+from typing import Dict, NamedTuple, Tuple
+
+# Longitud máxima de un nick reconocido
+MAX_NICK_LENGTH = 30
+
+# Caracteres que el OCR confunde entre sí; cada uno se sustituye por el
+# representante de su grupo. Se aplican sobre la clave canónica (después de
+# NFKC y casefold), así que las formas de ancho completo y las mayúsculas ya
+# están plegadas. Solo sirven para comparar lecturas del OCR: "Nit01" y
+# "Nitol" son jugadores distintos.
+LATIN_CONFUSABLES: Dict[str, str] = {
+    "0": "o",
+    "1": "l", "|": "l", "!": "l",
+}
+
+# Pares kanji/katakana casi idénticos en las fuentes de las salas asiáticas
+CJK_CONFUSABLES: Dict[str, str] = {
+    "ロ": "口",   # katakana ro / kanji boca
+    "ー": "一",   # marca de vocal larga / kanji uno
+    "－": "一",
+    "ニ": "二",   # katakana ni / kanji dos
+    "カ": "力",   # katakana ka / kanji fuerza
+    "エ": "工",   # katakana e / kanji obra
+    "タ": "夕",   # katakana ta / kanji tarde
+    "ト": "卜",   # katakana to / kanji adivinación
+    "ハ": "八",   # katakana ha / kanji ocho
+    "へ": "ヘ",   # hiragana he / katakana he
+}
+
+class NormalizationRule(NamedTuple):
+    """Reglas de normalización de una sala"""
+    confusables: Dict[str, str]
+    remove_spaces: bool     # True: el OCR mete espacios que el nick no tiene
+
+DEFAULT_RULE = NormalizationRule({**LATIN_CONFUSABLES}, remove_spaces=False)
+ROOM_RULES: Dict[str, NormalizationRule] = {
+    # X-Poker: nicks mayoritariamente CJK, sin espacios significativos
+    "XPK": NormalizationRule({**LATIN_CONFUSABLES, **CJK_CONFUSABLES}, remove_spaces=True),
+}
+
+def _is_invisible(char: str) -> bool:
+    """Caracteres de formato y control (anchura cero, BOM, etc.)"""
+    return unicodedata.category(char) in ("Cf", "Cc")
+
+def clean_display_nick(text: str) -> str:
+    """
+    Limpia un texto leído por el OCR para mostrarlo
+
+    Quita caracteres invisibles, colapsa los espacios y trunca a
+    MAX_NICK_LENGTH, sin alterar los caracteres visibles.
+    """
+    text = "".join(char for char in text if not _is_invisible(char))
+    return " ".join(text.split())[:MAX_NICK_LENGTH]
+
+def normalize_sala(sala: str) -> str:
+    """Clave canónica de una sala (los códigos de sala van en mayúsculas)"""
+    return sala.strip().upper()
+
+@lru_cache(maxsize=65536)
+def canonical_nick(nick: str, sala: str = "") -> str:
+    """
+    Clave canónica de un nick en una sala (identidad del jugador)
+
+    Pasos: NFKC (pliega anchura completa/media y compatibilidades del mismo
+    carácter), eliminación de invisibles, casefold y reglas de espaciado de
+    la sala. No pliega caracteres confundibles: es la clave de las cachés.
+    Memorizada por (nick, sala).
+    """
+    rule = ROOM_RULES.get(normalize_sala(sala), DEFAULT_RULE)
+
+    text = unicodedata.normalize("NFKC", nick)
+    text = "".join(char for char in text if not _is_invisible(char)).casefold()
+
+    if rule.remove_spaces:
+        return "".join(text.split())
+    return " ".join(text.split())
+
+def fold_confusables(key: str, sala: str = "") -> str:
+    """
+    Clave de comparación del OCR a partir de una clave canónica
+
+    Sustituye cada carácter confundible de la sala por el representante de
+    su grupo; conserva la longitud, así que una subcadena de la clave
+    canónica lo sigue siendo de la plegada.
+    """
+    confusables = ROOM_RULES.get(normalize_sala(sala), DEFAULT_RULE).confusables
+    return "".join(confusables.get(char, char) for char in key)
+
+def ocr_match_key(nick: str, sala: str = "") -> str:
+    """Clave con la que se comparan las lecturas del OCR con los nicks conocidos"""
+    return fold_confusables(canonical_nick(nick, sala), sala)
+
+def normalize_nick(nick: str) -> str:
+    """Clave canónica de un nick con las reglas por defecto"""
+    return canonical_nick(nick, "")
+
+def lookup_key(nick: str, sala: str) -> Tuple[str, str]:
+    """Clave normalizada (nick, sala) de una búsqueda"""
+    return canonical_nick(nick, sala), normalize_sala(sala)
@@ -0,0 +1,87 @@
+"""
+Validación de nicks antes de buscarlos
+Rechaza las lecturas del OCR que no pueden ser un nick real (texto cortado,
+mezcla de alfabetos, símbolos sueltos) según reglas por sala
+"""
+
+import unicodedata
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional
+
+class NickRule(NamedTuple):
+    """Reglas de nick de una sala"""
+    min_length: int = 2
+    max_length: int = 20
+    allowed_symbols: str = "_-. "
+    max_scripts: int = 2            # alfabetos distintos permitidos en un nick
+    min_alnum_ratio: float = 0.5    # fracción mínima de letras y números
+
+# Reglas por código de sala; las salas sin entrada usan DEFAULT_RULE
+DEFAULT_RULE = NickRule()
+ROOM_RULES: Dict[str, NickRule] = {
+    "XPK": NickRule(min_length=2, max_length=16),
+}
+
+# Alfabetos que se cuentan por separado; hiragana, katakana y los ideogramas
+# chinos se agrupan porque se mezclan con normalidad en los nicks japoneses
+_SCRIPT_PREFIXES = (
+    ("LATIN", "latin"), ("CJK", "cjk"), ("HIRAGANA", "cjk"), ("KATAKANA", "cjk"),
+    ("HANGUL", "hangul"), ("CYRILLIC", "cyrillic"), ("GREEK", "greek"),
+    ("THAI", "thai"), ("ARABIC", "arabic"), ("HEBREW", "hebrew"),
+)
+
+@lru_cache(maxsize=8192)
+def _script(char: str) -> Optional[str]:
+    """Alfabeto de una letra, o None para dígitos y símbolos"""
+    if not char.isalpha():
+        return None
+    name = unicodedata.name(char, "")
+    for prefix, script in _SCRIPT_PREFIXES:
+        if name.startswith(prefix):
+            return script
+    return "other"
+
+def get_rule(sala: str) -> NickRule:
+    """Reglas aplicables a una sala"""
+    return ROOM_RULES.get(sala.strip().upper(), DEFAULT_RULE)
+
+@lru_cache(maxsize=4096)
+def validate_nick(nick: str, sala: str = "") -> Optional[str]:
+    """
+    Comprueba si un texto puede ser un nick de la sala
+
+    Returns:
+        None si es plausible, o el motivo del rechazo
+    """
+    rule = get_rule(sala)
+    # Las formas de anchura completa cuentan como su alfabeto normal
+    text = unicodedata.normalize("NFKC", nick).strip()
+
+    if len(text) < rule.min_length:
+        return "demasiado corto"
+    if len(text) > rule.max_length:
+        return "demasiado largo"
+
+    scripts = set()
+    alnum = 0
+    for char in text:
+        if char.isalnum():
+            alnum += 1
+            script = _script(char)
+            if script:
+                scripts.add(script)
+        elif char not in rule.allowed_symbols:
+            return f"carácter no permitido {char!r}"
+
+    if alnum / len(text) < rule.min_alnum_ratio:
+        return "demasiados símbolos"
+    if len(scripts) > rule.max_scripts:
+        return "mezcla de alfabetos"
+    if len(text) >= 4 and len(set(text)) == 1:
+        return "carácter repetido"
+
+    return None
+
+def is_plausible_nick(nick: str, sala: str = "") -> bool:
+    """True si el texto puede ser un nick de la sala"""
+    return validate_nick(nick, sala) is None
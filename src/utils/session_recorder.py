@@ -0,0 +1,459 @@
+"""
+Grabación compacta de sesiones para reproducir problemas de rendimiento
+Guarda listas de ventanas, marcas de tiempo y fotogramas capturados en un
+único archivo de solo anexado, con fotogramas clave y deltas XOR comprimidos
+
+Formato del archivo (.pbrec):
+    cabecera    MAGIC (8 bytes)
+    registros   tipo (1) | longitud (4) | timestamp float64 (8) | datos
+                'W' lista de ventanas en JSON
+                'K' fotograma clave   hwnd (8) | ancho (4) | alto (4) | códec (1) | RGB comprimido
+                'D' fotograma delta   igual que 'K', con el XOR respecto al fotograma anterior
+                'X' índice en JSON con [offset, tipo, t, hwnd] de cada registro
+    pie         offset del índice (8) | FOOTER_MAGIC (8)
+
+Si la grabación no se cerró correctamente el índice se reconstruye
+recorriendo los registros.
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import queue
+import struct
+import bisect
+import threading
+import numpy as np
+from typing import List, Tuple, Optional, Dict, Any
+from PIL import Image
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+from src.utils.capture_backends import CaptureBackend, ReplaySource
+
+# Compresión rápida opcional
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+MAGIC = b"PBREC01\x00"
+FOOTER_MAGIC = b"PBRECEND"
+
+RECORD_HEADER = struct.Struct("<cId")
+FRAME_HEADER = struct.Struct("<qIIB")
+FOOTER = struct.Struct("<Q8s")
+
+RECORD_WINDOWS = b"W"
+RECORD_KEYFRAME = b"K"
+RECORD_DELTA = b"D"
+RECORD_INDEX = b"X"
+
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+
+def _compress(data: bytes) -> Tuple[int, bytes]:
+    """Comprime con el códec más rápido disponible"""
+    if ZSTD_AVAILABLE:
+        return CODEC_ZSTD, zstandard.ZstdCompressor(level=1).compress(data)
+    return CODEC_ZLIB, zlib.compress(data, 1)
+
+def _decompress(codec: int, data: bytes) -> bytes:
+    """Descomprime los datos de un fotograma"""
+    if codec == CODEC_ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("La grabación usa zstd y el módulo zstandard no está instalado")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+class SessionRecorder:
+    """
+    Graba una sesión en un archivo desde un hilo en segundo plano
+
+    Los métodos record_* solo encolan el trabajo, de modo que la captura
+    nunca espera a la codificación ni al disco. Si la cola se llena los
+    fotogramas se descartan y se contabilizan en dropped_frames; la última
+    lista de ventanas queda apartada (cada lista nueva sustituye a la
+    apartada, contabilizada en coalesced_windows) y se encola antes que el
+    siguiente fotograma, para que la reproducción conserve el orden.
+    """
+
+    def __init__(self, path: str, keyframe_interval: int = 30, max_queue: int = 64):
+        """
+        Inicializa el grabador
+
+        Args:
+            path: Ruta del archivo de grabación
+            keyframe_interval: Fotogramas entre dos fotogramas clave de la misma ventana
+            max_queue: Tamaño máximo de la cola de escritura
+        """
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.dropped_frames = 0
+        self.coalesced_windows = 0
+        self.bytes_written = 0
+
+        self._queue: "queue.Queue[Optional[Tuple]]" = queue.Queue(maxsize=max_queue)
+        self._start_time = time.monotonic()
+        self._last_windows = None
+        self._pending_windows: Optional[Tuple] = None
+        self._pending_lock = threading.Lock()
+        self._index: List[List[Any]] = []
+        self._previous: Dict[int, Tuple[int, int, np.ndarray]] = {}
+        self._since_keyframe: Dict[int, int] = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._offset = len(MAGIC)
+
+        self._thread = threading.Thread(target=self._run, name="SessionRecorder", daemon=True)
+        self._thread.start()
+
+        log_message(f"Grabación de sesión iniciada: {path}")
+
+    def _timestamp(self) -> float:
+        return time.monotonic() - self._start_time
+
+    def record_windows(self, windows: List[Tuple[int, str]], foreground: Optional[int] = None,
+                       cursor: Optional[int] = None) -> None:
+        """Encola la lista de ventanas visibles si ha cambiado"""
+        snapshot = (tuple(windows), foreground, cursor)
+        if snapshot == self._last_windows:
+            return
+        self._last_windows = snapshot
+
+        payload = {"windows": [list(w) for w in windows], "foreground": foreground, "cursor": cursor}
+        with self._pending_lock:
+            if self._pending_windows is not None:
+                self.coalesced_windows += 1
+            self._pending_windows = (RECORD_WINDOWS, self._timestamp(), payload)
+            self._flush_windows()
+
+    def record_frame(self, hwnd: int, image: Image.Image) -> None:
+        """Encola un fotograma capturado sin bloquear"""
+        with self._pending_lock:
+            try:
+                if self._flush_windows():
+                    self._queue.put_nowait((RECORD_KEYFRAME, self._timestamp(), (hwnd, image)))
+                    return
+            except queue.Full:
+                pass
+            self.dropped_frames += 1
+
+    def _flush_windows(self) -> bool:
+        """
+        Intenta encolar la lista de ventanas apartada (con _pending_lock tomado)
+
+        Returns:
+            True si no queda ninguna lista apartada
+        """
+        if self._pending_windows is None:
+            return True
+        try:
+            self._queue.put_nowait(self._pending_windows)
+        except queue.Full:
+            return False
+        self._pending_windows = None
+        return True
+
+    def close(self) -> None:
+        """Vacía la cola, escribe el índice y cierra el archivo"""
+        if self._file is None:
+            return
+
+        with self._pending_lock:
+            # Al cerrar sí se espera: la última lista de ventanas no se pierde
+            if self._pending_windows is not None:
+                self._queue.put(self._pending_windows)
+                self._pending_windows = None
+        self._queue.put(None)
+        self._thread.join()
+
+        index_offset = self._offset
+        self._write_record(RECORD_INDEX, 0.0, json.dumps(self._index).encode("utf-8"))
+        self._file.write(FOOTER.pack(index_offset, FOOTER_MAGIC))
+        self._file.close()
+        self._file = None
+
+        log_message(
+            f"Grabación de sesión cerrada: {self.path} "
+            f"({self.bytes_written / 1024:.0f} KB, {self.dropped_frames} fotogramas descartados, "
+            f"{self.coalesced_windows} listas de ventanas agrupadas)"
+        )
+
+    def _run(self):
+        """Bucle del hilo de escritura"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            kind, timestamp, data = item
+            try:
+                if kind == RECORD_WINDOWS:
+                    self._write_record(RECORD_WINDOWS, timestamp, json.dumps(data).encode("utf-8"))
+                else:
+                    self._write_frame(timestamp, *data)
+            except Exception as e:
+                log_message(f"Error al escribir grabación de sesión: {e}", level='error')
+
+    def _write_frame(self, timestamp: float, hwnd: int, image: Image.Image):
+        """Codifica un fotograma como clave o como delta respecto al anterior"""
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        width, height = image.size
+        current = np.frombuffer(image.tobytes(), dtype=np.uint8)
+
+        previous = self._previous.get(hwnd)
+        count = self._since_keyframe.get(hwnd, 0)
+
+        if previous is None or previous[:2] != (width, height) or count >= self.keyframe_interval:
+            kind, raw = RECORD_KEYFRAME, current.tobytes()
+            self._since_keyframe[hwnd] = 1
+        else:
+            kind, raw = RECORD_DELTA, np.bitwise_xor(current, previous[2]).tobytes()
+            self._since_keyframe[hwnd] = count + 1
+
+        self._previous[hwnd] = (width, height, current)
+
+        codec, compressed = _compress(raw)
+        header = FRAME_HEADER.pack(hwnd, width, height, codec)
+        self._write_record(kind, timestamp, header + compressed, hwnd)
+
+    def _write_record(self, kind: bytes, timestamp: float, payload: bytes, hwnd: int = 0):
+        """Añade un registro al archivo y al índice"""
+        if kind != RECORD_INDEX:
+            self._index.append([self._offset, kind.decode("ascii"), timestamp, hwnd])
+
+        self._file.write(RECORD_HEADER.pack(kind, len(payload), timestamp))
+        self._file.write(payload)
+        self._file.flush()
+
+        size = RECORD_HEADER.size + len(payload)
+        self._offset += size
+        self.bytes_written += size
+
+class SessionRecordingSource(ReplaySource):
+    """
+    Fuente de reproducción que lee un archivo .pbrec
+
+    Cada registro (lista de ventanas o fotograma) es un evento. Para
+    decodificar un fotograma se parte del fotograma clave previo y se
+    aplican los deltas; el último fotograma decodificado de cada ventana
+    se conserva para que la reproducción secuencial aplique un solo delta
+    por paso.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._lock = threading.Lock()
+
+        if self._file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} no es una grabación de sesión válida")
+
+        index = self._read_index()
+
+        self._timestamps: List[float] = []
+        self._windows: List[List[Tuple[int, str]]] = []
+        self._foreground: List[Optional[int]] = []
+        self._cursor: List[Optional[int]] = []
+        # Por ventana: eventos con fotograma, offsets y si son clave
+        self._frames: Dict[int, Tuple[List[int], List[int], List[bool]]] = {}
+        self._decoded: Dict[int, Tuple[int, int, int, np.ndarray]] = {}
+
+        windows, foreground, cursor = [], None, None
+        for offset, kind, timestamp, hwnd in index:
+            if kind == "W":
+                data = json.loads(self._read_payload(offset))
+                windows = [(int(h), t) for h, t in data.get("windows", [])]
+                foreground, cursor = data.get("foreground"), data.get("cursor")
+
+            event = len(self._timestamps)
+            self._timestamps.append(timestamp)
+            self._windows.append(windows)
+            self._foreground.append(foreground)
+            self._cursor.append(cursor)
+
+            if kind in ("K", "D"):
+                events, offsets, keyframes = self._frames.setdefault(hwnd, ([], [], []))
+                events.append(event)
+                offsets.append(offset)
+                keyframes.append(kind == "K")
+
+    def _read_index(self) -> List[List[Any]]:
+        """Lee el índice del pie del archivo o lo reconstruye si no existe"""
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+
+        if size >= len(MAGIC) + FOOTER.size:
+            self._file.seek(size - FOOTER.size)
+            index_offset, footer_magic = FOOTER.unpack(self._file.read(FOOTER.size))
+            if footer_magic == FOOTER_MAGIC:
+                return json.loads(self._read_payload(index_offset))
+
+        log_message(f"Grabación sin índice, reconstruyendo: {self.path}", level='warning')
+        index = []
+        offset = len(MAGIC)
+        while offset + RECORD_HEADER.size <= size:
+            self._file.seek(offset)
+            kind, length, timestamp = RECORD_HEADER.unpack(self._file.read(RECORD_HEADER.size))
+            if offset + RECORD_HEADER.size + length > size:
+                break  # Registro incompleto al final del archivo
+            hwnd = 0
+            if kind in (RECORD_KEYFRAME, RECORD_DELTA):
+                hwnd = FRAME_HEADER.unpack(self._file.read(FRAME_HEADER.size))[0]
+            if kind != RECORD_INDEX:
+                index.append([offset, kind.decode("ascii"), timestamp, hwnd])
+            offset += RECORD_HEADER.size + length
+        return index
+
+    def _read_payload(self, offset: int) -> bytes:
+        """Lee los datos de un registro a partir de su offset"""
+        with self._lock:
+            self._file.seek(offset)
+            _, length, _ = RECORD_HEADER.unpack(self._file.read(RECORD_HEADER.size))
+            return self._file.read(length)
+
+    def _decode_frame(self, offset: int) -> Tuple[int, int, np.ndarray]:
+        """Devuelve (ancho, alto, datos) sin aplicar el delta"""
+        payload = self._read_payload(offset)
+        _, width, height, codec = FRAME_HEADER.unpack_from(payload)
+        raw = _decompress(codec, payload[FRAME_HEADER.size:])
+        return width, height, np.frombuffer(raw, dtype=np.uint8)
+
+    @property
+    def timestamps(self) -> List[float]:
+        return self._timestamps
+
+    def windows_at(self, index: int) -> List[Tuple[int, str]]:
+        return self._windows[index]
+
+    def foreground_at(self, index: int) -> Optional[int]:
+        return self._foreground[index]
+
+    def cursor_at(self, index: int) -> Optional[int]:
+        return self._cursor[index]
+
+    def frame_at(self, index: int, hwnd: int) -> Optional[Image.Image]:
+        if hwnd not in self._frames:
+            return None
+
+        events, offsets, keyframes = self._frames[hwnd]
+        target = bisect.bisect_right(events, index) - 1
+        if target < 0:
+            return None
+
+        # Buscar el fotograma clave previo, o reutilizar el último decodificado
+        cached = self._decoded.get(hwnd)
+        start = target
+        while not keyframes[start]:
+            start -= 1
+        if cached and start <= cached[0] <= target:
+            position, width, height, data = cached
+        else:
+            width, height, data = self._decode_frame(offsets[start])
+            position = start
+
+        for i in range(position + 1, target + 1):
+            _, _, delta = self._decode_frame(offsets[i])
+            data = np.bitwise_xor(data, delta)
+
+        self._decoded[hwnd] = (target, width, height, data)
+        return Image.frombuffer('RGB', (width, height), data.tobytes(), 'raw', 'RGB', 0, 1)
+
+    def close(self):
+        """Cierra el archivo de la grabación"""
+        self._file.close()
+
+class RecordingCaptureBackend(CaptureBackend):
+    """
+    Envuelve otro backend y graba todo lo que este devuelve
+
+    Las capturas se graban siempre con la ventana completa para que la
+    reproducción pueda servir cualquier región posterior.
+    """
+
+    def __init__(self, inner: CaptureBackend, recorder: SessionRecorder):
+        self.inner = inner
+        self.recorder = recorder
+        self.name = f"{inner.name}+grabación"
+
+    def list_windows(self) -> List[Tuple[int, str]]:
+        windows = self.inner.list_windows()
+        self.recorder.record_windows(
+            windows, self.inner.get_foreground_window(), self.inner.window_at_cursor()
+        )
+        return windows
+
+    def get_window_text(self, hwnd: int) -> str:
+        return self.inner.get_window_text(hwnd)
+
+    def get_parent(self, hwnd: int) -> Optional[int]:
+        return self.inner.get_parent(hwnd)
+
+    def window_at_cursor(self) -> Optional[int]:
+        return self.inner.window_at_cursor()
+
+    def get_foreground_window(self) -> Optional[int]:
+        return self.inner.get_foreground_window()
+
+    def get_window_rect(self, hwnd: int) -> Tuple[int, int, int, int]:
+        return self.inner.get_window_rect(hwnd)
+
+    def is_window(self, hwnd: int) -> bool:
+        return self.inner.is_window(hwnd)
+
+    def capture(self, hwnd: int, rect: Tuple[int, int, int, int] = None) -> Optional[Image.Image]:
+        frame = self.inner.capture(hwnd, None)
+        if frame is None:
+            return None
+
+        self.recorder.record_frame(hwnd, frame)
+
+        if rect is None:
+            return frame
+        x, y, width, height = rect
+        return frame.crop((x, y, x + width, y + height))
+
+    def focus(self, hwnd: int) -> bool:
+        return self.inner.focus(hwnd)
+
+    def click(self, hwnd: int, x: int, y: int) -> bool:
+        return self.inner.click(hwnd, x, y)
+
+# Función para pruebas
+def test_session_recording(path: Optional[str] = None):
+    """Graba una sesión sintética y verifica que se reproduce igual"""
+    import tempfile
+
+    path = path or os.path.join(tempfile.mkdtemp(), "test_session.pbrec")
+    recorder = SessionRecorder(path, keyframe_interval=4)
+    frames = []
+    for i in range(10):
+        img = Image.new('RGB', (320, 240), color=(20, 80, 20))
+        img.paste((255, 255, 255), (10 * i, 10, 10 * i + 40, 30))
+        frames.append(img)
+        recorder.record_windows([(1001, "Mesa 1 - NL10")])
+        recorder.record_frame(1001, img)
+    recorder.close()
+
+    source = SessionRecordingSource(path)
+    decoded = [source.frame_at(i, 1001) for i in range(len(source.timestamps))]
+    decoded = [img for img in decoded if img is not None]
+    matches = sum(a.tobytes() == b.tobytes() for a, b in zip(frames, decoded[-len(frames):]))
+    size_kb = os.path.getsize(path) / 1024
+    log_message(f"Fotogramas verificados: {matches}/{len(frames)} ({size_kb:.1f} KB)")
+    source.close()
+
+# Para pruebas directas
+if __name__ == "__main__":
+    test_session_recording()
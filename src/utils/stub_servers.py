@@ -0,0 +1,604 @@
+"""
+Servidores HTTP locales que imitan los servicios externos
+Permiten probar el cliente de estadísticas y el análisis de jugadores sin
+red ni credenciales reales
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import zlib
+import socket
+import hashlib
+import itertools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlparse, parse_qs
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+
+# Estadísticas porcentuales que la API devuelve además de las de fake_player_stats
+EXTRA_STATS = (
+    "fold_to_flop_cbet_pct", "fold_to_turn_cbet_pct", "limp_pct", "limp_raise_pct",
+    "four_bet_preflop_pct", "fold_to_4bet_pct", "probe_bet_turn_pct", "bet_river_pct",
+    "fold_to_river_bet_pct", "overbet_turn_pct", "overbet_river_pct", "wsdwbr_pct", "wwsf",
+)
+
+def fake_player_stats(nick: str, sala: str) -> dict:
+    """Estadísticas deterministas para un nick (mismo nick, mismos valores)"""
+    digest = hashlib.sha1(f"{sala}:{nick}".encode("utf-8")).digest()
+    extra = hashlib.sha1(f"{nick}:{sala}".encode("utf-8")).digest()
+    stats = {
+        "nick": nick,
+        "sala": sala,
+        "vpip": 10 + digest[0] % 40,
+        "pfr": 5 + digest[1] % 25,
+        "three_bet": 2 + digest[2] % 12,
+        "fold_to_3bet_pct": 30 + digest[3] % 50,
+        "wtsd": 20 + digest[4] % 20,
+        "wsd": 40 + digest[5] % 20,
+        "cbet_flop": 40 + digest[6] % 40,
+        "cbet_turn": 30 + digest[7] % 40,
+        "total_manos": 50 + (digest[8] << 8 | digest[9]) % 20000,
+        "bb_100": round(((digest[10] % 200) - 100) / 10, 1),
+        "win_usd": round(((digest[11] << 8 | digest[12]) - 32768) / 10, 2),
+    }
+    for i, stat in enumerate(EXTRA_STATS):
+        stats[stat] = round(extra[i] / 2.55, 1)
+    return stats
+
+def project_stats(stats: Optional[dict], fields: Optional[Sequence[str]]) -> Optional[dict]:
+    """Solo los campos pedidos (los que no existen van a None); todos si fields está vacío"""
+    if stats is None or not fields:
+        return stats
+    return {field: stats.get(field) for field in fields}
+
+class _Subscription:
+    """Suscripción del servidor de prueba: jugadores suscritos y cambios pendientes"""
+
+    def __init__(self, fields: Optional[Sequence[str]] = None):
+        self.fields = fields
+        self.keys = set()
+        self.changes: List[Tuple[int, dict]] = []    # (secuencia, cambio)
+        self.sequence = 0
+
+class _StatsRequestHandler(BaseHTTPRequestHandler):
+    """Manejador HTTP/1.1 con keep-alive del servidor de estadísticas"""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Cabeceras y cuerpo van en escrituras separadas: sin TCP_NODELAY,
+        # Nagle y el ACK retardado del cliente añaden ~40 ms por respuesta
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Una instancia del manejador por conexión TCP
+        self.server.stub.count_connection()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _accepts_gzip(self) -> bool:
+        return self.server.stub.compress and "gzip" in self.headers.get("Accept-Encoding", "")
+
+    def _send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if self._accepts_gzip():
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            body = compressor.compress(body) + compressor.flush()
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.stub.count_bytes(len(body))
+
+    def _stream_ndjson(self, entries) -> None:
+        """Envía una línea JSON por entrada con codificación chunked, a medida que se generan"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        compressor = None
+        if self._accepts_gzip():
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+
+        def send_chunk(data: bytes) -> None:
+            if data:
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.server.stub.count_bytes(len(data))
+
+        for entry in entries:
+            line = json.dumps(entry).encode("utf-8") + b"\n"
+            send_chunk(compressor.compress(line) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else line)
+        if compressor:
+            send_chunk(compressor.flush())
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _inject_fault(self) -> bool:
+        """Aplica el fallo simulado que toque; True si ya se ha respondido con error"""
+        fault = self.server.stub.pick_fault()
+        if fault == "error":
+            self._send_json(503, {"error": "Servicio no disponible"})
+            return True
+        if fault == "slow":
+            time.sleep(self.server.stub.slow_latency)
+        return False
+
+    def _authorized(self) -> bool:
+        stub = self.server.stub
+        if stub.token and self.headers.get("Authorization") != f"Token {stub.token}":
+            self._send_json(401, {"error": "No autorizado"})
+            return False
+        return True
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(body.decode("utf-8")) if body else {}
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.count_request(self.path)
+
+        if not self._authorized():
+            return
+
+        url = urlparse(self.path)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        if stub.push and len(parts) == 3 and parts[0] == "suscripciones" and parts[2] == "cambios":
+            query = parse_qs(url.query)
+            cursor = int(query.get("cursor", ["0"])[0])
+            wait = min(float(query.get("espera", ["25"])[0]), 60.0)
+            result = stub.wait_changes(parts[1], cursor, wait)
+            if result is None:
+                self._send_json(404, {"error": "Suscripción desconocida"})
+            else:
+                self._send_json(200, {"cursor": result[0], "cambios": result[1]})
+            return
+
+        if len(parts) != 3 or parts[0] != "jugador":
+            self._send_json(404, {"error": "Ruta desconocida"})
+            return
+
+        if stub.latency:
+            time.sleep(stub.latency)
+        if self._inject_fault():
+            return
+
+        _, sala, nick = parts
+        stats = stub.find_player(nick, sala)
+        if stats is None:
+            self._send_json(404, {"error": "Jugador no encontrado"})
+        else:
+            fields = [f for f in parse_qs(url.query).get("campos", [""])[0].split(",") if f]
+            self._send_json(200, project_stats(stats, fields))
+
+    def do_POST(self):
+        stub = self.server.stub
+        stub.count_request(self.path)
+
+        payload = self._read_json()
+        if not self._authorized():
+            return
+        if payload is None:
+            self._send_json(400, {"error": "JSON no válido"})
+            return
+
+        parts = [unquote(part) for part in self.path.split("?")[0].strip("/").split("/")]
+        if stub.push and parts[0] == "suscripciones" and len(parts) <= 2:
+            if len(parts) == 1:
+                self._send_json(200, {"id": stub.open_subscription(payload.get("campos"))})
+            elif stub.update_subscription(parts[1], payload.get("alta", []), payload.get("baja", [])):
+                self._send_json(200, {"ok": True})
+            else:
+                self._send_json(404, {"error": "Suscripción desconocida"})
+            return
+
+        if not stub.bulk or parts != ["jugadores", "lote"]:
+            self._send_json(404, {"error": "Ruta desconocida"})
+            return
+
+        players = payload.get("jugadores", [])
+        fields = payload.get("campos")
+
+        stub.count_batch(len(players))
+        if stub.latency:
+            time.sleep(stub.latency)
+        if self._inject_fault():
+            return
+
+        results = (
+            {"nick": p.get("nick", ""), "sala": p.get("sala", ""),
+             "stats": project_stats(stub.find_player(p.get("nick", ""), p.get("sala", "")), fields)}
+            for p in players
+        )
+        if stub.stream and "application/x-ndjson" in self.headers.get("Accept", ""):
+            self._stream_ndjson(results)
+        else:
+            self._send_json(200, {"resultados": list(results)})
+
+    def do_DELETE(self):
+        stub = self.server.stub
+        stub.count_request(self.path)
+
+        if not self._authorized():
+            return
+        parts = [unquote(part) for part in self.path.split("?")[0].strip("/").split("/")]
+        if stub.push and len(parts) == 2 and parts[0] == "suscripciones":
+            stub.close_subscription(parts[1])
+            self._send_json(200, {"ok": True})
+        else:
+            self._send_json(404, {"error": "Ruta desconocida"})
+
+class StatsStubServer:
+    """
+    Servidor local que imita la API de estadísticas
+
+    Atiende GET /jugador/<sala>/<nick> y, si bulk es True, POST
+    /jugadores/lote, con HTTP/1.1 y keep-alive, y cuenta las conexiones,
+    peticiones y lotes recibidos. Si push es True también ofrece
+    suscripciones: POST /suscripciones abre una, POST /suscripciones/<id>
+    da altas y bajas, GET /suscripciones/<id>/cambios?cursor=N&espera=S
+    retiene la petición hasta que hay cambios posteriores a N y DELETE /suscripciones/<id> la cierra. Los cambios
+    se simulan con update_player. Las respuestas se limitan a los campos
+    pedidos (parámetro o campo "campos"), se comprimen con gzip y los lotes
+    se pueden recibir como NDJSON; bytes_sent cuenta los bytes del cuerpo.
+    Para probar la resiliencia del cliente inyecta fallos en las búsquedas:
+    con probabilidad error_rate responde 503 y con slow_rate tarda
+    slow_latency segundos más (se pueden cambiar en caliente).
+    Se usa como gestor de contexto:
+
+        with StatsStubServer(latency=0.05) as stub:
+            client = StatsClient(stub.url)
+
+    Args:
+        players: Estadísticas por (nick, sala); si es None se generan para
+            cualquier nick salvo los de unknown
+        token: Token exigido en la cabecera Authorization ("" = sin auth)
+        latency: Retardo artificial por petición en segundos
+        bulk: Ofrecer el endpoint de búsqueda en lote
+        push: Ofrecer suscripciones a cambios
+        compress: Comprimir con gzip si el cliente lo acepta
+        stream: Responder los lotes en NDJSON por partes si el cliente lo acepta
+        error_rate: Fracción de búsquedas que responden 503
+        slow_rate: Fracción de búsquedas que tardan slow_latency de más
+        seed: Semilla de los fallos simulados
+    """
+
+    def __init__(self, players: Optional[Dict[Tuple[str, str], dict]] = None,
+                 token: str = "", latency: float = 0.0, unknown: Tuple[str, ...] = (),
+                 bulk: bool = True, push: bool = True, compress: bool = True, stream: bool = True,
+                 error_rate: float = 0.0, slow_rate: float = 0.0, slow_latency: float = 1.0, seed: int = 0):
+        self.players = players
+        self.token = token
+        self.latency = latency
+        self.unknown = set(unknown)
+        self.bulk = bulk
+        self.push = push
+        self.compress = compress
+        self.stream = stream
+        self.bytes_sent = 0
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.faults: Dict[str, int] = {"error": 0, "slow": 0}
+        self._random = random.Random(seed)
+        self.updated: Dict[Tuple[str, str], dict] = {}
+        self.subscriptions: Dict[str, _Subscription] = {}
+        self._subscription_ids = itertools.count(1)
+        self._changed = threading.Condition()
+        self.batch_sizes = []
+        self.connections = 0
+        self.requests = 0
+        self.paths: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_connection(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def count_request(self, path: str) -> None:
+        with self._lock:
+            self.requests += 1
+            self.paths[path] = self.paths.get(path, 0) + 1
+
+    def pick_fault(self) -> Optional[str]:
+        """Fallo simulado para la siguiente búsqueda: "error", "slow" o None"""
+        with self._lock:
+            roll = self._random.random()
+            if roll < self.error_rate:
+                fault = "error"
+            elif roll < self.error_rate + self.slow_rate:
+                fault = "slow"
+            else:
+                return None
+            self.faults[fault] += 1
+            return fault
+
+    def count_bytes(self, size: int) -> None:
+        with self._lock:
+            self.bytes_sent += size
+
+    def count_batch(self, size: int) -> None:
+        with self._lock:
+            self.batch_sizes.append(size)
+
+    def find_player(self, nick: str, sala: str) -> Optional[dict]:
+        """Estadísticas de un jugador o None si no existe"""
+        if (nick, sala) in self.updated:
+            return self.updated[(nick, sala)]
+        if nick in self.unknown:
+            return None
+        if self.players is None:
+            return fake_player_stats(nick, sala)
+        return self.players.get((nick, sala))
+
+    def open_subscription(self, fields: Optional[Sequence[str]] = None) -> str:
+        with self._changed:
+            sub_id = f"s{next(self._subscription_ids)}"
+            self.subscriptions[sub_id] = _Subscription(fields)
+            return sub_id
+
+    def update_subscription(self, sub_id: str, add: List[dict], remove: List[dict]) -> bool:
+        with self._changed:
+            subscription = self.subscriptions.get(sub_id)
+            if subscription is None:
+                return False
+            subscription.keys.update((p.get("nick"), p.get("sala")) for p in add)
+            subscription.keys.difference_update((p.get("nick"), p.get("sala")) for p in remove)
+            return True
+
+    def close_subscription(self, sub_id: str) -> None:
+        with self._changed:
+            self.subscriptions.pop(sub_id, None)
+            self._changed.notify_all()
+
+    def update_player(self, nick: str, sala: str, stats: Optional[dict]) -> None:
+        """Cambia las estadísticas de un jugador y avisa a sus suscripciones"""
+        with self._changed:
+            self.updated[(nick, sala)] = stats
+            for subscription in self.subscriptions.values():
+                if (nick, sala) in subscription.keys:
+                    change = {"nick": nick, "sala": sala, "stats": project_stats(stats, subscription.fields)}
+                    subscription.sequence += 1
+                    subscription.changes.append((subscription.sequence, change))
+            self._changed.notify_all()
+
+    def wait_changes(self, sub_id: str, cursor: int, wait: float) -> Optional[Tuple[int, List[dict]]]:
+        """Cambios posteriores a cursor, esperando hasta wait segundos si no hay"""
+        deadline = time.monotonic() + wait
+        with self._changed:
+            while True:
+                subscription = self.subscriptions.get(sub_id)
+                if subscription is None:
+                    return None
+                # Lo anterior al cursor ya lo tiene el cliente
+                subscription.changes = [(seq, c) for seq, c in subscription.changes if seq > cursor]
+                remaining = deadline - time.monotonic()
+                if subscription.changes or remaining <= 0 or self._server is None:
+                    return subscription.sequence, [c for _, c in subscription.changes]
+                self._changed.wait(remaining)
+
+    def start(self) -> "StatsStubServer":
+        """Arranca el servidor en un puerto libre de localhost"""
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _StatsRequestHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="StatsStubServer", daemon=True)
+        self._thread.start()
+        log_message(f"Servidor de prueba de estadísticas en {self.url}")
+        return self
+
+    def stop(self) -> None:
+        """Detiene el servidor"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            with self._changed:
+                self._server = None
+                self._changed.notify_all()
+
+    def __enter__(self) -> "StatsStubServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+def fake_analysis(prompt: str, words: int = 60) -> str:
+    """Texto de análisis determinista para un prompt (mismo prompt, mismo texto)"""
+    vocabulary = ("roba", "ciegas", "paga", "demasiado", "farolea", "poco", "river", "sube",
+                  "desde", "posición", "tardía", "abandona", "ante", "resubidas", "explotar",
+                  "con", "valor", "fino", "evitar", "faroles", "contra", "él", "en", "el", "turn")
+    digest = hashlib.sha1(prompt.encode("utf-8")).digest()
+    picker = random.Random(digest)
+    return " ".join(picker.choice(vocabulary) for _ in range(words)).capitalize() + "."
+
+class _OpenAIRequestHandler(BaseHTTPRequestHandler):
+    """Manejador del servidor que imita la API de chat de OpenAI"""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_sse(self, text: str, model: str) -> None:
+        """
+        Envía la respuesta palabra a palabra como eventos SSE, igual que
+        OpenAI con "stream": true. Si el cliente corta la conexión deja de
+        generar, como haría el modelo
+        """
+        stub = self.server.stub
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_event(payload) -> None:
+            data = payload if isinstance(payload, str) else json.dumps(payload)
+            event = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+            self.wfile.flush()
+
+        words = text.split(" ")
+        sent = 0
+        try:
+            for i, word in enumerate(words):
+                if stub.truncate_after is not None and i >= stub.truncate_after:
+                    # Fin del cuerpo sin finish_reason ni [DONE]: respuesta truncada
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+                if i and stub.token_delay:
+                    time.sleep(stub.token_delay)
+                send_event({
+                    "id": f"chatcmpl-{stub.requests}",
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word},
+                                 "finish_reason": None}],
+                })
+                sent += 1
+            send_event({"id": f"chatcmpl-{stub.requests}", "object": "chat.completion.chunk",
+                        "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            stub.count_cancelled()
+            self.close_connection = True
+        finally:
+            stub.count_words(sent)
+
+    def do_POST(self):
+        stub = self.server.stub
+        if urlparse(self.path).path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": "No encontrado"}})
+            return
+        if stub.api_key and self.headers.get("Authorization") != f"Bearer {stub.api_key}":
+            self._send_json(401, {"error": {"message": "Clave de API incorrecta"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length).decode("utf-8"))
+            prompt = "\n".join(message["content"] for message in request["messages"])
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {"error": {"message": "Petición mal formada"}})
+            return
+
+        text = fake_analysis(prompt, stub.words)
+        stub.count_request()
+        time.sleep(stub.latency)
+        if request.get("stream"):
+            self._stream_sse(text, request.get("model", ""))
+            return
+        stub.count_words(len(text.split()))
+        self._send_json(200, {
+            "id": f"chatcmpl-{stub.requests}",
+            "object": "chat.completion",
+            "model": request.get("model", ""),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(text.split())},
+        })
+
+class OpenAIStubServer:
+    """
+    Servidor local que imita POST /v1/chat/completions de OpenAI
+
+    Responde con un texto determinista derivado de los mensajes tras
+    latency segundos y cuenta las peticiones y las palabras generadas,
+    para medir cuántas llamadas se ahorran sin gastar tokens reales. Con
+    "stream": true envía una palabra cada token_delay segundos y deja de
+    generar si el cliente corta la conexión (cancelled).
+
+        with OpenAIStubServer(latency=1.0) as stub:
+            client = ChatClient(stub.url + "/v1", "clave")
+
+    Args:
+        api_key: Clave exigida en Authorization: Bearer ("" = sin auth)
+        latency: Segundos hasta la respuesta (hasta la primera palabra en streaming)
+        words: Palabras de cada respuesta
+        token_delay: Segundos entre palabras en streaming
+        truncate_after: Palabras tras las que el streaming termina sin
+            completarse (None = respuesta completa)
+    """
+
+    def __init__(self, api_key: str = "", latency: float = 0.0, words: int = 60,
+                 token_delay: float = 0.0, truncate_after: Optional[int] = None):
+        self.api_key = api_key
+        self.latency = latency
+        self.words = words
+        self.token_delay = token_delay
+        self.truncate_after = truncate_after
+        self.requests = 0
+        self.completion_words = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def count_words(self, words: int) -> None:
+        with self._lock:
+            self.completion_words += words
+
+    def count_cancelled(self) -> None:
+        with self._lock:
+            self.cancelled += 1
+
+    def start(self) -> "OpenAIStubServer":
+        """Arranca el servidor en un puerto libre de localhost"""
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _OpenAIRequestHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever, name="OpenAIStubServer", daemon=True).start()
+        log_message(f"Servidor de prueba de OpenAI en {self.url}")
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "OpenAIStubServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
@@ -0,0 +1,223 @@
+"""
+Clasificador de títulos de ventana para detectar mesas de poker
+Compila todos los patrones en una única expresión regular con grupos con
+nombre y busca los nombres de clientes y programas excluidos con un
+autómata Aho-Corasick, memorizando el resultado por título
+"""
+
+import os
+import re
+import sys
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Añadir directorio raíz al path para importaciones
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.utils.logger import log_message
+
+# Programas a excluir explícitamente (coincidencia exacta de mayúsculas)
+EXCLUDE_PROGRAMS = (
+    'Google Chrome', 'Firefox', 'Edge',
+    'Visual Studio', 'Code', 'Notepad',
+    'Word', 'Excel', 'PowerPoint',
+    'Explorer', 'File Explorer'
+)
+
+# Nombres de programas de poker conocidos (sin distinguir mayúsculas, 1 punto cada uno)
+POKER_CLIENTS = (
+    'PokerStars', 'GGPoker', 'PokerKing', 'Winamax', 'Pokerstars', 'PPPoker',
+    'PartyPoker', '888Poker', 'XPoker', 'WPN', 'TigerGaming',
+    'America\'s Cardroom', '6max'
+)
+
+# Patrones comunes en títulos de mesas de poker (2 puntos cada uno)
+TITLE_PATTERNS = (
+    ('blinds', r'\b\d+\s*/\s*\d+\b'),        # Formato "X / Y" (ciegos)
+    ('nl', r'\bNL(?P<nl_stake>\d+)\b'),      # NLXX (No Limit XX)
+    ('plo', r'\bPLO(?P<plo_stake>\d+)\b'),   # PLOXX (Pot Limit Omaha XX)
+    ('pk', r'\bPK(?P<pk_id>[0-9]+)\b'),      # Número de mesa PKxxxx
+    ('table', r'\bTable\s+(?P<table_num>\d+)\b'),  # Table XX
+    ('poker_table', r'\bPoker.*Table\b'),    # "Poker" y "Table" en el título
+    ('holdem', r'\bHold\'?em\b'),            # Hold'em o Holdem
+    ('omaha', r'\bOmaha\b'),                 # Omaha
+    ('bb', r'\bbb\b'),                       # bb (big blinds)
+    ('decimal_blinds', r'\d+\.\d+/\d+\.\d+'),  # Formato de ciegos con decimales
+    ('xpoker', r'[xX]-Poker\('),             # Formato X-Poker común en algunas salas
+)
+
+MIN_SCORE = 2
+
+# Ciegos de los metadatos: símbolo de moneda y decimales con punto o coma
+# opcionales a cada lado ("0.5/1", "0,05/0,10", "$0.05/$0.10"). No puntúa;
+# solo se busca en los títulos que ya son mesas.
+_STAKES_PATTERN = re.compile(
+    r'(?<![\w.,/])[$€£]?\d+(?:[.,]\d+)?\s*/\s*[$€£]?\d+(?:[.,]\d+)?(?![.,]?\d|\s*/)'
+)
+
+# Cada patrón va en una búsqueda anticipada opcional anclada al inicio: una
+# sola llamada a match() indica qué patrones aparecen en cualquier posición,
+# aunque sus coincidencias se solapen.
+_COMBINED_PATTERN = re.compile(
+    '^' + ''.join(f'(?:(?=.*?(?P<{name}>{pattern})))?' for name, pattern in TITLE_PATTERNS),
+    re.IGNORECASE | re.DOTALL
+)
+_PATTERN_NAMES = tuple(name for name, _ in TITLE_PATTERNS)
+
+class TableInfo(NamedTuple):
+    """Resultado de clasificar un título de ventana"""
+    is_table: bool
+    score: int
+    client: Optional[str] = None
+    stakes: Optional[str] = None
+    game: Optional[str] = None
+    table_id: Optional[str] = None
+
+class AhoCorasick:
+    """Autómata Aho-Corasick para buscar muchas palabras en una sola pasada"""
+
+    def __init__(self, keywords: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        self.keywords = list(keywords)
+
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(index)
+
+        # Construir enlaces de fallo en anchura
+        queue = list(self._goto[0].values())
+        while queue:
+            state = queue.pop(0)
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                candidate = self._goto[fail].get(char, 0)
+                self._fail[next_state] = candidate if candidate != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Busca todas las apariciones de las palabras clave
+
+        Returns:
+            Lista de (índice de palabra, posición final) por cada coincidencia
+        """
+        matches = []
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                matches.append((index, position))
+        return matches
+
+# Un único autómata en minúsculas para clientes y exclusiones; las
+# exclusiones se verifican después respetando mayúsculas
+_KEYWORDS = [client.lower() for client in POKER_CLIENTS] + [program.lower() for program in EXCLUDE_PROGRAMS]
+_AUTOMATON = AhoCorasick(_KEYWORDS)
+_CLIENT_COUNT = len(POKER_CLIENTS)
+
+def _scan_keywords(title: str) -> Tuple[bool, List[int]]:
+    """
+    Busca clientes y programas excluidos en una sola pasada
+
+    Returns:
+        Tupla (excluido, índices de clientes encontrados en orden de aparición)
+    """
+    lowered = title.lower()
+    same_length = len(lowered) == len(title)
+    excluded = False
+    clients: List[int] = []
+
+    for index, end in _AUTOMATON.find_all(lowered):
+        if index < _CLIENT_COUNT:
+            if index not in clients:
+                clients.append(index)
+        elif not excluded:
+            program = EXCLUDE_PROGRAMS[index - _CLIENT_COUNT]
+            if same_length:
+                excluded = title[end - len(program) + 1:end + 1] == program
+            else:
+                excluded = program in title
+
+    return excluded, clients
+
+@lru_cache(maxsize=4096)
+def classify_title(title: str) -> TableInfo:
+    """
+    Clasifica un título de ventana y extrae sus metadatos
+
+    Args:
+        title: Título de la ventana
+
+    Returns:
+        TableInfo con la decisión, la puntuación y los datos de la mesa
+    """
+    excluded, clients = _scan_keywords(title)
+    if excluded:
+        return TableInfo(False, 0)
+
+    groups = _COMBINED_PATTERN.match(title).groupdict()
+    score = len(clients)
+    for name in _PATTERN_NAMES:
+        if groups[name] is not None:
+            score += 2
+
+    if score < MIN_SCORE:
+        return TableInfo(False, score)
+
+    # Metadatos extraídos de los mismos grupos
+    stakes = None
+    if groups['nl_stake']:
+        stakes = f"NL{groups['nl_stake']}"
+    elif groups['plo_stake']:
+        stakes = f"PLO{groups['plo_stake']}"
+    else:
+        blinds = _STAKES_PATTERN.search(title)
+        if blinds:
+            stakes = ''.join(blinds.group().split())
+
+    game = None
+    if groups['plo'] or groups['omaha']:
+        game = "PLO"
+    elif groups['nl'] or groups['holdem']:
+        game = "NLH"
+
+    table_id = groups['pk_id'] and f"PK{groups['pk_id']}" or groups['table_num']
+    client = POKER_CLIENTS[clients[0]] if clients else None
+
+    return TableInfo(True, score, client, stakes, game, table_id)
+
+# Función para pruebas
+def test_table_classifier():
+    """Prueba la clasificación y los metadatos con títulos reales"""
+    for title, expected in [
+        ("PPPoker - Mesa 8 - 0.5/1", "0.5/1"),
+        ("Mesa 3 - Hold'em - 0,05/0,10", "0,05/0,10"),
+        ("德州扑克 - X-Poker(PK5551234) - 0.5/1", "0.5/1"),
+        ("Halley II - No Limit Hold'em $0.05/$0.10 USD - Logged In as pokerbot", "$0.05/$0.10"),
+        ("PokerStars - NL10 - Table 12", "NL10"),
+        ("Mesa 5 - 25 / 50 - 6max", "25/50"),
+    ]:
+        info = classify_title(title)
+        result = "correcto" if info.stakes == expected else f"ESPERADO {expected}"
+        log_message(f"{title!r}: mesa={info.is_table} stakes={info.stakes} juego={info.game} "
+                    f"mesa_id={info.table_id} -> {result}")
+
+# Para pruebas directas
+if __name__ == "__main__":
+    test_table_classifier()
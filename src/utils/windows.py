@@ -5,19 +5,15 @@ Proporciona detección de mesas de poker y captura de pantalla
 
 import os
 import sys
-import re
 from typing import List, Tuple, Optional
-import win32gui
-import win32ui
-import win32con
-import win32api
-from ctypes import windll
 from PIL import Image
-import numpy as np
 
 # Añadir directorio raíz al path para importaciones
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from src.utils.logger import log_message
+from src.utils.capture_backends import get_capture_backend
+from src.utils.frame_pool import FrameBuffer, FramePool, frame_pool
+from src.utils.table_classifier import classify_title
 
 def is_poker_table(title: str) -> bool:
     """
@@ -29,56 +25,7 @@ def is_poker_table(title: str) -> bool:
     Returns:
         True si parece una mesa de poker, False en caso contrario
     """
-    # Lista de programas a excluir explícitamente
-    exclude_programs = [
-        'Google Chrome', 'Firefox', 'Edge', 
-        'Visual Studio', 'Code', 'Notepad', 
-        'Word', 'Excel', 'PowerPoint',
-        'Explorer', 'File Explorer'
-    ]
-    
-    # Excluir explícitamente las ventanas de estos programas
-    for program in exclude_programs:
-        if program in title:
-            return False
-    
-    # Patrones comunes en títulos de mesas de poker
-    patterns = [
-        r'\b\d+\s*/\s*\d+\b',     # Formato "X / Y" (ciegos)
-        r'\bNL\d+\b',              # NLXX (No Limit XX)
-        r'\bPLO\d+\b',             # PLOXX (Pot Limit Omaha XX)
-        r'\bPK[0-9]+\b',           # Número de mesa PKxxxx
-        r'\bTable\s+\d+\b',        # Table XX
-        r'\bPoker.*Table\b',       # "Poker" y "Table" en el título
-        r'\bHold\'?em\b',          # Hold'em o Holdem
-        r'\bOmaha\b',              # Omaha
-        r'\bbb\b',                 # bb (big blinds)
-        r'\d+\.\d+/\d+\.\d+',      # Formato de ciegos con decimales
-        r'[xX]-Poker\(',           # Formato X-Poker común en algunas salas
-    ]
-    
-    # Nombres de programas de poker conocidos (necesita al menos uno de estos)
-    poker_clients = [
-        'PokerStars', 'GGPoker', 'PokerKing', 'Winamax', 'Pokerstars', 'PPPoker',
-        'PartyPoker', '888Poker', 'XPoker', 'WPN', 'TigerGaming', 
-        'America\'s Cardroom', '6max'
-    ]
-    
-    # Sistema de puntuación para determinar si es una mesa
-    score = 0
-    
-    # Verificar patrones (cada coincidencia suma 2 puntos)
-    for pattern in patterns:
-        if re.search(pattern, title, re.IGNORECASE):
-            score += 2
-    
-    # Verificar clientes de poker (cada coincidencia suma 1 punto)
-    for client in poker_clients:
-        if client.lower() in title.lower():
-            score += 1
-    
-    # Para ser considerada mesa, debe tener un puntaje mínimo de 2
-    return score >= 2
+    return classify_title(title).is_table
 
 def find_poker_tables() -> List[Tuple[int, str]]:
     """
@@ -89,15 +36,11 @@ def find_poker_tables() -> List[Tuple[int, str]]:
     """
     tables = []
     
-    def enum_windows_callback(hwnd, _):
-        if win32gui.IsWindowVisible(hwnd):
-            title = win32gui.GetWindowText(hwnd)
-            if title and is_poker_table(title):
-                tables.append((hwnd, title))
-    
     # Enumerar todas las ventanas
     try:
-        win32gui.EnumWindows(enum_windows_callback, None)
+        for hwnd, title in get_capture_backend().list_windows():
+            if title and is_poker_table(title):
+                tables.append((hwnd, title))
         log_message(f"Se encontraron {len(tables)} mesas de poker")
     except Exception as e:
         log_message(f"Error al enumerar ventanas: {e}", level='error')
@@ -115,14 +58,13 @@ def get_window_under_cursor() -> Tuple[Optional[int], Optional[str]]:
         Tupla (hwnd, title) con el handle y título de la ventana, o (None, None) si no se encuentra
     """
     try:
-        # Obtener posición del cursor
-        cursor_pos = win32gui.GetCursorPos()
+        backend = get_capture_backend()
         
-        # Obtener ventana en esa posición
-        hwnd = win32gui.WindowFromPoint(cursor_pos)
+        # Obtener ventana en la posición del cursor
+        hwnd = backend.window_at_cursor()
         
         if hwnd:
-            title = win32gui.GetWindowText(hwnd)
+            title = backend.get_window_text(hwnd)
             
             # Verificar si es una mesa de poker
             if title and is_poker_table(title):
@@ -130,9 +72,9 @@ def get_window_under_cursor() -> Tuple[Optional[int], Optional[str]]:
                 return hwnd, title
             
             # Verificar ventana padre
-            parent_hwnd = win32gui.GetParent(hwnd)
+            parent_hwnd = backend.get_parent(hwnd)
             if parent_hwnd:
-                parent_title = win32gui.GetWindowText(parent_hwnd)
+                parent_title = backend.get_window_text(parent_hwnd)
                 if parent_title and is_poker_table(parent_title):
                     log_message(f"Ventana padre bajo cursor: {parent_title}")
                     return parent_hwnd, parent_title
@@ -156,47 +98,28 @@ def capture_window_area(hwnd: int, rect: Tuple[int, int, int, int] = None) -> Op
         Imagen PIL de la región capturada, o None si hay error
     """
     try:
-        # Si no se especifica rect, capturar toda la ventana
-        if rect is None:
-            left, top, right, bottom = win32gui.GetWindowRect(hwnd)
-            width, height = right - left, bottom - top
-            x, y = 0, 0
-        else:
-            x, y, width, height = rect
-        
-        # Obtener DC y crear DC compatible
-        hwnd_dc = win32gui.GetWindowDC(hwnd)
-        mfc_dc = win32ui.CreateDCFromHandle(hwnd_dc)
-        save_dc = mfc_dc.CreateCompatibleDC()
-        
-        # Crear bitmap compatible y seleccionarlo en el DC
-        save_bitmap = win32ui.CreateBitmap()
-        save_bitmap.CreateCompatibleBitmap(mfc_dc, width, height)
-        save_dc.SelectObject(save_bitmap)
-        
-        # Copiar bits de la ventana al bitmap
-        result = windll.user32.PrintWindow(hwnd, save_dc.GetSafeHdc(), 3)
-        
-        # Alternativa si PrintWindow no funciona 
-        if not result:
-            save_dc.BitBlt((0, 0), (width, height), mfc_dc, (x, y), win32con.SRCCOPY)
-        
-        # Convertir a imagen PIL
-        bmpinfo = save_bitmap.GetInfo()
-        bmpstr = save_bitmap.GetBitmapBits(True)
-        img = Image.frombuffer(
-            'RGB',
-            (bmpinfo['bmWidth'], bmpinfo['bmHeight']),
-            bmpstr, 'raw', 'BGRX', 0, 1
-        )
-        
-        # Liberar recursos
-        win32gui.DeleteObject(save_bitmap.GetHandle())
-        save_dc.DeleteDC()
-        mfc_dc.DeleteDC()
-        win32gui.ReleaseDC(hwnd, hwnd_dc)
-        
-        return img
+        return get_capture_backend().capture(hwnd, rect)
+    
+    except Exception as e:
+        log_message(f"Error al capturar ventana: {e}", level='error')
+        return None
+
+def capture_window_array(hwnd: int, rect: Tuple[int, int, int, int] = None,
+                         pool: FramePool = None) -> Optional[FrameBuffer]:
+    """
+    Captura una región de una ventana en un buffer NumPy reutilizable
+    
+    Args:
+        hwnd: Handle de la ventana a capturar
+        rect: Tupla (x, y, width, height) con la región a capturar, o None para toda la ventana
+        pool: Pool del que tomar el buffer (por defecto el pool global)
+    
+    Returns:
+        FrameBuffer con un array BGRA (alto x ancho x 4), o None si hay error.
+        El llamador debe liberarlo con release() al terminar.
+    """
+    try:
+        return get_capture_backend().capture_into(hwnd, rect, pool or frame_pool)
     
     except Exception as e:
         log_message(f"Error al capturar ventana: {e}", level='error')
@@ -213,7 +136,7 @@ def get_window_position(hwnd: int) -> Tuple[int, int, int, int]:
         Tupla (left, top, width, height)
     """
     try:
-        left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+        left, top, right, bottom = get_capture_backend().get_window_rect(hwnd)
         width = right - left
         height = bottom - top
         return left, top, width, height
@@ -232,21 +155,15 @@ def focus_window(hwnd: int) -> bool:
         True si se pudo dar foco, False en caso contrario
     """
     try:
+        backend = get_capture_backend()
+        
         # Comprobar si la ventana existe
-        if not win32gui.IsWindow(hwnd):
+        if not backend.is_window(hwnd):
             log_message(f"La ventana {hwnd} no existe", level='warning')
             return False
         
-        # Comprobar si está minimizada y restaurarla
-        if win32gui.IsIconic(hwnd):
-            win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
-        
-        # Traer la ventana al frente
-        win32gui.SetForegroundWindow(hwnd)
-        
-        # Verificar que realmente se activó
-        active_hwnd = win32gui.GetForegroundWindow()
-        result = (active_hwnd == hwnd)
+        # Restaurar, traer al frente y verificar que realmente se activó
+        result = backend.focus(hwnd)
         
         if result:
             log_message(f"Ventana {hwnd} activada correctamente")
@@ -272,24 +189,10 @@ def click_on_window_point(hwnd: int, x: int, y: int) -> bool:
         True si se realizó el clic, False en caso contrario
     """
     try:
-        # Calcular coordenadas absolutas
-        left, top, _, _ = win32gui.GetWindowRect(hwnd)
-        abs_x, abs_y = left + x, top + y
-        
-        # Enviar mensaje de clic sin mover el cursor físico
-        win32api.SendMessage(
-            hwnd, 
-            win32con.WM_LBUTTONDOWN, 
-            win32con.MK_LBUTTON, 
-            win32api.MAKELONG(x, y)
-        )
-        
-        win32api.SendMessage(
-            hwnd, 
-            win32con.WM_LBUTTONUP, 
-            0, 
-            win32api.MAKELONG(x, y)
-        )
+        # Enviar clic sin mover el cursor físico
+        if not get_capture_backend().click(hwnd, x, y):
+            log_message(f"No se pudo hacer clic en la ventana {hwnd}", level='warning')
+            return False
         
         log_message(f"Clic realizado en la posición ({x}, {y}) de la ventana {hwnd}")
         return True